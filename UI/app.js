@@ -107,18 +107,33 @@ document.addEventListener('DOMContentLoaded', () => {
         }
 
         function previewFile(file) {
-            const reader = new FileReader();
-            reader.readAsDataURL(file);
-            reader.onloadend = function () {
-                const img = document.createElement('img');
-                img.src = reader.result;
-                filePreview.innerHTML = '';
-                filePreview.appendChild(img);
-                filePreview.classList.remove('hidden');
-
-                // Store base64 briefly in memory/element (or we use the fileInput)
-                dropZone.dataset.base64 = reader.result;
-            }
+            const img = document.createElement('img');
+            img.src = URL.createObjectURL(file);
+            filePreview.innerHTML = '';
+            filePreview.appendChild(img);
+            filePreview.classList.remove('hidden');
+
+            // Upload the raw bytes once; analyses reference the returned image id
+            delete dropZone.dataset.imageId;
+            dropZone.dataset.uploading = 'true';
+            fetch('http://127.0.0.1:5000/images', {
+                method: 'POST',
+                headers: { 'Content-Type': file.type },
+                body: file
+            })
+                .then(res => res.json())
+                .then(resData => {
+                    if (resData.success) {
+                        dropZone.dataset.imageId = resData.data.image_id;
+                    } else {
+                        alert("Upload failed: " + resData.error);
+                    }
+                })
+                .catch(err => {
+                    console.error(err);
+                    alert("Upload failed. Is the backend running?");
+                })
+                .finally(() => delete dropZone.dataset.uploading);
         }
 
         // Predict Button Action
@@ -127,9 +142,13 @@ document.addEventListener('DOMContentLoaded', () => {
                 const text = contentInput.value.trim();
                 const platform = platformSelect.value;
                 const target = targetSelect.value;
-                const base64Image = dropZone.dataset.base64;
+                const imageId = dropZone.dataset.imageId;
 
-                if (!base64Image) {
+                if (dropZone.dataset.uploading) {
+                    alert("Image is still uploading, please wait a moment.");
+                    return;
+                }
+                if (!imageId) {
                     alert("Please upload an image first.");
                     return;
                 }
@@ -144,7 +163,8 @@ document.addEventListener('DOMContentLoaded', () => {
                 // But to keep UX consistent (loader on dashboard), let's pass data.
 
                 localStorage.setItem('adsage_mode', 'pre');
-                localStorage.setItem('adsage_image', base64Image); // Warning: Storage limit
+                localStorage.setItem('adsage_image_id', imageId);
+                localStorage.removeItem('adsage_image');
                 localStorage.setItem('adsage_text', text);
                 localStorage.setItem('adsage_platform', platform);
                 localStorage.setItem('adsage_target', target);
@@ -184,26 +204,54 @@ document.addEventListener('DOMContentLoaded', () => {
             console.log("Analyzing Pre-Upload");
             payload = {
                 mode: 'pre',
-                image: localStorage.getItem('adsage_image'),
+                image_id: localStorage.getItem('adsage_image_id'),
                 text: localStorage.getItem('adsage_text'),
                 platform: localStorage.getItem('adsage_platform'),
                 target: localStorage.getItem('adsage_target')
             };
         }
 
+        // Stored results are served unless the page is opened with ?refresh=1
+        payload.force_refresh = new URLSearchParams(window.location.search).has('refresh');
+
+        // Revalidate the last result for this request instead of downloading it again
+        const cacheKey = JSON.stringify({ ...payload, force_refresh: undefined });
+        let lastResult = null;
+        try {
+            lastResult = JSON.parse(localStorage.getItem('adsage_last_analysis') || 'null');
+        } catch (e) {
+            lastResult = null;
+        }
+        const headers = { 'Content-Type': 'application/json' };
+        if (lastResult && lastResult.key === cacheKey && lastResult.etag) {
+            headers['If-None-Match'] = lastResult.etag;
+        }
+
         // Call the Backend API
         fetch(fetchUrl, {
             method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
+            headers: headers,
             body: JSON.stringify(payload)
         })
             .then(response => {
+                if (response.status === 304) {
+                    return lastResult.body;
+                }
                 if (!response.ok) {
                     throw new Error('Analysis failed ' + response.statusText);
                 }
-                return response.json();
+                const etag = response.headers.get('ETag');
+                return response.json().then(body => {
+                    if (etag && body.success) {
+                        try {
+                            localStorage.setItem('adsage_last_analysis', JSON.stringify({ key: cacheKey, etag: etag, body: body }));
+                        } catch (e) {
+                            // Storage full (large creatives); just skip revalidation next time
+                            console.warn('Could not keep analysis for revalidation:', e);
+                        }
+                    }
+                    return body;
+                });
             })
             .then(data => {
                 // Hide Loader
@@ -217,6 +265,13 @@ document.addEventListener('DOMContentLoaded', () => {
                     // Update Results
                     if (data.success && data.data) {
                         renderDashboard(data.data);
+                        if (data.reused) {
+                            // Served from an earlier analysis of a near-identical creative
+                            const summaryEl = document.getElementById('summaryText');
+                            if (summaryEl) {
+                                summaryEl.innerHTML += ` <span class="virality-badge" title="Image distance ${data.reused.image_distance}, caption similarity ${data.reused.caption_similarity}">Reused</span>`;
+                            }
+                        }
                     }
 
                     // Trigger Entrance Animation
@@ -313,7 +368,8 @@ document.addEventListener('DOMContentLoaded', () => {
         if (engScore && strategyData.engagement_metrics) {
             engScore.innerText = strategyData.engagement_metrics.score || "N/A";
             engLabel.innerText = strategyData.engagement_metrics.explanation || "Based on visual appeal";
-            virScore.innerHTML = `${strategyData.engagement_metrics.virality || "Medium"} <span class="virality-badge">Predicted</span>`;
+            const badge = strategyData.engagement_metrics.source === "computed" ? "Measured" : "Predicted";
+            virScore.innerHTML = `${strategyData.engagement_metrics.virality || "Medium"} <span class="virality-badge">${badge}</span>`;
         }
 
         // 6. Render Strategy Column (Hashtags vs Pros/Cons)
@@ -375,7 +431,7 @@ document.addEventListener('DOMContentLoaded', () => {
                     method: 'POST',
                     headers: { 'Content-Type': 'application/json' },
                     body: JSON.stringify({
-                        image: localStorage.getItem('adsage_image'),
+                        image_id: localStorage.getItem('adsage_image_id'),
                         content: localStorage.getItem('adsage_text') || localStorage.getItem('adsage_url'),
                         suggestions: suggestionsText
                     })
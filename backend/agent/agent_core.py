@@ -1,364 +1,723 @@
-from dotenv import load_dotenv
-load_dotenv()
-from google import generativeai as genai
-from tools.load_json import load_linkedin_comments
+from comment_index import comment_index
+from comments import load_corpus, parse_comments
+from scheduler import model_scheduler
+from token_budget import governor, estimate_tokens, BudgetExceeded
+from resilience import resilient_caller, contents_key
+from context_cache import context_cache, CONTEXT_INSTRUCTION
+from pipeline import Node, Pipeline, node_memo
+from metrics import engagement_metrics, strategist_summary
+from browser_pool import browser_pool, is_public_url
+from result_store import fingerprint, hash_file, hash_bytes
 import os
 import base64
 import io
-from PIL import Image
 import json
-import requests
-from bs4 import BeautifulSoup
+import hashlib
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-# Configure Gemini API
-api_key = os.environ.get('GEMINI_API_KEY') or os.environ.get('GOOGLE_API_KEY')
-if api_key:
-    genai.configure(api_key=api_key)
+# google.generativeai, PIL, requests and BeautifulSoup are imported lazily:
+# they dominate import time and not every code path (or process) needs them.
+_genai = None
+_http_session = None
+_models = {}
+_lazy_lock = threading.RLock()
 
-def run_analysis(data_file="linkedin_comments.json", platform="linkedin", url=None):
+
+def get_genai():
+    """Imports and configures the Gemini SDK on first use."""
+    global _genai
+    if _genai is None:
+        with _lazy_lock:
+            if _genai is None:
+                from google import generativeai as genai
+                # Configure Gemini API
+                api_key = os.environ.get('GEMINI_API_KEY') or os.environ.get('GOOGLE_API_KEY')
+                if api_key:
+                    genai.configure(api_key=api_key)
+                _genai = genai
+    return _genai
+
+
+def get_model(model_name='gemini-2.5-flash', system_instruction=None, generation_config=None):
     """
-    Runs the multi-agent analysis on existing comments (Post-Launch).
-    If a URL is provided, it attempts to scrape/simulate comments for that URL.
+    Models are stateless, so one instance per (model, instruction, config)
+    is built once and shared across requests.
     """
-    results = {
-        "youth_analysis": "",
-        "adult_analysis": "",
-        "strategy": "",
-        "error": None
-    }
+    key = (model_name, system_instruction, json.dumps(generation_config, sort_keys=True))
+    model = _models.get(key)
+    if model is None:
+        with _lazy_lock:
+            model = _models.get(key)
+            if model is None:
+                model = get_genai().GenerativeModel(
+                    model_name=model_name,
+                    system_instruction=system_instruction,
+                    generation_config=generation_config
+                )
+                _models[key] = model
+    return model
 
-    print(f"STEP 1: Starting analysis for {platform}...")
 
+def get_http_session():
+    """Shared keep-alive session for page scraping."""
+    global _http_session
+    if _http_session is None:
+        with _lazy_lock:
+            if _http_session is None:
+                import requests
+                _http_session = requests.Session()
+    return _http_session
+
+def system_instruction_text(model):
+    """
+    The system instruction a model sends with every call, as text.
+    The SDK keeps it as a Content proto; models reading a cached context carry
+    theirs in the cache, which was charged when it was created.
+    """
+    if getattr(model, "cached_content", None):
+        return None
+    instruction = getattr(model, "_system_instruction", None)
+    if instruction is None or isinstance(instruction, str):
+        return instruction
+    parts = getattr(instruction, "parts", None)
+    if parts is not None:
+        return "".join(getattr(part, "text", "") for part in parts)
+    return str(instruction)
+
+
+def generate(model, contents, budget=None, stage="model", context_key=None):
+    """
+    Single entry point for model calls, so every request in the process
+    shares the same scheduler, token accounting, deadlines and per-model circuit breakers.
+    context_key identifies cached content the model reads, if any.
+    """
+    if budget is None:
+        budget = governor.start_request()
+    estimated = budget.reserve(stage, contents, system_instruction_text(model))
+    timeout = resilient_caller.deadline_for(stage)
+
+    # Queue for quota before the deadline starts: a batch call waiting its turn hasn't stalled
+    model_scheduler.acquire(budget.priority)
+    call, answered = model_scheduler.per_attempt(
+        lambda: model.generate_content(contents, request_options={"timeout": timeout}),
+        budget.priority, stage, timeout
+    )
+
+    model_name = getattr(model, "model_name", "")
+    fallback_key = contents_key(model_name, f'{getattr(model, "_system_instruction", None)}\0{context_key}', contents)
     try:
-        # Test API configuration
-        if not os.environ.get('GEMINI_API_KEY') and not os.environ.get('GOOGLE_API_KEY'):
-            raise Exception("GEMINI_API_KEY or GOOGLE_API_KEY environment variable not set")
-        print("STEP 2: API configured successfully.")
-    except Exception as e:
-        error_msg = f"Failed to configure genai: {e}"
-        print(f"❌ ERROR: {error_msg}")
-        results["error"] = error_msg
-        return results
+        response = resilient_caller.call(stage, call, fallback_key=fallback_key, upstream=model_name)
+    finally:
+        answered.set()
+    budget.record(stage, estimated, response)
+    return response
 
-    # Helper to load prompts safely
-    def load_prompt(filename):
-        try:
-            base_dir = os.path.dirname(os.path.abspath(__file__))
-            path = os.path.join(base_dir, "prompts", filename)
-            with open(path, "r") as f:
-                return f.read()
-        except Exception as e:
-            print(f"❌ ERROR: Cannot load prompt {filename}: {e}")
-            return None
 
-    # --- Data Source Handling ---
-    comments_text = ""
-    
-    if url and url != "demo":
-        print(f"STEP 2.5: Analyzing URL: {url}")
-        try:
-            # Simple scrape attempt for context
-            headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-            page_text = ""
-            try:
-                resp = requests.get(url, headers=headers, timeout=5)
-                if resp.status_code == 200:
-                    soup = BeautifulSoup(resp.content, 'html.parser')
-                    title = soup.title.string if soup.title else ""
-                    meta = soup.find('meta', attrs={'name': 'description'})
-                    desc = meta['content'] if meta else ""
-                    page_text = f"Page Title: {title}\nDescription: {desc}"
-            except:
-                print("Direct scraping failed/blocked. Proceeding with URL simulation.")
-            
-            # Use LLM to generate realistic comments
-            print("STEP 2.6: Generating synthetic comments for URL...")
-            simulator_model = genai.GenerativeModel('gemini-2.5-flash')
-            simulator_prompt = f"""
-            You are a Social Media Simulator. The user provided this URL: {url}
-            Context extracted: {page_text}
-            
-            Please generate a JSON dataset of 20 realistic comments that would likely appear on this post.
-            Include a mix of ages (Youth/Adult), sentiments, and styles appropriate for {platform}.
-            
-            Format:
-            [
-                {{"user": "User1", "comment": "...", "age_group": "18-30"}},
-                {{"user": "User2", "comment": "...", "age_group": "30-50"}}
-            ]
-            Return ONLY raw JSON.
-            """
-            sim_resp = simulator_model.generate_content(simulator_prompt)
-            comments_text = sim_resp.text
-            print("STEP 2.7: Synthetic comments generated.")
-            
-        except Exception as e:
-            print(f"Error simulating URL data: {e}")
-            comments_text = "[]" 
-    else:
-        # Fallback to local file
-        data_source_name = "linkedin_comments.json"
-        if platform == "instagram":
-             data_source_name = "instagram_comments.json"
-             
-        # Use absolute path to ensure file is found
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        file_path = os.path.join(base_dir, data_source_name)
-        
-        print(f"STEP 2.5: Loading local file: {file_path}")
-        if os.path.exists(file_path):
-            with open(file_path, 'r') as f:
-                comments_text = f.read()
-        else:
-             print(f"❌ File not found: {file_path}")
-             return {"error": f"Data file not found: {data_source_name}"}
-
-    # Determine Prompts based on Platform
-    if platform.lower() == "instagram":
-        prompt_youth = "analyze_instagram_18_30.prompt"
-        prompt_adult = "analyze_instagram_30_50.prompt"
-    else:
-        prompt_youth = "analyze_campaign.prompt"
-        prompt_adult = "analyze_campaign_30_50.prompt"
-        
-    # Fallback to existing file if specific one missing
-    # This block is now redundant due to the new data source handling, but keeping it as per instruction to not make unrelated edits.
-    # The `data_source_name` variable is now local to the `else` block above.
-    # if not os.path.exists(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", data_source_name)):
-    #      data_source_name = data_file 
+def _create_context(model_name, text, ttl, priority="interactive"):
+    model_scheduler.acquire(priority)
+    return get_genai().caching.CachedContent.create(
+        model=f"models/{model_name}",
+        display_name="comments",
+        system_instruction=CONTEXT_INSTRUCTION,
+        contents=[text],
+        ttl=ttl
+    )
 
-    # --- Agent for 18-30 Age Group ---
+
+def _stale_context_errors():
+    """SDK errors meaning a cached context can't be used (expired, deleted or rejected)."""
     try:
-        instructions = load_prompt(prompt_youth)
-        if not instructions:
-            raise Exception(f"Failed to load {prompt_youth}")
-        
-        print(f"STEP 3: Loaded prompt (18-30) for {platform}.")
+        from google.api_core import exceptions
+    except ImportError:
+        return ()
+    return (exceptions.NotFound, exceptions.InvalidArgument)
 
-        # Load the comments data
-        # comments_data = load_linkedin_comments(data_source_name) # Removed
-        # comments_text = json.dumps(comments_data, indent=2) # Removed
-        
-        # Create model with system instruction
-        model = genai.GenerativeModel(
-            model_name='gemini-2.5-flash',
-            system_instruction=instructions
-        )
-        print("STEP 4: Model (18-30) created.")
 
-        print("STEP 5: Sending message to agent (18-30)...")
-        
-        # Generate response
-        full_prompt = f"Here is the comments data from {platform}:\n\n{comments_text[:30000]}\n\nPlease analyze these comments according to the instructions for the 18-30 age group."
-        response = model.generate_content(full_prompt)
+def analyze_comments(instructions, request_text, comments_text, platform, budget, stage):
+    """
+    Runs one persona over the comments corpus.
+    The corpus is uploaded once as shared cached context and referenced by every
+    persona (the persona instructions then travel with the request); when caching
+    is unavailable the comments are sent inline under the persona's system instruction.
+    """
+    model_name = 'gemini-2.5-flash'
+    shared = context_cache.get(model_name, comments_text,
+                               lambda name, text, ttl: _create_context(name, text, ttl, budget.priority),
+                               on_create=lambda text: budget.reserve("shared_context", text))
+    if shared is not None:
+        try:
+            model = get_genai().GenerativeModel.from_cached_content(cached_content=shared)
+            prompt = f"{instructions}\n\n---\n\nThe comments data from {platform} is in the cached context.\n\n{request_text}"
+            return generate(model, prompt, budget, stage, context_key=context_cache.key(model_name, comments_text))
+        except _stale_context_errors() as e:
+            # Deadlines, open circuits and budget errors propagate: resending inline wouldn't help
+            print(f"⚠️  Shared context rejected ({e}); sending comments inline.")
+            context_cache.invalidate(model_name, comments_text)
+
+    model = get_model(model_name=model_name, system_instruction=instructions)
+    full_prompt = f"Here is the comments data from {platform}:\n\n{comments_text}\n\n{request_text}"
+    return generate(model, full_prompt, budget, stage)
+
 
-        print("STEP 6: Response (18-30) received.")
-        results["youth_analysis"] = response.text
+# Bump when the inline persona/strategist instructions in this file change
+PROMPT_VERSION = "1"
 
+
+def prompt_version():
+    """
+    Version tag covering the prompt files and the inline prompts.
+    Used to fingerprint stored analyses so prompt edits invalidate them.
+    """
+    digest = hashlib.sha256(PROMPT_VERSION.encode())
+    prompts_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts")
+    for name in sorted(os.listdir(prompts_dir)):
+        with open(os.path.join(prompts_dir, name), "rb") as f:
+            digest.update(name.encode())
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def load_prompt(filename):
+    """Reads a prompt file from prompts/; None (and a logged error) when it can't be read."""
+    try:
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        path = os.path.join(base_dir, "prompts", filename)
+        with open(path, "r") as f:
+            return f.read()
     except Exception as e:
-        print(f"❌ ERROR during 18-30 agent execution: {e}")
+        print(f"❌ ERROR: Cannot load prompt {filename}: {e}")
+        return None
 
-    # --- Agent for 30-50 Age Group ---
-    print("-" * 30)
+
+def check_api_key():
+    """Returns an error message when no Gemini API key is configured."""
+    if not os.environ.get('GEMINI_API_KEY') and not os.environ.get('GOOGLE_API_KEY'):
+        return "Failed to configure genai: GEMINI_API_KEY or GOOGLE_API_KEY environment variable not set"
+    print("STEP 2: API configured successfully.")
+    return None
+
+
+def is_live_url(url):
+    return bool(url) and url != "demo"
+
+
+# Determine Prompts based on Platform
+PERSONA_PROMPTS = {
+    "instagram": {"youth": "analyze_instagram_18_30.prompt", "adult": "analyze_instagram_30_50.prompt"},
+    "linkedin": {"youth": "analyze_campaign.prompt", "adult": "analyze_campaign_30_50.prompt"},
+}
+
+
+# --- Pipeline nodes (each called as fn(context, **inputs)) ---
+
+def node_page_context(ctx, url):
+    """Title and description of a post URL, as context for the comment simulator."""
+    if not is_live_url(url):
+        return ""
+    if not browser_pool.allow_private_hosts and not is_public_url(url):
+        print(f"Not fetching {url}: not a public http(s) URL. Proceeding with URL simulation.")
+        return ""
+    print(f"STEP 2.5: Analyzing URL: {url}")
+    # Simple scrape attempt for context
+    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+    title = desc = ""
     try:
-        instructions_30_50 = load_prompt(prompt_adult)
-        if not instructions_30_50:
-            raise Exception(f"Failed to load {prompt_adult}")
-            
-        print(f"STEP 7: Loaded 30-50 prompt for {platform}.")
-        
-        # Create model with system instruction
-        model_30_50 = genai.GenerativeModel(
-            model_name='gemini-2.5-flash',
-            system_instruction=instructions_30_50
-        )
-        print("STEP 8: Model (30-50) created.")
-        
-        print("STEP 9: Sending message to agent (30-50)...")
-        
-        # Generate response
-        full_prompt_30_50 = f"Here is the comments data from {platform}:\n\n{comments_text[:30000]}\n\nPlease analyze these comments according to the instructions for the 30-50 age group."
-        response_30_50 = model_30_50.generate_content(full_prompt_30_50)
+        # A redirect could point anywhere; redirected posts fall through to the browser, which checks them
+        resp = get_http_session().get(url, headers=headers, timeout=5, allow_redirects=False)
+        if resp.status_code == 200:
+            from bs4 import BeautifulSoup
+            soup = BeautifulSoup(resp.content, 'html.parser')
+            title = soup.title.string if soup.title else ""
+            meta = soup.find('meta', attrs={'name': 'description'})
+            desc = meta['content'] if meta else ""
+    except Exception:
+        pass
+    if not (title or desc):
+        # Blocked or script-rendered: render it in the warm browser pool
+        print("Direct scraping failed/blocked. Trying headless browser...")
+        rendered = browser_pool.fetch_metadata(url)
+        if rendered:
+            title, desc = rendered.get("title", ""), rendered.get("description", "")
+    if title or desc:
+        return ctx["budget"].fit(f"Page Title: {title}\nDescription: {desc}", "page_context", max_tokens=1000)
+    print("No page context available. Proceeding with URL simulation.")
+    return ""
+
+
+def node_simulated_comments(ctx, url, platform, page_context):
+    """Synthetic comments for a URL we can't read comments from; '' for local data or on failure."""
+    if not is_live_url(url):
+        return ""
+    try:
+        # Use LLM to generate realistic comments
+        print("STEP 2.6: Generating synthetic comments for URL...")
+        simulator_model = get_model('gemini-2.5-flash')
+        simulator_prompt = f"""
+        You are a Social Media Simulator. The user provided this URL: {url}
+        Context extracted: {page_context}
         
-        print("STEP 10: Response (30-50) received.")
-        results["adult_analysis"] = response_30_50.text
+        Please generate a JSON dataset of 20 realistic comments that would likely appear on this post.
+        Include a mix of ages (Youth/Adult), sentiments, and styles appropriate for {platform}.
         
+        Format:
+        [
+            {{"user": "User1", "comment": "...", "age_group": "18-30"}},
+            {{"user": "User2", "comment": "...", "age_group": "30-50"}}
+        ]
+        Return ONLY raw JSON.
+        """
+        sim_resp = generate(simulator_model, simulator_prompt, ctx["budget"], "simulator")
+        print("STEP 2.7: Synthetic comments generated.")
+        return sim_resp.text
+    except BudgetExceeded:
+        raise
     except Exception as e:
-        print(f"❌ ERROR during 30-50 agent execution: {e}")
+        print(f"Error simulating URL data: {e}")
+        return ""
+
+
+def node_comments(ctx, url, platform, simulated_comments, data_file=None):
+    """
+    The comments both personas read: simulated ones for a URL, otherwise the
+    export at data_file or the bundled corpus for the platform. Indexes them
+    for /comments as a side effect.
+    """
+    if is_live_url(url):
+        comments_text = simulated_comments or "[]"
+        if simulated_comments:
+            index_comments_text(url, simulated_comments, platform)
+    else:
+        # Fallback to local file
+        data_source_name, comments_text = load_local_corpus(platform, data_file)
+        if comments_text is None:
+            raise FileNotFoundError(f"Data file not found: {data_source_name}")
+
+    # The strategist still needs room (and without a shared context both personas re-send the comments), so cap at a third
+    budget = ctx["budget"]
+    return budget.fit(comments_text, "comments", max_tokens=budget.remaining // 3)
 
-    # --- Strategist Agent ---
-    return run_strategist(results, load_prompt, mode="post")
 
+def persona_prompt_node(persona):
+    def node(ctx, platform):
+        filename = PERSONA_PROMPTS.get(platform.lower(), PERSONA_PROMPTS["linkedin"])[persona]
+        return load_prompt(filename)
+    return node
 
-def run_pre_analysis(image_b64, text_content, platform="linkedin", target_group="all"):
+
+def comments_persona_node(persona, label):
     """
-    Runs the predictive analysis on a creative (Image + Text).
+    Post-launch persona over the comments corpus; '' if it fails so the other
+    persona still counts. An exhausted budget aborts the analysis instead.
     """
-    results = {
-        "youth_analysis": "",
-        "adult_analysis": "",
-        "strategy": "",
-        "error": None
-    }
-    
-    print(f"STEP 1: Starting PRE-analysis for {platform} targeting {target_group}...")
+    def node(ctx, instructions, comments, platform):
+        try:
+            if not instructions:
+                raise Exception(f"Failed to load the {label} prompt for {platform}")
+            print(f"STEP: Sending message to agent ({label})...")
+            # The comments are shared between personas via the context cache
+            response = analyze_comments(
+                instructions,
+                f"Please analyze these comments according to the instructions for the {label} age group.",
+                comments, platform, ctx["budget"], persona
+            )
+            print(f"STEP: Response ({label}) received.")
+            return response.text
+        except BudgetExceeded:
+            raise
+        except Exception as e:
+            print(f"❌ ERROR during {label} agent execution: {e}")
+            return ""
+    return node
+
+
+def node_strategist_instructions(ctx):
+    return load_prompt("negotiate_suggestions.prompt")
 
-    # Decode Image
+
+def node_metrics(ctx, url, platform, data_file=None):
+    """
+    Measured engagement metrics for the analyzed comments (pandas/NumPy, no model call).
+    None when there is nothing to measure (simulated comments carry no engagement
+    numbers) or on failure; the strategist then estimates them as before.
+    """
+    if is_live_url(url):
+        return None
     try:
-        if "base64," in image_b64:
-            image_b64 = image_b64.split("base64,")[1]
-        
-        image_data = base64.b64decode(image_b64)
-        image = Image.open(io.BytesIO(image_data))
-        print("STEP 2.5: Image decoded successfully.")
+        return engagement_metrics(load_corpus(data_file or local_corpus_path(platform), platform).comments)
     except Exception as e:
-        return {"error": f"Invalid image data: {e}"}
+        print(f"⚠️  Engagement metrics unavailable: {e}")
+        return None
+
+
+def node_strategy(ctx, instructions, youth, adult, mode, metrics=None):
+    """Strategist synthesis of the persona analyses into the dashboard JSON."""
+    if not (youth or adult):
+        raise ValueError("No analysis generated from agents.")
+    if not instructions:
+        raise ValueError("Failed to load negotiate_suggestions.prompt")
+    return strategize(instructions, youth, adult, mode, ctx["budget"], metrics=metrics)
+
+
+def analysis_results(outputs, report):
+    """Maps pipeline outputs onto the result dict the server and callers expect."""
+    error = None
+    for name in ("comments", "strategy"):
+        if report.get(name, {}).get("status") in ("error", "skipped"):
+            error = report[name]["error"]
+            break
+    return {
+        "youth_analysis": outputs.get("youth") or "",
+        "adult_analysis": outputs.get("adult") or "",
+        "strategy": outputs.get("strategy") or "",
+        "error": error,
+        "pipeline": report
+    }
+
+
+POST_LAUNCH_PIPELINE = Pipeline("post_launch", [
+    Node("page_context", node_page_context, ["url"], memoize=False),
+    Node("simulated_comments", node_simulated_comments, ["url", "platform", "page_context"], version=PROMPT_VERSION),
+    Node("comments", node_comments, ["url", "platform", "simulated_comments", "data_file"], memoize=False),
+    Node("youth_instructions", persona_prompt_node("youth"), ["platform"], memoize=False),
+    Node("adult_instructions", persona_prompt_node("adult"), ["platform"], memoize=False),
+    Node("strategist_instructions", node_strategist_instructions, memoize=False),
+    Node("youth", comments_persona_node("youth", "18-30"),
+         {"instructions": "youth_instructions", "comments": "comments", "platform": "platform"}, version=PROMPT_VERSION),
+    Node("adult", comments_persona_node("adult", "30-50"),
+         {"instructions": "adult_instructions", "comments": "comments", "platform": "platform"}, version=PROMPT_VERSION),
+    Node("metrics", node_metrics, ["url", "platform", "data_file"], memoize=False),
+    Node("strategy", node_strategy,
+         {"instructions": "strategist_instructions", "youth": "youth", "adult": "adult", "mode": "mode",
+          "metrics": "metrics"}, version=PROMPT_VERSION),
+], memo=node_memo, abort_on=(BudgetExceeded,))
+
+
+def run_analysis(data_file=None, platform="linkedin", url=None, budget=None, force=False):
+    """
+    Runs the multi-agent analysis on existing comments (Post-Launch).
+    If a URL is provided, it attempts to scrape/simulate comments for that URL;
+    otherwise it reads the comments export at data_file (default: the bundled
+    corpus for the platform). force skips memoized stage outputs.
+    """
+    budget = budget or governor.start_request()
+    print(f"STEP 1: Starting analysis for {platform}...")
+
+    error = check_api_key()
+    if error:
+        print(f"❌ ERROR: {error}")
+        return {"youth_analysis": "", "adult_analysis": "", "strategy": "", "error": error}
+
+    outputs, report = POST_LAUNCH_PIPELINE.run(
+        {"url": url, "platform": platform, "mode": "post", "data_file": data_file}, context={"budget": budget}, force=force
+    )
+    return analysis_results(outputs, report)
+
+
+def local_corpus_name(platform="linkedin"):
+    """Name of the bundled comments file for a platform."""
+    if platform == "instagram":
+        return "instagram_comments.json"
+    return "linkedin_comments.json"
+
+
+def local_corpus_path(platform="linkedin"):
+    """Absolute path of the bundled comments file for a platform."""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), local_corpus_name(platform))
+
 
+def post_fingerprint(platform="linkedin", url=None, data_file=None):
+    """
+    Result-store fingerprint of a post-launch analysis: the URL for live posts,
+    otherwise the content of the comments export it reads.
+    """
+    live = is_live_url(url)
+    return fingerprint(
+        mode="post",
+        url=url if live else None,
+        data_file_hash=None if live else hash_file(data_file or local_corpus_path(platform)),
+        platform=platform,
+        prompt_version=prompt_version()
+    )
+
+
+_indexed_corpora = {}
+# Reindexed corpora whose stored trend labels haven't been copied onto the index yet
+_verdicts_pending = set()
+
+
+def load_local_corpus(platform="linkedin", path=None):
+    """
+    Loads a comments export (default: the bundled file for the platform) and
+    indexes it for /comments. Parsing is cached per file version, so repeat
+    calls don't touch the JSON again. Stored trend labels are copied onto a
+    reindexed corpus later, by apply_pending_verdicts.
+    Returns (data_source_name, comments_text); comments_text is None if the file is missing.
+    """
+    data_source_name = os.path.basename(path) if path else local_corpus_name(platform)
+
+    # Use absolute path to ensure file is found
+    file_path = os.path.abspath(path) if path else local_corpus_path(platform)
+
+    print(f"STEP 2.5: Loading local file: {file_path}")
     try:
-        if not os.environ.get('GEMINI_API_KEY') and not os.environ.get('GOOGLE_API_KEY'):
-            raise Exception("GEMINI_API_KEY or GOOGLE_API_KEY environment variable not set")
-        print("STEP 2: API configured successfully.")
+        corpus = load_corpus(file_path, platform)
+    except (OSError, ValueError) as e:
+        print(f"❌ Cannot load {file_path}: {e}")
+        return data_source_name, None
+
+    # A new Corpus object means the file changed on disk; the index update is incremental
+    if _indexed_corpora.get(data_source_name) is not corpus:
+        added = comment_index.add_comments(data_source_name, corpus.comments, platform, replace=True)
+        _indexed_corpora[data_source_name] = corpus
+        _verdicts_pending.add(data_source_name)
+        print(f"STEP 2.8: Indexed {added} new comments for {data_source_name}.")
+    return data_source_name, corpus.text
+
+
+def index_verdicts(corpus_name):
+    """Copies the age groups the trend classifier stored onto the indexed comments; returns how many it set."""
+    from trends import get_trend_store
+
+    _verdicts_pending.discard(corpus_name)
+    labels = get_trend_store().labels(corpus_name)
+    return sum(comment_index.set_verdict(corpus_name, comment_id, age_group)
+               for comment_id, (age_group, _) in labels.items())
+
+
+def apply_pending_verdicts():
+    """
+    Runs index_verdicts for corpora reindexed since their labels were last copied.
+    Called where verdicts are read (/comments), so loading a corpus for an
+    analysis never opens the trend store.
+    """
+    for corpus_name in list(_verdicts_pending):
+        index_verdicts(corpus_name)
+
+
+def index_comments_text(corpus, comments_text, platform="linkedin"):
+    """
+    Parses a JSON comments payload and adds it to the in-memory comment index.
+    Unparseable payloads are skipped; indexing must never break an analysis.
+    """
+    try:
+        text = comments_text.strip()
+        if text.startswith("```"):
+            text = text.strip("`")
+            if text.startswith("json"):
+                text = text[4:]
+        comments = parse_comments(json.loads(text), platform)
+        added = comment_index.add_comments(corpus, comments, replace=True)
+        print(f"STEP 2.8: Indexed {added} new comments for {corpus}.")
     except Exception as e:
-        return {"error": f"Failed to configure genai: {e}"}
+        print(f"❌ Could not index comments for {corpus}: {e}")
 
-    # Helper to load prompts safely
-    def load_prompt(filename):
-        try:
-            base_dir = os.path.dirname(os.path.abspath(__file__))
-            path = os.path.join(base_dir, "prompts", filename)
-            with open(path, "r") as f:
-                return f.read()
-        except Exception as e:
-            print(f"❌ ERROR: Cannot load prompt {filename}: {e}")
-            return None
 
-    # --- Agents ---
-    
-    run_youth = target_group in ["all", "youth"]
-    run_adult = target_group in ["all", "adult"]
+def decode_image(image_b64):
+    """
+    Decodes a base64 (or data URL) image into a fully loaded PIL image,
+    safe to share between concurrent persona calls.
+    """
+    if "base64," in image_b64:
+        image_b64 = image_b64.split("base64,")[1]
+
+    return open_image(base64.b64decode(image_b64))
+
+
+def open_image(image_data):
+    """Opens raw image bytes as a fully loaded PIL image."""
+    from PIL import Image
+    image = Image.open(io.BytesIO(image_data))
+    image.load()
+    # Same id the image store would give these bytes
+    image.content_id = hash_bytes(image_data)
+    return image
 
-    prompt_base = f"""
+
+YOUTH_PERSONA = "You are a Gen-Z digital native (age 18-24). You are critical of ads. You value authenticity, aesthetics, and humor. You hate corporate speak."
+ADULT_PERSONA = "You are a working professional (age 35-50). You value clarity, value propositions, and professionalism. You are skeptical of clickbait."
+
+def creative_persona_node(persona, system_instruction, label):
+    """Pre-launch persona over the creative; '' when not targeted or on failure (other than an exhausted budget)."""
+    def node(ctx, platform, caption, image, target_group):
+        if target_group not in ("all", persona):
+            return ""
+        prompt_base = f"""
     You are analyzing a marketing creative for {platform}.
-    Please look at the attached image and the following caption: "{text_content}"
+    Please look at the attached image and the following caption: "{caption}"
     
     Predict the reaction. Will it work? Is it 'cringe' or 'cool' (if youth)? Is it 'trustworthy' or 'spammy' (if adult)?
     Be specific about the visual elements and the copy.
     """
-
-    if run_youth:
         try:
-            print("STEP: Running Youth Agent (Pre)...")
-            model_youth = genai.GenerativeModel(
-                model_name='gemini-2.5-flash',
-                system_instruction="You are a Gen-Z digital native (age 18-24). You are critical of ads. You value authenticity, aesthetics, and humor. You hate corporate speak."
-            )
-            response = model_youth.generate_content([prompt_base, image])
-            results["youth_analysis"] = response.text
-            print("STEP: Youth analysis done.")
+            print(f"STEP: Running {label} Agent (Pre)...")
+            model = get_model(system_instruction=system_instruction)
+            response = generate(model, [prompt_base, image], ctx["budget"], persona)
+            print(f"STEP: {label} analysis done.")
+            return response.text
+        except BudgetExceeded:
+            raise
         except Exception as e:
-            print(f"❌ Youth Agent Error: {e}")
+            print(f"❌ {label} Agent Error: {e}")
+            return ""
+    return node
 
-    if run_adult:
-        try:
-            print("STEP: Running Adult Agent (Pre)...")
-            model_adult = genai.GenerativeModel(
-                model_name='gemini-2.5-flash',
-                system_instruction="You are a working professional (age 35-50). You value clarity, value propositions, and professionalism. You are skeptical of clickbait."
-            )
-            response = model_adult.generate_content([prompt_base, image])
-            results["adult_analysis"] = response.text
-            print("STEP: Adult analysis done.")
-        except Exception as e:
-            print(f"❌ Adult Agent Error: {e}")
 
-    # --- Strategist Agent ---
-    return run_strategist(results, load_prompt, mode="pre")
+PRE_LAUNCH_PIPELINE = Pipeline("pre_launch", [
+    Node("strategist_instructions", node_strategist_instructions, memoize=False),
+    Node("youth", creative_persona_node("youth", YOUTH_PERSONA, "Youth"),
+         ["platform", "caption", "image", "target_group"], version=PROMPT_VERSION),
+    Node("adult", creative_persona_node("adult", ADULT_PERSONA, "Adult"),
+         ["platform", "caption", "image", "target_group"], version=PROMPT_VERSION),
+    Node("strategy", node_strategy,
+         {"instructions": "strategist_instructions", "youth": "youth", "adult": "adult", "mode": "mode"}, version=PROMPT_VERSION),
+], memo=node_memo, abort_on=(BudgetExceeded,))
 
 
-def run_strategist(results, load_prompt_func, mode="post"):
+def run_pre_analysis(image_b64, text_content, platform="linkedin", target_group="all", image=None, budget=None, force=False):
     """
-    Common strategist logic to synthesize results into the final JSON dashboard format.
-    mode: 'post' (includes hashtags) or 'pre' (includes pros/cons)
+    Runs the predictive analysis on a creative (Image + Text).
+    force skips memoized stage outputs.
     """
-    if results["youth_analysis"] or results["adult_analysis"]:
-        print("-" * 30)
+    budget = budget or governor.start_request()
+    text_content = budget.fit(text_content, "caption", max_tokens=2000)
+
+    print(f"STEP 1: Starting PRE-analysis for {platform} targeting {target_group}...")
+
+    # Decode Image (callers scoring several captions pass an already decoded one)
+    if image is None:
         try:
-            instructions_strategist = load_prompt_func("negotiate_suggestions.prompt")
-            
-            # Dynamic JSON Structure Definition
-            additional_fields = ""
-            if mode == "pre":
-                additional_fields = """
-                "pros_cons": {
-                    "pros": ["list of strong points..."],
-                    "cons": ["list of weak points..."]
-                },
-                """
-            else:
-                additional_fields = """
-                "hashtag_strategy": {
-                    "trending": ["#Trend1", "#Trend2"],
-                    "niche": ["#Niche1", "#Niche2"],
-                    "insight": "Explain why these tags were chosen..."
-                },
-                """
-
-            # Complete JSON Instruction
-            instructions_strategist += f"""
-            
-            CRITICAL: You must output your response in valid JSON format ONLY. 
-            Structure:
-            {{
-                "final_verdict": "HTML string with bold verdict and explanation. Keep it under 50 words.",
-                "tone_analysis": {{
-                    "label": "e.g. Inspirational",
-                    "score": 88
-                }},
-                "engagement_metrics": {{
-                    "score": "8.5/10",
-                    "virality": "High/Medium/Low",
-                    "explanation": "Brief reason"
-                }},
-                {additional_fields}
-                "strategic_suggestions": [
-                    {{"title": "...", "priority": "High/Medium", "description": "..."}}
-                ],
-                "shared_positives": ["points that both groups liked..."]
-            }}
-            Do not use markdown code blocks like ```json. Return raw JSON.
-            """
-            
-            model_strategist = genai.GenerativeModel(
-                model_name='gemini-2.5-flash',
-                system_instruction=instructions_strategist
-            )
-            
-            strategist_message = f"""
-            Analysis 1 (Youth): {results.get('youth_analysis', 'N/A')}
-            Analysis 2 (Adult): {results.get('adult_analysis', 'N/A')}
-            
-            Synthesize a strategy for this campaign properly.
-            """
-            
-            print("STEP: Sending to Strategist...")
-            response_strategist = model_strategist.generate_content(strategist_message)
-            results["strategy"] = response_strategist.text
-            print("STEP: Strategist done.")
-            
+            image = decode_image(image_b64)
+            print("STEP 2.5: Image decoded successfully.")
         except Exception as e:
-            print(f"❌ Strategist Error: {e}")
-            results["error"] = str(e)
+            return {"error": f"Invalid image data: {e}"}
+
+    error = check_api_key()
+    if error:
+        return {"error": error}
+
+    outputs, report = PRE_LAUNCH_PIPELINE.run(
+        {"platform": platform, "caption": text_content, "image": image, "target_group": target_group, "mode": "pre"},
+        context={"budget": budget}, force=force
+    )
+    return analysis_results(outputs, report)
+
+
+def strategist_instruction(instructions_strategist, mode="post", measured=False):
+    """
+    Full strategist system instruction: the prompt file plus the JSON structure
+    for the mode. measured drops the estimated engagement block.
+    """
+    # Dynamic JSON Structure Definition
+    additional_fields = ""
+    if mode == "pre":
+        additional_fields = """
+        "pros_cons": {
+            "pros": ["list of strong points..."],
+            "cons": ["list of weak points..."]
+        },
+        """
     else:
-        results["error"] = "No analysis generated from agents."
+        additional_fields = """
+        "hashtag_strategy": {
+            "trending": ["#Trend1", "#Trend2"],
+            "niche": ["#Niche1", "#Niche2"],
+            "insight": "Explain why these tags were chosen..."
+        },
+        """
 
-    return results
+    # Measured metrics replace the estimated engagement block
+    engagement_field = "" if measured else """
+        "engagement_metrics": {
+            "score": "8.5/10",
+            "virality": "High/Medium/Low",
+            "explanation": "Brief reason"
+        },"""
+
+    # Complete JSON Instruction
+    instructions_strategist += f"""
 
-def apply_changes(image_b64, text_content, suggestions):
+    CRITICAL: You must output your response in valid JSON format ONLY. 
+    Structure:
+    {{
+        "final_verdict": "HTML string with bold verdict and explanation. Keep it under 50 words.",
+        "tone_analysis": {{
+            "label": "e.g. Inspirational",
+            "score": 88
+        }},
+        {engagement_field}
+        {additional_fields}
+        "strategic_suggestions": [
+            {{"title": "...", "priority": "High/Medium", "description": "..."}}
+        ],
+        "shared_positives": ["points that both groups liked..."]
+    }}
+    Do not use markdown code blocks like ```json. Return raw JSON.
+    """
+
+    return instructions_strategist
+
+
+def strategize(instructions_strategist, youth_analysis, adult_analysis, mode="post", budget=None, metrics=None):
+    """
+    Common strategist logic to synthesize persona analyses into the final JSON dashboard format.
+    mode: 'post' (includes hashtags) or 'pre' (includes pros/cons)
+    metrics: measured engagement metrics; when given, the strategist reasons over them
+    and engagement_metrics is filled from them instead of being estimated.
+    """
+    budget = budget or governor.start_request()
+    print("-" * 30)
+
+    instructions_strategist = strategist_instruction(instructions_strategist, mode, measured=bool(metrics))
+    model_strategist = get_model(
+        model_name='gemini-2.5-flash',
+        system_instruction=instructions_strategist
+    )
+
+    share = budget.remaining // 3
+    youth = budget.fit(youth_analysis or 'N/A', "youth_analysis", max_tokens=share)
+    adult = budget.fit(adult_analysis or 'N/A', "adult_analysis", max_tokens=share)
+    metrics_block = ""
+    if metrics:
+        metrics_block = f"Measured engagement metrics (authoritative, do not re-estimate): {json.dumps(strategist_summary(metrics), ensure_ascii=False)}"
+    strategist_message = f"""
+    Analysis 1 (Youth): {youth}
+    Analysis 2 (Adult): {adult}
+    {metrics_block}
+
+    Synthesize a strategy for this campaign properly.
+    """
+
+    print("STEP: Sending to Strategist...")
+    response_strategist = generate(model_strategist, strategist_message, budget, "strategist")
+    print("STEP: Strategist done.")
+    if not metrics:
+        return response_strategist.text
+    text = response_strategist.text.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        if text.startswith("json"):
+            text = text[4:]
+    try:
+        strategy = json.loads(text)
+    except ValueError:
+        return response_strategist.text
+    strategy["engagement_metrics"] = dict(metrics["dashboard"], details={
+        k: metrics[k] for k in ("rates", "reaction_mix", "velocity", "outliers")
+    })
+    return json.dumps(strategy, ensure_ascii=False)
+
+
+def apply_changes(image_b64, text_content, suggestions, budget=None):
     """
     Applies strategic suggestions to the content and generates a new image prompt.
     """
+    budget = budget or governor.start_request()
+    text_content = budget.fit(text_content, "content", max_tokens=2000)
+    suggestions = budget.fit(suggestions, "suggestions", max_tokens=4000)
     try:
-        model = genai.GenerativeModel(
+        model = get_model(
             model_name='gemini-2.5-flash',
             generation_config={"response_mime_type": "application/json"}
         )
@@ -382,10 +741,268 @@ def apply_changes(image_b64, text_content, suggestions):
         }}
         """
         
-        response = model.generate_content(prompt)
+        response = generate(model, prompt, budget, "apply_changes")
         
         return response.text
         
+    except BudgetExceeded:
+        raise
     except Exception as e:
         print(f"❌ Apply Changes Error: {e}")
         return None
+
+
+def generate_caption_variants(text_content, suggestions=None, k=5, budget=None):
+    """
+    Generates k alternative captions for a creative in a single model call.
+    Returns a list of caption strings (may be shorter than k if the model under-delivers).
+    """
+    budget = budget or governor.start_request()
+    text_content = budget.fit(text_content, "caption", max_tokens=2000)
+    model = get_model(
+        model_name='gemini-2.5-flash',
+        generation_config={"response_mime_type": "application/json"}
+    )
+
+    suggestions_block = ""
+    if suggestions:
+        suggestions_block = f"Strategic Suggestions to consider:\n{budget.fit(suggestions, 'suggestions', max_tokens=4000)}"
+
+    prompt = f"""
+    You are an expert Copywriter running an A/B test.
+
+    Original Caption: "{text_content}"
+
+    {suggestions_block}
+
+    Task:
+    Write {k} distinct alternative captions for the same creative. Vary the hook,
+    tone and call to action so the variants are meaningfully different.
+
+    Output JSON:
+    {{
+        "variants": ["caption 1", "caption 2"]
+    }}
+    """
+
+    response = generate(model, prompt, budget, "variants")
+    data = json.loads(response.text)
+    variants = [v.strip() for v in data.get("variants", []) if isinstance(v, str) and v.strip()]
+    return variants[:k]
+
+
+def classify_comments(comments, budget=None, chunk_size=40):
+    """
+    Labels comments with an age group and sentiment, one JSON-mode call per chunk.
+    Returns {comment_id: (age_group, sentiment)}; ids the model skips are left out,
+    and so are whole chunks that no longer fit the budget (never sent truncated)
+    or whose call failed, so callers keep the labels already paid for and retry
+    the rest later.
+    """
+    budget = budget or governor.start_request()
+    model = get_model(
+        model_name='gemini-2.5-flash',
+        generation_config={"response_mime_type": "application/json"}
+    )
+
+    def prompt_for(chunk):
+        payload = json.dumps([{"id": c.comment_id, "text": c.text} for c in chunk], ensure_ascii=False)
+        return f"""
+        Classify each social media comment below.
+        age_group: the commenter's most likely age group, one of "18-30", "30-50", "50+", "unknown".
+        sentiment: one of "positive", "neutral", "negative".
+
+        Comments:
+        {payload}
+
+        Output JSON:
+        {{
+            "labels": [{{"id": "...", "age_group": "18-30", "sentiment": "positive"}}]
+        }}
+        """
+
+    labels = {}
+    skipped = 0
+    failed = 0
+    pending = [comments[offset:offset + chunk_size] for offset in range(0, len(comments), chunk_size)]
+    while pending:
+        chunk = pending.pop(0)
+        prompt = prompt_for(chunk)
+        if estimate_tokens(prompt) > budget.governor.per_call and len(chunk) > 1:
+            # Long comments: halve the chunk rather than truncating it
+            half = len(chunk) // 2
+            pending[:0] = [chunk[:half], chunk[half:]]
+            continue
+        if not budget.can_afford(prompt):
+            skipped += len(chunk)
+            continue
+        try:
+            response = generate(model, prompt, budget, "trends")
+            returned = json.loads(response.text).get("labels", [])
+        except BudgetExceeded as e:
+            # The tenant's quota is spent: no later chunk would be admitted either
+            print(f"⚠️  Budget: {e}")
+            skipped += len(chunk) + sum(len(rest) for rest in pending)
+            break
+        except Exception as e:
+            failed += len(chunk)
+            print(f"⚠️  Trends chunk of {len(chunk)} comments failed: {e}")
+            continue
+        for item in returned if isinstance(returned, list) else []:
+            if isinstance(item, dict) and item.get("id") is not None:
+                labels[str(item["id"])] = (item.get("age_group", "unknown"), item.get("sentiment", "neutral"))
+    if skipped or failed:
+        print(f"⚠️  Left {skipped + failed} comments unclassified; they are retried on the next refresh")
+    return labels
+
+
+def score_strategy(strategy_text):
+    """
+    Extracts a comparable score from a strategist JSON response:
+    the engagement score out of 10, tie-broken by the tone score.
+    """
+    try:
+        cleaned = strategy_text.replace("```json", "").replace("```", "").strip()
+        strategy = json.loads(cleaned)
+    except Exception:
+        return 0.0, None
+
+    engagement = 0.0
+    match = re.search(r"[\d.]+", str((strategy.get("engagement_metrics") or {}).get("score", "")))
+    if match:
+        try:
+            engagement = float(match.group())
+        except ValueError:
+            pass
+    try:
+        tone = float((strategy.get("tone_analysis") or {}).get("score", 0))
+    except (TypeError, ValueError):
+        tone = 0.0
+    return round(engagement + tone / 1000, 4), strategy
+
+
+def analyze_creative_file(image_path, text_content, platform="linkedin", target_group="all", budget=None):
+    """
+    Pre-analyzes a creative stored on disk. Used by bulk runs; adds a
+    comparable score next to the strategist output.
+    """
+    try:
+        with open(image_path, "rb") as f:
+            image = open_image(f.read())
+    except Exception as e:
+        return {"error": f"Invalid image data: {e}"}
+
+    results = run_pre_analysis(None, text_content, platform, target_group, image=image, budget=budget)
+    if not results.get("error"):
+        results["score"], _ = score_strategy(results.get("strategy") or "")
+    return results
+
+
+def run_variants(image_b64, text_content, platform="linkedin", target_group="all", k=5, suggestions=None, image=None, budget=None):
+    """
+    A/B test caption variants: generates k captions in one call, pre-analyzes the
+    original and every variant concurrently against one decoded image, and
+    returns them ranked best first. budget covers the caption generation; each
+    analysis gets a request budget of its own, charged to the same tenant.
+    """
+    budget = budget or governor.start_request()
+    if image is None:
+        try:
+            image = decode_image(image_b64)
+        except Exception as e:
+            return {"error": f"Invalid image data: {e}"}
+
+    try:
+        captions = generate_caption_variants(text_content, suggestions=suggestions, k=k, budget=budget)
+    except BudgetExceeded:
+        raise
+    except Exception as e:
+        print(f"❌ Variant Generation Error: {e}")
+        return {"error": f"Failed to generate variants: {e}"}
+
+    candidates = [("original", text_content)] + [(f"variant_{i}", c) for i, c in enumerate(captions, 1)]
+    print(f"STEP: Pre-analyzing {len(candidates)} captions concurrently...")
+
+    # A shared budget would leave the last analyses to finish shrunk or refused
+    budgets = [budget.governor.start_request(budget.tenant, budget.priority, budget.limit) for _ in candidates]
+    with ThreadPoolExecutor(max_workers=min(len(candidates), 8)) as pool:
+        futures = [
+            pool.submit(run_pre_analysis, None, caption, platform, target_group, image, candidate_budget)
+            for (_, caption), candidate_budget in zip(candidates, budgets)
+        ]
+        analyses = [f.result() for f in futures]
+
+    ranked = []
+    for (label, caption), analysis in zip(candidates, analyses):
+        score, strategy = score_strategy(analysis.get("strategy") or "")
+        ranked.append({
+            "label": label,
+            "caption": caption,
+            "score": score,
+            "strategy": analysis.get("strategy"),
+            "error": analysis.get("error"),
+            "verdict": (strategy or {}).get("final_verdict"),
+        })
+    ranked.sort(key=lambda item: item["score"], reverse=True)
+    for rank, item in enumerate(ranked, 1):
+        item["rank"] = rank
+
+    return {"variants": ranked, "error": None}
+
+
+def warmup(connect=False):
+    """
+    Does the first-request work ahead of time: imports the SDKs, builds the
+    shared model clients, parses and indexes the bundled corpora and hashes
+    the prompts, and launches the browser pool for blocked URLs. With
+    connect=True it also opens the upstream connection.
+    Returns per-step timings in seconds.
+    """
+    import time
+    timings = {}
+
+    def step(name, fn):
+        started = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            print(f"⚠️  Warm-up step '{name}' failed: {e}")
+        timings[name] = round(time.perf_counter() - started, 4)
+
+    def build_models():
+        prompts_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts")
+        for name in sorted(os.listdir(prompts_dir)):
+            with open(os.path.join(prompts_dir, name), "r") as f:
+                get_model(model_name='gemini-2.5-flash', system_instruction=f.read())
+        # The strategist's instruction is the prompt plus the JSON structure, as strategize builds it
+        strategist = load_prompt("negotiate_suggestions.prompt")
+        if strategist:
+            for mode, measured in (("post", True), ("post", False), ("pre", False)):
+                get_model(model_name='gemini-2.5-flash',
+                          system_instruction=strategist_instruction(strategist, mode, measured))
+        for persona in (YOUTH_PERSONA, ADULT_PERSONA):
+            get_model(system_instruction=persona)
+        get_model(model_name='gemini-2.5-flash', generation_config={"response_mime_type": "application/json"})
+
+    def import_parsers():
+        import PIL.Image  # noqa: F401
+        import bs4  # noqa: F401
+        get_http_session()
+
+    def load_corpora():
+        for platform in ("linkedin", "instagram"):
+            load_local_corpus(platform)
+
+    def open_connection():
+        # Any cheap authenticated call establishes the TLS connection to the API
+        next(iter(get_genai().list_models()), None)
+
+    step("genai", get_genai)
+    step("models", build_models)
+    step("parsers", import_parsers)
+    step("corpora", load_corpora)
+    step("prompt_version", prompt_version)
+    step("browser_pool", browser_pool.start)
+    if connect:
+        step("connect", open_connection)
+    return timings
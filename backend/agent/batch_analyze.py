@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Offline post-launch analysis over many posts.
+
+The manifest is JSONL, one post per line: a live URL or a local comments export.
+  {"id": "spring-launch", "url": "https://www.linkedin.com/posts/..."}
+  {"id": "week-32", "data_file": "exports/week32.json", "platform": "instagram"}
+Relative data_file paths are resolved against the manifest's directory; the
+platform defaults to instagram for instagram URLs and linkedin otherwise.
+
+Posts run on a worker pool through the same pipeline as /analyze, so model
+calls share the process-wide scheduler (as batch priority), rate limit, stage
+memo and shared contexts, and finished analyses are read from and written to
+the result store the server uses. A stored result for a live URL is reused
+only while it is younger than --max-age, since the comments keep changing;
+local exports are keyed by their content and reused as long as they exist.
+
+Each result is appended to the output JSONL as soon as it finishes. An
+existing output is only continued with --resume, which skips posts already
+done there, so an interrupted run picks up where it stopped.
+
+Usage:
+  python batch_analyze.py manifest.jsonl [--output results.jsonl] [--resume] [--workers 4]
+                          [--max-age SECONDS] [--force] [--tenant NAME]
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from bulk import load_manifest
+
+# Stored analyses of live URLs older than this are rerun
+DEFAULT_URL_MAX_AGE = float(os.environ.get("BATCH_URL_MAX_AGE", 24 * 3600))
+
+
+def normalize_item(item: Dict[str, Any], base_dir: str) -> Dict[str, Any]:
+    """
+    Validates a manifest entry and fills in platform, absolute data_file and key.
+    Raises ValueError for an entry with neither (or both) url and data_file.
+    """
+    url = item.get("url")
+    data_file = item.get("data_file")
+    if bool(url) == bool(data_file):
+        raise ValueError(f"Entry needs exactly one of 'url' or 'data_file': {item}")
+    if data_file:
+        data_file = os.path.abspath(os.path.join(base_dir, data_file))
+        if not os.path.isfile(data_file):
+            raise ValueError(f"File not found: {item['data_file']}")
+    platform = item.get("platform") or ("instagram" if url and "instagram" in url.lower() else "linkedin")
+    return dict(item, url=url, data_file=data_file, platform=platform,
+                key=str(item.get("id") or f"{platform}:{url or data_file}"))
+
+
+def load_items(manifest_path: str) -> List[Dict[str, Any]]:
+    """Reads and validates a manifest; raises ValueError naming the bad entry."""
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    items, seen = [], set()
+    for number, item in enumerate(load_manifest(manifest_path), start=1):
+        try:
+            item = normalize_item(item, base_dir)
+        except ValueError as e:
+            raise ValueError(f"Manifest entry {number}: {e}")
+        if item["key"] in seen:
+            raise ValueError(f"Manifest entry {number}: duplicate id '{item['key']}'")
+        seen.add(item["key"])
+        items.append(item)
+    return items
+
+
+def completed_keys(output_path: str) -> Set[str]:
+    """Keys already finished successfully in an earlier run's output; errors are retried."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut off when the previous run was killed
+                continue
+            if row.get("status") == "done":
+                done.add(row["key"])
+    return done
+
+
+class ResultWriter:
+    """Appends one JSON line per finished post, flushed immediately."""
+
+    def __init__(self, path: str, append: bool = True):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        if not append:
+            open(path, "w", encoding="utf-8").close()
+        # Start on a fresh line if the previous run died mid-write
+        elif os.path.exists(path) and os.path.getsize(path):
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b"\n"
+            if needs_newline:
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write("\n")
+
+    def write(self, row: Dict[str, Any]):
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            f.flush()
+
+
+def analyze_post(item: Dict[str, Any], force: bool = False, tenant: Optional[str] = None,
+                 max_age: Optional[float] = DEFAULT_URL_MAX_AGE) -> Dict[str, Any]:
+    """
+    One post through the post-launch pipeline, reusing a stored result for the
+    same fingerprint unless force is set. For a URL the stored result must be
+    younger than max_age seconds (None: any age). Returns fingerprint, cached,
+    strategy and error (plus usage when the models ran).
+    """
+    from agent_core import post_fingerprint, run_analysis
+    from result_store import get_result_store
+    from token_budget import governor
+
+    store = get_result_store()
+    fp = post_fingerprint(item["platform"], url=item.get("url"), data_file=item.get("data_file"))
+    stored = None if force else store.get(fp, max_age=max_age if item.get("url") else None)
+    if stored:
+        return {"fingerprint": fp, "cached": True, "strategy": stored["result"].get("strategy"), "error": None}
+
+    tenant = tenant or "default"
+    if governor.tenant_remaining(tenant) <= 0:
+        return {"fingerprint": fp, "cached": False, "error": f"Token allowance exhausted for tenant '{tenant}'"}
+    budget = governor.start_request(tenant, priority="batch")
+    results = run_analysis(item.get("data_file"), platform=item["platform"], url=item.get("url"),
+                           budget=budget, force=force)
+    if results.get("error"):
+        return {"fingerprint": fp, "cached": False, "error": results["error"], "usage": budget.report()}
+
+    store.put(fp, {"summary": "Analysis of comments for the campaign.", "strategy": results["strategy"]},
+              mode="post", params={"url": item.get("url"), "platform": item["platform"],
+                                   "data_file": item.get("data_file")})
+    return {"fingerprint": fp, "cached": False, "strategy": results["strategy"], "error": None,
+            "usage": budget.report()}
+
+
+def run_batch(items: List[Dict[str, Any]], output_path: str, analyze: Callable[[Dict[str, Any]], Dict[str, Any]],
+              workers: int = 4, resume: bool = False) -> Dict[str, int]:
+    """
+    Runs every item and writes each result to output_path as it finishes.
+    With resume, items already done in output_path are skipped and new rows
+    are appended; otherwise output_path is started over. Returns counts of
+    done, error and skipped items.
+    """
+    done = completed_keys(output_path) if resume else set()
+    pending = [item for item in items if item["key"] not in done]
+    counts = {"done": 0, "error": 0, "skipped": len(items) - len(pending)}
+    if counts["skipped"]:
+        print(f"↩️  Resuming: {counts['skipped']} of {len(items)} posts already done")
+    writer = ResultWriter(output_path, append=resume)
+
+    def run_item(item):
+        started = time.monotonic()
+        row = {"key": item["key"], "id": item.get("id"), "url": item.get("url"),
+               "data_file": item.get("data_file"), "platform": item["platform"]}
+        try:
+            result = analyze(item)
+            row.update(result)
+            row["status"] = "error" if result.get("error") else "done"
+        except Exception as e:
+            row.update({"status": "error", "error": str(e)})
+        row["duration_s"] = round(time.monotonic() - started, 3)
+        row["finished_at"] = time.time()
+        writer.write(row)
+        return row
+
+    pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="batch")
+    try:
+        futures = [pool.submit(run_item, item) for item in pending]
+        for finished, future in enumerate(as_completed(futures), start=1):
+            row = future.result()
+            counts[row["status"]] += 1
+            mark = "✓" if row["status"] == "done" else "✗"
+            print(f"{mark} [{finished}/{len(pending)}] {row['key']} {row['duration_s']}s"
+                  + (f" ({row['error']})" if row.get("error") else ""))
+    except KeyboardInterrupt:
+        print("⏹️  Interrupted; finished posts are saved, rerun with --resume to continue")
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Post-launch analysis for every post in a JSONL manifest")
+    parser.add_argument("manifest", help="JSONL with one {id, url | data_file, platform} entry per line")
+    parser.add_argument("--output", default=None, help="results JSONL (default: <manifest>.results.jsonl)")
+    parser.add_argument("--resume", action="store_true", help="continue an existing output, skipping posts done there")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("BATCH_WORKERS", 4)),
+                        help="posts analyzed concurrently")
+    parser.add_argument("--max-age", type=float, default=DEFAULT_URL_MAX_AGE,
+                        help="reuse stored results for URL posts only if younger than this many seconds")
+    parser.add_argument("--force", action="store_true", help="ignore stored results and memoized stages")
+    parser.add_argument("--tenant", default=None, help="tenant charged for the tokens")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    output = args.output or f"{os.path.splitext(args.manifest)[0]}.results.jsonl"
+    if os.path.exists(output) and not args.resume:
+        parser.error(f"{output} already exists; pass --resume to continue it or --output for a new file")
+
+    items = load_items(args.manifest)
+    print(f"📋 {len(items)} posts from {args.manifest} -> {output} ({args.workers} workers)")
+
+    started = time.monotonic()
+    counts = run_batch(items, output,
+                       lambda item: analyze_post(item, force=args.force, tenant=args.tenant, max_age=args.max_age),
+                       workers=args.workers, resume=args.resume)
+    print(f"✅ Done in {time.monotonic() - started:.1f}s: {counts}")
+    return 1 if counts["error"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
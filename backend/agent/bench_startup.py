@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the agent server.
+
+Measures, each in a fresh interpreter:
+  - import time of agent_core and server (median of --runs)
+  - warm-up duration
+  - latency of the first /comments request with and without warm-up
+
+Usage:
+  python bench_startup.py [--runs 5] [--output startup.json]
+                          [--baseline startup.json] [--max-regression 0.2]
+
+With --baseline, exits non-zero when any median is more than
+--max-regression (fraction) slower than the baseline value.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+IMPORT_SNIPPET = """
+import time
+started = time.perf_counter()
+import {module}
+print(time.perf_counter() - started)
+"""
+
+FIRST_REQUEST_SNIPPET = """
+import os, time
+os.environ["WARMUP"] = "0"
+import server
+if {warm}:
+    server.warmup()
+client = server.app.test_client()
+started = time.perf_counter()
+client.get("/comments?platform=linkedin")
+print(time.perf_counter() - started)
+"""
+
+WARMUP_SNIPPET = """
+import os, time
+os.environ["WARMUP"] = "0"
+import server
+started = time.perf_counter()
+server.warmup()
+print(time.perf_counter() - started)
+"""
+
+
+def run_snippet(snippet):
+    """Runs a snippet in a fresh interpreter and returns the float it prints last."""
+    output = subprocess.run(
+        [sys.executable, "-c", snippet],
+        cwd=HERE, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def median_of(snippet, runs):
+    return round(statistics.median(run_snippet(snippet) for _ in range(runs)), 4)
+
+
+def measure(runs):
+    return {
+        "import_agent_core_s": median_of(IMPORT_SNIPPET.format(module="agent_core"), runs),
+        "import_server_s": median_of(IMPORT_SNIPPET.format(module="server"), runs),
+        "warmup_s": median_of(WARMUP_SNIPPET, runs),
+        "first_request_cold_s": median_of(FIRST_REQUEST_SNIPPET.format(warm=False), runs),
+        "first_request_warm_s": median_of(FIRST_REQUEST_SNIPPET.format(warm=True), runs),
+    }
+
+
+def regressions(results, baseline, max_regression):
+    """Metrics that got slower than baseline * (1 + max_regression)."""
+    failed = {}
+    for key, value in results.items():
+        previous = baseline.get(key)
+        if previous and value > previous * (1 + max_regression):
+            failed[key] = {"baseline": previous, "current": value}
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure server import time and first-request latency")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    results = measure(args.runs)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            failed = regressions(results, json.load(f), args.max_regression)
+        if failed:
+            print(f"❌ Startup regression: {json.dumps(failed)}")
+            return 1
+        print("✅ No startup regression")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,321 @@
+"""
+Headless-browser fallback for reading post URLs.
+Most LinkedIn and Instagram URLs block a plain HTTP fetch, so the page is
+rendered in Chromium instead. One browser is launched once and a few contexts
+are kept warm and reused across requests; each context blocks images, fonts
+and media, pages run under a deadline, and a context is replaced after
+`max_uses` pages so cookies and memory don't accumulate.
+
+Playwright's objects are bound to the event loop that created them, so the
+pool owns a private loop thread and callers from any thread submit to it.
+
+URLs come from users, so only http(s) URLs whose host resolves to public
+addresses are rendered; navigations inside the page are checked the same way.
+"""
+
+import asyncio
+import ipaddress
+import os
+import socket
+import threading
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "font", "media"})
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36"
+)
+
+# Only the fields the comment simulator uses
+_EXTRACT_METADATA = """() => {
+    const meta = (selector) => {
+        const el = document.querySelector(selector);
+        return el ? (el.getAttribute('content') || '').trim() : '';
+    };
+    const canonical = document.querySelector('link[rel="canonical"]');
+    return {
+        title: (document.title || '').trim() || meta('meta[property="og:title"]'),
+        description: meta('meta[name="description"]') || meta('meta[property="og:description"]'),
+        site_name: meta('meta[property="og:site_name"]'),
+        canonical: canonical ? canonical.href : '',
+    };
+}"""
+
+
+def is_public_url(url: str) -> bool:
+    """
+    True for an http(s) URL whose host resolves only to globally routable
+    addresses; private, loopback, link-local and other special ranges (and
+    hosts that don't resolve) are refused.
+    """
+    try:
+        parts = urlsplit(url)
+        host, port = parts.hostname, parts.port
+    except ValueError:
+        return False
+    if parts.scheme not in ("http", "https") or not host:
+        return False
+    try:
+        infos = socket.getaddrinfo(host, port or (443 if parts.scheme == "https" else 80),
+                                   proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError):
+        return False
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%", 1)[0])
+        if getattr(address, "ipv4_mapped", None):
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            return False
+    return bool(infos)
+
+
+class _PooledContext:
+    __slots__ = ("context", "uses")
+
+    def __init__(self, context):
+        self.context = context
+        self.uses = 0
+
+
+class BrowserPool:
+    """A warm Chromium with `size` reusable browser contexts."""
+
+    def __init__(self, size: int = 2, max_uses: int = 50, page_timeout: float = 8.0, enabled: bool = True,
+                 allow_private_hosts: bool = False):
+        """
+        Args:
+            size: contexts kept open, i.e. pages rendered concurrently
+            max_uses: pages a context renders before it is replaced
+            page_timeout: deadline in seconds for one page, navigation and extraction
+            enabled: False makes fetch_metadata a no-op
+            allow_private_hosts: render non-public hosts too (local fixtures only)
+        """
+        self.size = size
+        self.max_uses = max_uses
+        self.page_timeout = page_timeout
+        self.enabled = enabled
+        self.allow_private_hosts = allow_private_hosts
+        self._loop = None
+        self._thread = None
+        self._playwright = None
+        self._browser = None
+        self._idle = None
+        self._releasing = set()
+        self._start_lock = threading.Lock()
+        self._failed = None
+        self._lock = threading.Lock()
+        self._stats = {"pages": 0, "errors": 0, "timeouts": 0, "recycled": 0, "blocked_requests": 0,
+                       "rejected_urls": 0, "launch_s": None}
+
+    def _bump(self, name: str, amount: int = 1):
+        with self._lock:
+            self._stats[name] += amount
+
+    # --- lifecycle ---
+
+    def start(self) -> bool:
+        """
+        Launches the browser and opens the contexts (once). Returns False when
+        the pool is disabled or Playwright/Chromium is unavailable.
+        """
+        if not self.enabled or self._failed:
+            return False
+        if self._loop is not None:
+            return True
+        with self._start_lock:
+            if self._loop is not None:
+                return True
+            if self._failed:
+                return False
+            started = time.perf_counter()
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="browser-pool", daemon=True)
+            thread.start()
+            try:
+                asyncio.run_coroutine_threadsafe(self._launch(), loop).result(timeout=60)
+            except Exception as e:
+                # Playwright's install hint is a multi-line banner; the first line says enough
+                lines = str(e).strip().splitlines()
+                self._failed = f"{type(e).__name__}: {lines[0] if lines else ''}"
+                print(f"⚠️  Browser pool unavailable, URL rendering disabled: {self._failed}")
+                loop.call_soon_threadsafe(loop.stop)
+                return False
+            self._loop, self._thread = loop, thread
+            with self._lock:
+                self._stats["launch_s"] = round(time.perf_counter() - started, 3)
+            return True
+
+    async def _launch(self):
+        from playwright.async_api import async_playwright
+
+        self._playwright = await async_playwright().start()
+        try:
+            self._browser = await self._playwright.chromium.launch(headless=True)
+        except Exception:
+            # Browser binaries missing: don't leave the driver process behind
+            await self._playwright.stop()
+            raise
+        self._idle = asyncio.Queue()
+        for _ in range(self.size):
+            self._idle.put_nowait(await self._new_context())
+
+    async def _new_context(self) -> _PooledContext:
+        context = await self._browser.new_context(
+            user_agent=USER_AGENT,
+            java_script_enabled=True,
+            service_workers="block",
+        )
+        context.set_default_timeout(self.page_timeout * 1000)
+        await context.route("**/*", self._route)
+        return _PooledContext(context)
+
+    async def _allowed(self, url: str) -> bool:
+        if self.allow_private_hosts:
+            return True
+        # getaddrinfo blocks; keep it off the loop thread
+        return await asyncio.get_running_loop().run_in_executor(None, is_public_url, url)
+
+    async def _route(self, route):
+        request = route.request
+        if request.resource_type in BLOCKED_RESOURCE_TYPES:
+            self._bump("blocked_requests")
+            await route.abort()
+        elif request.resource_type == "document" and not await self._allowed(request.url):
+            # Frames and script-driven navigations to internal hosts
+            self._bump("rejected_urls")
+            await route.abort("blockedbyclient")
+        else:
+            await route.continue_()
+
+    def close(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(timeout=30)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop = self._thread = None
+
+    async def _shutdown(self):
+        while not self._idle.empty():
+            await self._idle.get_nowait().context.close()
+        await self._browser.close()
+        await self._playwright.stop()
+
+    # --- fetching ---
+
+    def fetch_metadata(self, url: str, timeout: Optional[float] = None) -> Optional[Dict[str, str]]:
+        """
+        Renders url and returns its title/description metadata, or None when
+        the pool is unavailable, the page fails, or the deadline passes.
+        Waiting for a free context counts against the deadline too.
+        """
+        if not self.enabled:
+            return None
+        if not self.allow_private_hosts and not is_public_url(url):
+            self._bump("rejected_urls")
+            print(f"⚠️  Not rendering {url}: not a public http(s) URL")
+            return None
+        if not self.start():
+            return None
+        deadline = timeout or self.page_timeout
+        future = asyncio.run_coroutine_threadsafe(self._fetch(url, deadline), self._loop)
+        try:
+            # The coroutine enforces the deadline itself; the margin covers the hand-off
+            return future.result(timeout=deadline + 5)
+        except Exception as e:
+            future.cancel()
+            print(f"⚠️  Browser render failed for {url}: {type(e).__name__}: {e}")
+            return None
+
+    async def _fetch(self, url: str, deadline: float) -> Optional[Dict[str, str]]:
+        from playwright.async_api import TimeoutError as PlaywrightTimeout
+
+        try:
+            return await asyncio.wait_for(self._render(url), timeout=deadline)
+        except (asyncio.TimeoutError, PlaywrightTimeout):
+            self._bump("timeouts")
+            print(f"⏱️  Browser render of {url} exceeded {deadline}s")
+            return None
+        except Exception:
+            self._bump("errors")
+            raise
+
+    async def _render(self, url: str) -> Optional[Dict[str, str]]:
+        pooled = await self._idle.get()
+        page = None
+        broken = False
+        try:
+            page = await pooled.context.new_page()
+            response = await page.goto(url, wait_until="domcontentloaded")
+            if response is not None and response.status >= 400:
+                self._bump("errors")
+                return None
+            # Redirect hops don't pass through the route handler; check where we ended up
+            if not await self._allowed(page.url):
+                self._bump("rejected_urls")
+                return None
+            metadata = await page.evaluate(_EXTRACT_METADATA)
+            self._bump("pages")
+            return metadata
+        except asyncio.CancelledError:
+            broken = True
+            raise
+        except Exception:
+            broken = not self._browser.is_connected()
+            raise
+        finally:
+            pooled.uses += 1
+            # A page that blew its deadline may hang on close too; closing the context reclaims it
+            if page is not None and not broken:
+                try:
+                    await page.close()
+                except Exception:
+                    broken = True
+            # Return the slot without blocking: a cancelled render must not leak it
+            task = asyncio.get_running_loop().create_task(self._release(pooled, broken))
+            self._releasing.add(task)
+            task.add_done_callback(self._releasing.discard)
+
+    async def _release(self, pooled: _PooledContext, broken: bool):
+        if broken or pooled.uses >= self.max_uses:
+            self._bump("recycled")
+            try:
+                await pooled.context.close()
+            except Exception:
+                pass
+            try:
+                if not self._browser.is_connected():
+                    self._browser = await self._playwright.chromium.launch(headless=True)
+                pooled = await self._new_context()
+            except Exception as e:
+                # The pool runs one context short rather than failing every request
+                print(f"⚠️  Could not replace browser context: {e}")
+                return
+        self._idle.put_nowait(pooled)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update(
+            enabled=self.enabled,
+            allow_private_hosts=self.allow_private_hosts,
+            running=self._loop is not None,
+            unavailable=self._failed,
+            size=self.size,
+            max_uses=self.max_uses,
+            idle=self._idle.qsize() if self._idle is not None and self._loop is not None else None,
+        )
+        return stats
+
+
+# Process-wide pool, launched by warm-up or on the first blocked scrape
+browser_pool = BrowserPool(
+    size=int(os.environ.get("BROWSER_POOL_SIZE", 2)),
+    max_uses=int(os.environ.get("BROWSER_POOL_MAX_USES", 50)),
+    page_timeout=float(os.environ.get("BROWSER_PAGE_TIMEOUT", 8)),
+    enabled=os.environ.get("BROWSER_POOL", "1") == "1",
+    allow_private_hosts=os.environ.get("BROWSER_ALLOW_PRIVATE_HOSTS") == "1",
+)
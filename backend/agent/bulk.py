@@ -0,0 +1,167 @@
+"""
+Bulk pre-launch analysis of many creatives.
+Items run across a bounded worker pool; model calls share the process-wide
+rate limiter, and results are appended to a JSONL/CSV report as they finish.
+"""
+
+import csv
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+DEFAULT_BATCH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "batches")
+# Manifests and images referenced by path must be placed here (or under BULK_IMAGE_ROOT)
+DEFAULT_INPUT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "bulk_inputs")
+
+CSV_FIELDS = ["index", "item_id", "status", "score", "duration_s", "platform", "target", "caption", "source", "error"]
+
+
+class BatchJob:
+    """One bulk run: its items, per-item status and incremental report files."""
+
+    def __init__(self, items: List[Dict[str, Any]], batch_dir: str, batch_id: str = None):
+        self.batch_id = batch_id or uuid.uuid4().hex[:12]
+        self.directory = os.path.join(batch_dir, self.batch_id)
+        os.makedirs(self.directory, exist_ok=True)
+        self.jsonl_path = os.path.join(self.directory, "report.jsonl")
+        self.csv_path = os.path.join(self.directory, "report.csv")
+        self.items = items
+        self.statuses = ["queued"] * len(items)
+        self.created_at = time.time()
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+        with open(self.csv_path, "w", newline="", encoding="utf-8") as f:
+            csv.DictWriter(f, fieldnames=CSV_FIELDS).writeheader()
+
+    def record(self, index: int, row: Dict[str, Any]):
+        """Append a finished item to both report files."""
+        with self._lock:
+            self.statuses[index] = row["status"]
+            with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            with open(self.csv_path, "a", newline="", encoding="utf-8") as f:
+                csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction="ignore").writerow(row)
+
+    def set_status(self, index: int, status: str):
+        with self._lock:
+            self.statuses[index] = status
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = {}
+            for status in self.statuses:
+                counts[status] = counts.get(status, 0) + 1
+            return {
+                "batch_id": self.batch_id,
+                "total": len(self.items),
+                "counts": counts,
+                "done": self.finished_at is not None,
+                "created_at": self.created_at,
+                "finished_at": self.finished_at,
+            }
+
+
+class BulkRunner:
+    """Runs batch jobs in the background on a bounded worker pool."""
+
+    def __init__(self, analyze_item: Callable[[Dict[str, Any]], Dict[str, Any]],
+                 max_workers: int = 4, batch_dir: str = DEFAULT_BATCH_DIR):
+        """
+        Args:
+            analyze_item: function taking an item dict and returning an analysis result dict
+            max_workers: concurrent items across all running batches
+            batch_dir: where per-batch reports are written
+        """
+        self.analyze_item = analyze_item
+        self.batch_dir = batch_dir
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bulk")
+        self._jobs: Dict[str, BatchJob] = {}
+        self._lock = threading.Lock()
+
+    def new_batch_dir(self) -> str:
+        """Reserve a batch id up front so uploads can be stored next to the report."""
+        batch_id = uuid.uuid4().hex[:12]
+        os.makedirs(os.path.join(self.batch_dir, batch_id, "inputs"), exist_ok=True)
+        return batch_id
+
+    def submit(self, items: List[Dict[str, Any]], batch_id: str = None) -> BatchJob:
+        job = BatchJob(items, self.batch_dir, batch_id=batch_id)
+        with self._lock:
+            self._jobs[job.batch_id] = job
+
+        futures = [self._pool.submit(self._run_item, job, index, item) for index, item in enumerate(items)]
+
+        def finalize():
+            for future in futures:
+                future.exception()
+            job.finished_at = time.time()
+            print(f"✓ Batch {job.batch_id} finished: {job.summary()['counts']}")
+
+        threading.Thread(target=finalize, daemon=True).start()
+        return job
+
+    def get(self, batch_id: str) -> BatchJob:
+        with self._lock:
+            return self._jobs.get(batch_id)
+
+    def _run_item(self, job: BatchJob, index: int, item: Dict[str, Any]):
+        job.set_status(index, "running")
+        started = time.monotonic()
+        row = {
+            "index": index,
+            "item_id": item.get("id") or str(index),
+            "platform": item.get("platform", "linkedin"),
+            "target": item.get("target", "all"),
+            "caption": item.get("caption"),
+            "source": item.get("image_path"),
+        }
+        try:
+            result = self.analyze_item(item)
+            error = result.get("error")
+            row.update({
+                "status": "error" if error else "done",
+                "error": error,
+                "score": result.get("score"),
+                "strategy": result.get("strategy"),
+            })
+        except Exception as e:
+            print(f"❌ Bulk item {index} failed: {e}")
+            row.update({"status": "error", "error": str(e)})
+        row["duration_s"] = round(time.monotonic() - started, 3)
+        job.record(index, row)
+
+
+def load_manifest(path: str) -> List[Dict[str, Any]]:
+    """
+    Reads a bulk manifest: JSONL (one item per line) or a JSON list.
+    Each item needs image_path and caption; platform and target are optional.
+
+    Raises:
+        ValueError: for invalid JSON or an item that isn't an object
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read().strip()
+    if content.startswith("["):
+        items = json.loads(content)
+    else:
+        items = [json.loads(line) for line in content.splitlines() if line.strip()]
+    for number, item in enumerate(items, 1):
+        if not isinstance(item, dict):
+            raise ValueError(f"Manifest item {number} is not an object")
+    return items
+
+
+def resolve_input_path(image_path: str, root: str) -> str:
+    """Resolve a manifest or image path, refusing anything outside the allowed root."""
+    root = os.path.realpath(root)
+    resolved = os.path.realpath(os.path.join(root, image_path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"Path outside of allowed root: {image_path}")
+    if not os.path.isfile(resolved):
+        raise ValueError(f"File not found: {image_path}")
+    return resolved
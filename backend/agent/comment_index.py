@@ -0,0 +1,251 @@
+"""
+In-memory inverted index over loaded comment corpora.
+Lets the dashboard drill into the comments behind a verdict without
+touching disk or the LLM.
+"""
+
+import re
+import threading
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional
+
+from comments import Comment, comment_from_raw
+
+FIELDS = ("token", "emoji", "verdict", "reaction", "corpus")
+FACET_FIELDS = ("verdict", "reaction", "emoji")
+
+_TOKEN_RE = re.compile(r"[^\W_]+(?:'[^\W_]+)?", re.UNICODE)
+
+
+def _is_emoji(char: str) -> bool:
+    code = ord(char)
+    return (
+        0x1F300 <= code <= 0x1FAFF   # pictographs, emoticons, transport, symbols
+        or 0x2600 <= code <= 0x27BF  # misc symbols and dingbats
+        or 0x1F1E6 <= code <= 0x1F1FF  # regional indicators (flags)
+    )
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, accent-fold and split text into word tokens."""
+    if not text:
+        return []
+    folded = unicodedata.normalize("NFKD", text.lower())
+    folded = "".join(c for c in folded if not unicodedata.combining(c))
+    return _TOKEN_RE.findall(folded)
+
+
+def extract_emoji(text: str) -> List[str]:
+    """Return the distinct emoji found in text, in order of appearance."""
+    seen = []
+    for char in text or "":
+        if _is_emoji(char) and char not in seen:
+            seen.append(char)
+    return seen
+
+
+def index_record(comment: Comment) -> Dict[str, Any]:
+    """Flat record stored in the index and returned by /comments."""
+    return {
+        "comment_id": comment.comment_id,
+        "author": comment.author,
+        "text": comment.text,
+        "created_at": comment.created_at,
+        "reactions": dict(comment.reactions),
+        "verdict": comment.age_group or "unclassified",
+    }
+
+
+class CommentIndex:
+    """Inverted index keyed on tokens, emoji, verdict, reaction type and corpus."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        self._order: Dict[str, int] = {}
+        self._postings: Dict[str, Dict[str, set]] = {field: {} for field in FIELDS}
+        self._keys: Dict[str, Dict[str, List[str]]] = {}
+
+    def __len__(self):
+        return len(self._docs)
+
+    def corpora(self) -> List[str]:
+        with self._lock:
+            return sorted(self._postings["corpus"].keys())
+
+    def has_corpus(self, corpus: str) -> bool:
+        with self._lock:
+            return bool(self._postings["corpus"].get(corpus))
+
+    def _doc_keys(self, corpus: str, record: Dict[str, Any]) -> Dict[str, List[str]]:
+        return {
+            "token": sorted(set(tokenize(record["text"]))),
+            "emoji": extract_emoji(record["text"]),
+            "verdict": [record["verdict"]],
+            "reaction": sorted(record["reactions"].keys()),
+            "corpus": [corpus],
+        }
+
+    def _unpost(self, doc_id: str):
+        for field, values in self._keys.pop(doc_id, {}).items():
+            postings = self._postings[field]
+            for value in values:
+                bucket = postings.get(value)
+                if bucket is not None:
+                    bucket.discard(doc_id)
+                    if not bucket:
+                        del postings[value]
+
+    def _post(self, doc_id: str, keys: Dict[str, List[str]]):
+        self._keys[doc_id] = keys
+        for field, values in keys.items():
+            postings = self._postings[field]
+            for value in values:
+                postings.setdefault(value, set()).add(doc_id)
+
+    def add_comments(self, corpus: str, comments: Iterable[Any], platform: str = "linkedin",
+                     replace: bool = False) -> int:
+        """
+        Index comments for a corpus. Comments already indexed with identical
+        content are skipped, changed ones are re-indexed. A verdict set by the
+        classifier is kept for comments that don't carry an age group themselves.
+
+        Args:
+            corpus: corpus name (data file or URL)
+            comments: Comment records, or raw records in any supported export shape
+            platform: platform used to normalize raw records
+            replace: comments is the whole corpus; indexed comments missing from it are removed
+
+        Returns:
+            Number of comments added, updated or removed
+        """
+        changed = 0
+        with self._lock:
+            seen = set()
+            for position, raw in enumerate(comments, 1):
+                record = dict(index_record(comment_from_raw(raw, position, platform)), corpus=corpus)
+                doc_id = f"{corpus}:{record['comment_id']}"
+                seen.add(doc_id)
+                existing = self._docs.get(doc_id)
+                if existing is not None and record["verdict"] == "unclassified":
+                    record["verdict"] = existing["verdict"]
+                if existing == record:
+                    continue
+                self._unpost(doc_id)
+                self._docs[doc_id] = record
+                self._order.setdefault(doc_id, len(self._order))
+                self._post(doc_id, self._doc_keys(corpus, record))
+                changed += 1
+            if replace:
+                for doc_id in list(self._postings["corpus"].get(corpus, ())):
+                    if doc_id not in seen:
+                        self._unpost(doc_id)
+                        del self._docs[doc_id]
+                        del self._order[doc_id]
+                        changed += 1
+        return changed
+
+    def set_verdict(self, corpus: str, comment_id: str, verdict: str) -> bool:
+        """Update the classifier verdict of an indexed comment in place; False if it isn't indexed."""
+        doc_id = f"{corpus}:{comment_id}"
+        with self._lock:
+            record = self._docs.get(doc_id)
+            if record is None:
+                return False
+            if record["verdict"] == verdict:
+                return True
+            updated = dict(record, verdict=verdict)
+            self._unpost(doc_id)
+            self._docs[doc_id] = updated
+            self._post(doc_id, self._doc_keys(corpus, updated))
+            return True
+
+    def _match(self, field: str, values: List[str]) -> set:
+        postings = self._postings[field]
+        matched = set()
+        for value in values:
+            matched |= postings.get(value, set())
+        return matched
+
+    def search(
+        self,
+        terms: Optional[List[List[str]]] = None,
+        exclude: Optional[List[str]] = None,
+        filters: Optional[Dict[str, List[str]]] = None,
+        page: int = 1,
+        page_size: int = 20,
+        facets: Iterable[str] = FACET_FIELDS,
+    ) -> Dict[str, Any]:
+        """
+        Boolean query over the index.
+
+        Args:
+            terms: AND of OR-groups of tokens, e.g. [["great"], ["ai", "agent"]]
+            exclude: tokens that must not appear
+            filters: field -> accepted values (OR within a field, AND across fields)
+            page: 1-based page number
+            page_size: results per page
+            facets: fields to count over the whole match set
+
+        Returns:
+            Dictionary with total, page, results and facet counts
+        """
+        with self._lock:
+            matched = None
+
+            def narrow(current, candidates):
+                return candidates if current is None else current & candidates
+
+            for group in terms or []:
+                matched = narrow(matched, self._match("token", [t for word in group for t in tokenize(word)]))
+            for field, values in (filters or {}).items():
+                if field not in self._postings or not values:
+                    continue
+                matched = narrow(matched, self._match(field, values))
+            if matched is None:
+                matched = set(self._docs.keys())
+            if exclude:
+                matched = matched - self._match("token", [t for word in exclude for t in tokenize(word)])
+
+            ordered = sorted(matched, key=self._order.__getitem__)
+            page = max(page, 1)
+            page_size = max(1, min(page_size, 200))
+            start = (page - 1) * page_size
+
+            facet_counts = {}
+            for field in facets:
+                if field not in self._postings:
+                    continue
+                counts = {}
+                for doc_id in matched:
+                    for value in self._keys[doc_id][field]:
+                        counts[value] = counts.get(value, 0) + 1
+                facet_counts[field] = dict(sorted(counts.items(), key=lambda kv: (-kv[1], kv[0])))
+
+            return {
+                "total": len(ordered),
+                "page": page,
+                "page_size": page_size,
+                "results": [self._docs[doc_id] for doc_id in ordered[start:start + page_size]],
+                "facets": facet_counts,
+            }
+
+
+def parse_query(q: str):
+    """
+    Parse a free-text query: space separated terms are ANDed,
+    'a|b' is an OR-group and '-term' excludes a token.
+    """
+    terms, exclude = [], []
+    for part in (q or "").split():
+        if part.startswith("-") and len(part) > 1:
+            exclude.append(part[1:])
+        else:
+            group = [p for p in part.split("|") if p]
+            if group:
+                terms.append(group)
+    return terms, exclude
+
+
+# Process-wide index shared by the server and the analysis pipeline
+comment_index = CommentIndex()
@@ -0,0 +1,219 @@
+"""
+Unified comment model, platform adapters and a process-wide parsed-corpus cache.
+Every data file is read and parsed once per (path, mtime, size); all callers
+(analysis, /comments, the JSON tool and the age classifier) share the result.
+"""
+
+import os
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import orjson
+
+    def _loads(data):
+        return orjson.loads(data)
+except ImportError:  # orjson is optional; fall back to the stdlib parser
+    import json
+
+    def _loads(data):
+        return json.loads(data)
+
+
+@dataclass
+class Comment:
+    """One comment, whatever platform or export format it came from."""
+    comment_id: str
+    platform: str
+    text: str
+    author: str = "Unknown"
+    created_at: Optional[str] = None
+    timestamp_ms: Optional[int] = None
+    post_url: Optional[str] = None
+    likes: int = 0
+    replies: int = 0
+    shares: int = 0
+    impressions: int = 0
+    reactions: Dict[str, int] = field(default_factory=dict)
+    age_group: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _int(value) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def from_linkedin_export(item: Dict[str, Any], position: int, platform: str = "linkedin") -> Comment:
+    """Apify LinkedIn comments export (commentary / engagement / actor)."""
+    engagement = item.get("engagement") or {}
+    reactions = {}
+    for reaction in engagement.get("reactions") or []:
+        if reaction.get("type"):
+            reactions[reaction["type"]] = _int(reaction.get("count"))
+    return Comment(
+        comment_id=str(item.get("id") or f"c{position}"),
+        platform=platform,
+        text=item.get("commentary") or "",
+        author=(item.get("actor") or {}).get("name") or "Unknown",
+        created_at=item.get("createdAt"),
+        timestamp_ms=item.get("createdAtTimestamp"),
+        post_url=(item.get("query") or {}).get("post") or item.get("postId"),
+        likes=_int(engagement.get("likes")),
+        replies=_int(engagement.get("comments")),
+        shares=_int(engagement.get("shares")),
+        impressions=_int(engagement.get("impressions")),
+        reactions=reactions,
+    )
+
+
+def from_instagram_export(item: Dict[str, Any], position: int) -> Comment:
+    """Apify Instagram comments export (text / ownerUsername / likesCount)."""
+    if "commentary" in item:
+        # Our bundled Instagram sample uses the LinkedIn export layout
+        return from_linkedin_export(item, position, platform="instagram")
+    timestamp = item.get("timestamp")
+    return Comment(
+        comment_id=str(item.get("id") or f"c{position}"),
+        platform="instagram",
+        text=item.get("text") or "",
+        author=item.get("ownerUsername") or (item.get("owner") or {}).get("username") or "Unknown",
+        created_at=timestamp if isinstance(timestamp, str) else None,
+        post_url=item.get("postUrl"),
+        likes=_int(item.get("likesCount")),
+        replies=_int(item.get("repliesCount")),
+    )
+
+
+def from_simple_record(item: Any, position: int, platform: str, post_url: Optional[str] = None) -> Comment:
+    """
+    Plain records: classifier sample files (comment_id/author/text/timestamp),
+    simulator output (user/comment/age_group) and bare strings from the posts format.
+    """
+    if isinstance(item, str):
+        item = {"text": item}
+    age_group = item.get("age_group")
+    if age_group is None and "is_young_adult" in item:
+        age_group = "18-30" if item["is_young_adult"] else "other"
+    return Comment(
+        comment_id=str(item.get("comment_id") or item.get("id") or f"c{position}"),
+        platform=platform,
+        text=item.get("text") or item.get("comment") or "",
+        author=item.get("author") or item.get("user") or "Unknown",
+        created_at=item.get("timestamp") or item.get("createdAt"),
+        post_url=item.get("post_url") or post_url,
+        age_group=age_group,
+    )
+
+
+def comment_from_raw(item: Any, position: int, platform: str = "linkedin") -> Comment:
+    """Pick the adapter matching a single raw record."""
+    if isinstance(item, Comment):
+        return item
+    if isinstance(item, dict):
+        if "commentary" in item:
+            return from_linkedin_export(item, position, platform)
+        if platform == "instagram" and ("ownerUsername" in item or "likesCount" in item):
+            return from_instagram_export(item, position)
+    return from_simple_record(item, position, platform)
+
+
+def parse_comments(data: Any, platform: str = "linkedin") -> List[Comment]:
+    """
+    Normalize any supported payload: a list of records, {"comments": [...]}
+    or the posts format {"posts": [{"postUrl": ..., "comments": ["..."]}]}.
+
+    Raises:
+        ValueError: for payloads in none of these shapes
+    """
+    if isinstance(data, dict) and "posts" in data:
+        comments = []
+        for post_idx, post in enumerate(data["posts"], 1):
+            post_url = post.get("postUrl", f"post_{post_idx}")
+            for comment_idx, comment_text in enumerate(post.get("comments", []), 1):
+                comment = from_simple_record(comment_text, comment_idx, platform, post_url=post_url)
+                if comment.comment_id == f"c{comment_idx}":
+                    comment.comment_id = f"p{post_idx}_c{comment_idx}"
+                comments.append(comment)
+        return comments
+    if isinstance(data, dict) and "comments" in data:
+        data = data["comments"]
+    if not isinstance(data, list):
+        raise ValueError("Invalid JSON format. Expected 'posts' or 'comments' key")
+    return [comment_from_raw(item, position, platform) for position, item in enumerate(data, 1)]
+
+
+def guess_platform(path: str) -> str:
+    return "instagram" if "instagram" in os.path.basename(path).lower() else "linkedin"
+
+
+@dataclass
+class Corpus:
+    """A parsed data file: raw text (for prompts), parsed JSON and normalized comments."""
+    path: str
+    platform: str
+    text: str
+    data: Any
+    comments: List[Comment]
+
+
+class CorpusCache:
+    """Parsed corpora keyed by path, modification time and size."""
+
+    def __init__(self, max_entries: int = 16):
+        self.max_entries = max_entries
+        self._entries: Dict[Tuple[str, str], Tuple[Tuple[int, int], Corpus]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, path: str, platform: Optional[str] = None) -> Corpus:
+        """
+        Return the parsed corpus for a file, re-reading it only when it changed on disk.
+
+        Raises:
+            OSError: if the file cannot be read
+            ValueError: if the JSON is invalid or in an unknown shape
+        """
+        path = os.path.abspath(path)
+        platform = platform or guess_platform(path)
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        key = (path, platform)
+
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached and cached[0] == version:
+                self.hits += 1
+                return cached[1]
+
+        with open(path, "rb") as f:
+            raw = f.read()
+        data = _loads(raw)
+        corpus = Corpus(
+            path=path,
+            platform=platform,
+            text=raw.decode("utf-8"),
+            data=data,
+            comments=parse_comments(data, platform),
+        )
+
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (version, corpus)
+            while len(self._entries) > self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+        return corpus
+
+
+# Process-wide cache shared by every loader
+corpus_cache = CorpusCache()
+
+
+def load_corpus(path: str, platform: Optional[str] = None) -> Corpus:
+    return corpus_cache.load(path, platform)
@@ -0,0 +1,137 @@
+"""
+Shared model context for payloads several agents read.
+The comments corpus is uploaded once as Gemini cached content and every persona
+references it instead of re-sending it; repeat analyses of the same corpus reuse
+the cache until its TTL runs out. Small payloads (below the API minimum), a
+disabled cache or any caching error fall back to sending the text inline.
+"""
+
+import datetime
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from token_budget import estimate_tokens
+
+# The cached context carries no persona of its own; each request supplies the role
+CONTEXT_INSTRUCTION = (
+    "You analyse the social media comments provided in this context. "
+    "Follow the role and instructions given in each request."
+)
+
+
+class ContextCache:
+    """Cached contents keyed by model and payload hash, each valid for `ttl` seconds."""
+
+    def __init__(self, ttl: float = 600.0, min_tokens: int = 1024, enabled: bool = True, max_entries: int = 32):
+        """
+        Args:
+            ttl: lifetime of an uploaded context; reuse stops once it expires
+            min_tokens: payloads estimated below this are sent inline (API minimum)
+            enabled: False sends everything inline
+            max_entries: local handles kept; older ones simply expire upstream
+        """
+        self.ttl = ttl
+        self.min_tokens = min_tokens
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._stats = {"created": 0, "reused": 0, "inline": 0, "errors": 0, "tokens_not_resent": 0}
+
+    @staticmethod
+    def key(model_name: str, text: str) -> str:
+        return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _bump(self, name: str, amount: int = 1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def _live(self, key: str):
+        """Handle for key if it is still valid for a while (an in-flight call must not outlive it)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] - time.time() > min(30.0, self.ttl / 4):
+                self._entries.move_to_end(key)
+                return entry[0]
+            self._entries.pop(key, None)
+            return None
+
+    def get(self, model_name: str, text: str, create: Callable[[str, str, datetime.timedelta], Any],
+            on_create: Optional[Callable[[str], None]] = None):
+        """
+        Cached content for text on model_name, uploading it on first use.
+
+        Args:
+            create: (model_name, text, ttl) -> cached content handle (performs the upload)
+            on_create: called with the text when a new upload happens (budget accounting)
+
+        Returns:
+            The handle, or None when the text should be sent inline.
+        """
+        tokens = estimate_tokens(text)
+        if not self.enabled or tokens < self.min_tokens:
+            self._bump("inline")
+            return None
+
+        key = self.key(model_name, text)
+        cached = self._live(key)
+        if cached is not None:
+            self._bump("reused")
+            self._bump("tokens_not_resent", tokens)
+            return cached
+
+        # One upload per payload even when several personas ask at once
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            try:
+                cached = self._live(key)
+                if cached is not None:
+                    self._bump("reused")
+                    self._bump("tokens_not_resent", tokens)
+                    return cached
+                try:
+                    if on_create:
+                        on_create(text)
+                    cached = create(model_name, text, datetime.timedelta(seconds=self.ttl))
+                except Exception as e:
+                    print(f"⚠️  Context caching failed, sending comments inline: {e}")
+                    self._bump("errors")
+                    self._bump("inline")
+                    return None
+                with self._lock:
+                    self._entries[key] = (cached, time.time() + self.ttl)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                self._bump("created")
+                return cached
+            finally:
+                # Done with this payload either way; a later miss starts a fresh lock
+                with self._lock:
+                    if self._key_locks.get(key) is key_lock:
+                        del self._key_locks[key]
+
+    def invalidate(self, model_name: str, text: str):
+        """Forget a handle the API no longer accepts (expired or deleted upstream)."""
+        with self._lock:
+            self._entries.pop(self.key(model_name, text), None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["live"] = len(self._entries)
+        stats["ttl"] = self.ttl
+        return stats
+
+
+# Process-wide cache shared by every analysis
+context_cache = ContextCache(
+    ttl=float(os.environ.get("CONTEXT_CACHE_TTL", 600)),
+    min_tokens=int(os.environ.get("CONTEXT_CACHE_MIN_TOKENS", 1024)),
+    enabled=os.environ.get("CONTEXT_CACHE", "1") == "1",
+)
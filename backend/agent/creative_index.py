@@ -0,0 +1,223 @@
+"""
+Similarity index over past pre-launch analyses.
+Designers often resubmit a creative with tiny changes (a re-export, a slight
+crop, another compression level, one word of the caption). Each analyzed
+creative is recorded with a perceptual hash of its image (DCT hash, Pillow +
+NumPy) and its normalized caption; a new submission whose image is within
+`max_distance` bits and whose caption is at least `min_caption_similarity`
+alike reuses that analysis instead of running the personas and strategist.
+Matches never cross platform, target group or prompt version.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "creatives.sqlite3")
+
+HASH_SIZE = 8        # 8x8 low-frequency DCT block -> 64-bit hash
+HASH_SAMPLE = 32     # images are reduced to 32x32 grayscale first
+
+_dct_matrix = None
+
+
+def _dct(n: int):
+    """Orthonormal DCT-II matrix, so the 2D transform is D @ X @ D.T."""
+    import numpy as np
+
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+def perceptual_hash(image) -> int:
+    """
+    64-bit DCT hash of a PIL image. Re-encoding, rescaling and small crops
+    change only a few bits; different images differ in about half of them.
+    """
+    global _dct_matrix
+    import numpy as np
+    from PIL import Image
+
+    if _dct_matrix is None:
+        _dct_matrix = _dct(HASH_SAMPLE)
+    gray = image.convert("L").resize((HASH_SAMPLE, HASH_SAMPLE), Image.Resampling.LANCZOS)
+    pixels = np.asarray(gray, dtype=np.float64)
+    low = (_dct_matrix @ pixels @ _dct_matrix.T)[:HASH_SIZE, :HASH_SIZE].flatten()
+    # The DC term only carries overall brightness
+    bits = low > np.median(low[1:])
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def normalize_caption(text: str) -> List[str]:
+    """Lowercased word tokens with accents, punctuation and URLs dropped; hashtags and mentions kept."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    text = re.sub(r"https?://\S+", " ", text)
+    return re.findall(r"[#@]?\w+", text)
+
+
+def caption_similarity(a: List[str], b: List[str]) -> float:
+    """Token-level similarity in [0, 1]; one changed word in a 20-word caption is ~0.95."""
+    if not a and not b:
+        return 1.0
+    return SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+
+class CreativeIndex:
+    """Perceptual hashes and captions of analyzed creatives, persisted in SQLite and scanned in memory."""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, max_distance: int = 6,
+                 min_caption_similarity: float = 0.9, enabled: bool = True):
+        """
+        Args:
+            db_path: SQLite file holding the index
+            max_distance: largest image hash distance (bits of 64) that counts as the same creative
+            min_caption_similarity: smallest caption similarity that counts as the same copy
+            enabled: False makes find() always miss (add() still records)
+        """
+        self.db_path = db_path
+        self.max_distance = max_distance
+        self.min_caption_similarity = min_caption_similarity
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[tuple, List[Dict[str, Any]]]] = None
+        self._stats = {"lookups": 0, "reused": 0, "added": 0}
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS creatives (
+                    fingerprint TEXT PRIMARY KEY,
+                    phash TEXT NOT NULL,
+                    caption TEXT NOT NULL,
+                    platform TEXT NOT NULL,
+                    target_group TEXT NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    @staticmethod
+    def _entry(fp, phash, caption, created_at):
+        return {"fingerprint": fp, "phash": phash, "tokens": normalize_caption(caption), "created_at": created_at}
+
+    def _load(self):
+        """Reads the table into memory once; the scan itself never touches SQLite."""
+        if self._entries is not None:
+            return
+        entries: Dict[tuple, List[Dict[str, Any]]] = {}
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT fingerprint, phash, caption, platform, target_group, prompt_version, created_at FROM creatives"
+            ).fetchall()
+        for fp, phash, caption, platform, target_group, version, created_at in rows:
+            entries.setdefault((platform, target_group, version), []).append(
+                self._entry(fp, int(phash, 16), caption, created_at))
+        self._entries = entries
+
+    def add(self, fp: str, image, caption: str, platform: str, target_group: str, prompt_version: str):
+        """Records an analyzed creative under its result-store fingerprint."""
+        phash = perceptual_hash(image)
+        now = time.time()
+        with self._lock:
+            self._load()
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO creatives VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (fp, format(phash, "016x"), caption or "", platform, target_group, prompt_version, now),
+                )
+            bucket = self._entries.setdefault((platform, target_group, prompt_version), [])
+            bucket[:] = [e for e in bucket if e["fingerprint"] != fp]
+            bucket.append(self._entry(fp, phash, caption, now))
+            self._stats["added"] += 1
+
+    def find(self, image, caption: str, platform: str, target_group: str,
+             prompt_version: str, exclude=()) -> Optional[Dict[str, Any]]:
+        """
+        Closest recorded creative within both thresholds, as
+        {fingerprint, image_distance, caption_similarity}, or None.
+        Ties on image distance go to the more similar caption, then the newer entry.
+        """
+        if not self.enabled:
+            return None
+        phash = perceptual_hash(image)
+        tokens = normalize_caption(caption)
+        best = None
+        with self._lock:
+            self._stats["lookups"] += 1
+            self._load()
+            candidates = list(self._entries.get((platform, target_group, prompt_version), ()))
+        for entry in candidates:
+            if entry["fingerprint"] in exclude:
+                continue
+            distance = hamming(phash, entry["phash"])
+            if distance > self.max_distance:
+                continue
+            similarity = caption_similarity(tokens, entry["tokens"])
+            if similarity < self.min_caption_similarity:
+                continue
+            rank = (distance, -similarity, -entry["created_at"])
+            if best is None or rank < best[0]:
+                best = (rank, {"fingerprint": entry["fingerprint"], "image_distance": distance,
+                               "caption_similarity": round(similarity, 3)})
+        return best[1] if best else None
+
+    def record_reuse(self):
+        with self._lock:
+            self._stats["reused"] += 1
+
+    def remove(self, fp: str):
+        """Drops an entry whose analysis is gone from the result store."""
+        with self._lock:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM creatives WHERE fingerprint = ?", (fp,))
+            for bucket in (self._entries or {}).values():
+                bucket[:] = [e for e in bucket if e["fingerprint"] != fp]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = sum(len(b) for b in self._entries.values()) if self._entries is not None else None
+        stats.update(max_distance=self.max_distance, min_caption_similarity=self.min_caption_similarity,
+                     enabled=self.enabled)
+        return stats
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_creative_index() -> CreativeIndex:
+    """Process-wide index configured from the environment."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = CreativeIndex(
+                db_path=os.environ.get("CREATIVE_INDEX_PATH", DEFAULT_DB_PATH),
+                max_distance=int(os.environ.get("CREATIVE_MAX_HASH_DISTANCE", 6)),
+                min_caption_similarity=float(os.environ.get("CREATIVE_MIN_CAPTION_SIMILARITY", 0.9)),
+                enabled=os.environ.get("CREATIVE_REUSE", "1") == "1",
+            )
+        return _index
@@ -0,0 +1,137 @@
+"""
+Response compression and cache validators for the API.
+Encodings are negotiated from Accept-Encoding (brotli when the module is
+installed and the client takes it, gzip otherwise); analysis responses carry an
+ETag for the stored run so a client that already has it gets a bodyless 304.
+"""
+
+import gzip
+import os
+from typing import Optional
+
+# Bodies smaller than this are cheaper to send than to compress
+MIN_COMPRESS_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 1024))
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript")
+
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", 5))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", 6))
+
+_brotli = None
+
+
+def get_brotli():
+    """Lazy brotli import; None when it is not installed."""
+    global _brotli
+    if _brotli is None:
+        try:
+            import brotli
+            _brotli = brotli
+        except ImportError:
+            _brotli = False
+    return _brotli or None
+
+
+def _qvalues(accept_encoding: str) -> dict:
+    values = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        values[coding] = q
+    return values
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick "br" or "gzip" for an Accept-Encoding header, or None for identity.
+    The higher q-value wins; brotli wins ties.
+    """
+    if not accept_encoding:
+        return None
+    q = _qvalues(accept_encoding)
+    wildcard = q.get("*", 0.0)
+    candidates = []
+    if get_brotli():
+        candidates.append(("br", q.get("br", wildcard)))
+    candidates.append(("gzip", q.get("gzip", wildcard)))
+    best, best_q = max(candidates, key=lambda item: item[1])
+    return best if best_q > 0 else None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return get_brotli().compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    raise ValueError(f"Unsupported encoding '{encoding}'")
+
+
+def compressible(mimetype: Optional[str], size: int) -> bool:
+    return bool(mimetype) and size >= MIN_COMPRESS_BYTES and mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+def response_encoding(mimetype: Optional[str], size: int, accept_encoding: Optional[str]) -> Optional[str]:
+    """The Content-Encoding compress_response gives such a body, or None."""
+    if not compressible(mimetype, size):
+        return None
+    return negotiate(accept_encoding)
+
+
+def encoded_etag(etag: Optional[str], encoding: Optional[str]) -> Optional[str]:
+    """The validator names the representation, so an encoded body gets its own."""
+    if etag and encoding and etag.endswith('"'):
+        return f'{etag[:-1]}-{encoding}"'
+    return etag
+
+
+def compress_response(response, accept_encoding: Optional[str]):
+    """Compresses a Flask response in place when the client and content allow it."""
+    if (response.direct_passthrough or response.status_code < 200 or response.status_code in (204, 206, 304)
+            or "Content-Encoding" in response.headers):
+        return response
+    response.vary.add("Accept-Encoding")
+    body = response.get_data()
+    encoding = response_encoding(response.mimetype, len(body), accept_encoding)
+    if not encoding:
+        return response
+    response.set_data(compress(body, encoding))
+    response.headers["Content-Encoding"] = encoding
+    if response.headers.get("ETag"):
+        response.headers["ETag"] = encoded_etag(response.headers["ETag"], encoding)
+    return response
+
+
+def analysis_etag(fp: str, run_id) -> str:
+    """Strong validator for one stored run of an analysis: a forced re-run gets a new one."""
+    return f'"{fp[:32]}-{run_id}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    If-None-Match comparison (weak, per RFC 9110), ignoring the encoding
+    suffix that compress_response appends.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    base = etag.strip('"')
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        candidate = candidate.strip('"')
+        for suffix in ("-br", "-gzip"):
+            if candidate.endswith(suffix) and candidate[:-len(suffix)] == base:
+                return True
+        if candidate == base:
+            return True
+    return False
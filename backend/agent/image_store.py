@@ -0,0 +1,234 @@
+"""
+Content-addressed store for uploaded creatives.
+Images are streamed to disk under their sha256, so the same creative is
+stored and decoded once no matter how many analyses reference it. A periodic
+sweep removes images unused for longer than the retention period and, past the
+size cap, the least recently used ones.
+"""
+
+import hashlib
+import io
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_IMAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "images")
+
+_IMAGE_ID_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def content_id(image) -> str:
+    """
+    Content hash of a decoded image, for cache keys. Images loaded from the
+    store or from raw bytes carry the sha256 of their file; any other image is
+    hashed by its pixels once and the hash is remembered on the object, so
+    decoded images must be treated as read-only.
+    """
+    cached = getattr(image, "content_id", None)
+    if cached is None:
+        digest = hashlib.sha256(f"{image.mode}{image.size}".encode("utf-8"))
+        digest.update(image.tobytes())
+        cached = image.content_id = digest.hexdigest()
+    return cached
+
+
+class ImageStore:
+    """Stores image bytes by content hash and keeps a small LRU of decoded images."""
+
+    def __init__(self, root: str = DEFAULT_IMAGE_DIR, max_bytes: int = 20 * 1024 * 1024, decoded_cache_size: int = 32,
+                 retention_days: float = 30.0, max_total_bytes: int = 1024 * 1024 * 1024,
+                 sweep_interval: float = 300.0):
+        """
+        Args:
+            root: directory holding the stored images
+            max_bytes: largest accepted upload
+            decoded_cache_size: number of decoded PIL images kept in memory
+            retention_days: images not used for this long are removed
+            max_total_bytes: total stored size; least recently used images are removed beyond it
+            sweep_interval: seconds between sweeps triggered by new uploads
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.decoded_cache_size = decoded_cache_size
+        self.retention_days = retention_days
+        self.max_total_bytes = max_total_bytes
+        self.sweep_interval = sweep_interval
+        self._decoded = OrderedDict()
+        self._lock = threading.Lock()
+        self._sweep_lock = threading.Lock()
+        self._last_sweep = 0.0
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def is_valid_id(image_id: str) -> bool:
+        return bool(image_id) and bool(_IMAGE_ID_RE.match(image_id))
+
+    def path(self, image_id: str) -> str:
+        if not self.is_valid_id(image_id):
+            raise ValueError(f"Invalid image id: {image_id}")
+        return os.path.join(self.root, image_id[:2], image_id)
+
+    def exists(self, image_id: str) -> bool:
+        return self.is_valid_id(image_id) and os.path.exists(self.path(image_id))
+
+    def put_stream(self, stream, chunk_size: int = 1 << 16):
+        """
+        Stream an upload to disk while hashing it.
+
+        Returns:
+            (image_id, size, reused) where reused is True if the image was already stored
+        """
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                while True:
+                    chunk = stream.read(chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise ValueError(f"Image larger than {self.max_bytes // (1024 * 1024)} MB")
+                    digest.update(chunk)
+                    tmp.write(chunk)
+            if size == 0:
+                raise ValueError("Empty image upload")
+
+            image_id = digest.hexdigest()
+            target = self.path(image_id)
+            if os.path.exists(target):
+                os.remove(tmp_path)
+                self._touch(image_id)
+                return image_id, size, True
+
+            self._validate(tmp_path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(tmp_path, target)
+            self._maybe_sweep()
+            return image_id, size, False
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def put_bytes(self, data: bytes):
+        """Store in-memory image bytes (e.g. a legacy base64 payload). Same return as put_stream."""
+        return self.put_stream(io.BytesIO(data))
+
+    @staticmethod
+    def _validate(path: str):
+        from PIL import Image
+        try:
+            with Image.open(path) as image:
+                image.verify()
+        except Exception as e:
+            raise ValueError(f"Invalid image data: {e}")
+
+    def mimetype(self, image_id: str) -> str:
+        from PIL import Image
+        return Image.MIME.get(self.load(image_id).format, "application/octet-stream")
+
+    def _touch(self, image_id: str):
+        """Marks an image as used now; the sweep goes by modification time."""
+        try:
+            os.utime(self.path(image_id))
+        except OSError:
+            pass
+
+    def load(self, image_id: str):
+        """Decoded PIL image for an id, served from the LRU when possible."""
+        with self._lock:
+            image = self._decoded.get(image_id)
+            if image is not None:
+                self._decoded.move_to_end(image_id)
+        if image is not None:
+            self._touch(image_id)
+            return image
+
+        if not self.exists(image_id):
+            raise KeyError(f"Unknown image id: {image_id}")
+        from PIL import Image
+        with open(self.path(image_id), "rb") as f:
+            image = Image.open(f)
+            image.load()
+        image.content_id = image_id
+
+        with self._lock:
+            self._decoded[image_id] = image
+            while len(self._decoded) > self.decoded_cache_size:
+                self._decoded.popitem(last=False)
+        self._touch(image_id)
+        return image
+
+    def _maybe_sweep(self):
+        if time.time() - self._last_sweep < self.sweep_interval:
+            return
+        # One sweep at a time; an upload never waits for another's sweep
+        if not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self.sweep()
+        except OSError as e:
+            print(f"⚠️  Image store sweep failed: {e}")
+        finally:
+            self._sweep_lock.release()
+
+    def sweep(self) -> int:
+        """Removes expired images, then the least recently used ones above max_total_bytes. Returns how many."""
+        self._last_sweep = now = time.time()
+        entries = []
+        for prefix in os.listdir(self.root):
+            directory = os.path.join(self.root, prefix)
+            if not os.path.isdir(directory):
+                continue
+            for image_id in os.listdir(directory):
+                if not self.is_valid_id(image_id):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(directory, image_id))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, image_id))
+
+        entries.sort()
+        cutoff = now - self.retention_days * 86400
+        total = sum(size for _, size, _ in entries)
+        removed = []
+        for mtime, size, image_id in entries:
+            if mtime >= cutoff and total <= self.max_total_bytes:
+                break
+            try:
+                os.remove(self.path(image_id))
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed.append(image_id)
+
+        with self._lock:
+            for image_id in removed:
+                self._decoded.pop(image_id, None)
+        if removed:
+            print(f"🧹 Image store: removed {len(removed)} unused images")
+        return len(removed)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_image_store() -> ImageStore:
+    """Process-wide image store configured from the environment."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ImageStore(
+                root=os.environ.get("IMAGE_STORE_PATH", DEFAULT_IMAGE_DIR),
+                max_bytes=int(os.environ.get("IMAGE_MAX_MB", 20)) * 1024 * 1024,
+                retention_days=float(os.environ.get("IMAGE_STORE_RETENTION_DAYS", 30)),
+                max_total_bytes=int(os.environ.get("IMAGE_STORE_MAX_MB", 1024)) * 1024 * 1024,
+            )
+        return _store
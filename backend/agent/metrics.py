@@ -0,0 +1,164 @@
+"""
+Deterministic engagement metrics for a comments corpus.
+Computed with pandas/NumPy from the numbers the exports already carry (likes,
+replies, shares, impressions and per-type reactions), so the strategist gets
+measured figures instead of inventing them and the dashboard fields are filled
+directly.
+"""
+
+import math
+from typing import Any, Dict, List, Optional
+
+from comments import Comment
+
+# Interactions per comment at which the 0-10 score reaches ~6.3 (1 - 1/e)
+SCORE_SCALE = 3.0
+# Robust z-score above which a comment counts as an outlier
+OUTLIER_Z = 3.5
+# Fewer comments than this across the two compared weeks give no trend
+MIN_TREND_COMMENTS = 5
+
+
+def _frame(comments: List[Comment]):
+    import pandas as pd
+
+    rows = []
+    for c in comments:
+        reactions = sum(c.reactions.values())
+        rows.append({
+            "comment_id": c.comment_id,
+            "text": c.text,
+            "timestamp_ms": c.timestamp_ms,
+            "likes": c.likes,
+            "replies": c.replies,
+            "shares": c.shares,
+            "impressions": c.impressions,
+            "reactions": reactions,
+        })
+    df = pd.DataFrame(rows)
+    df["interactions"] = df["likes"] + df["replies"] + df["shares"] + df["reactions"]
+    return df
+
+
+def _velocity(df) -> Dict[str, Any]:
+    import pandas as pd
+
+    dated = df.dropna(subset=["timestamp_ms"])
+    if dated.empty:
+        return {"comments_per_day": None, "peak_day": None, "trend": None, "median_gap_hours": None}
+
+    times = pd.to_datetime(dated["timestamp_ms"].astype("int64"), unit="ms", utc=True).sort_values()
+    daily = times.dt.floor("D").value_counts().sort_index()
+    daily = daily.reindex(pd.date_range(daily.index.min(), daily.index.max(), freq="D"), fill_value=0)
+
+    # Last 7 days (up to the newest comment) against the 7 before them; >1 means the
+    # conversation is accelerating. A quiet tail, e.g. one late comment months after
+    # the launch, is too little to call a trend, so it stays None. Add-one smoothing
+    # keeps a first busy week after an empty one finite.
+    recent = daily.iloc[-7:]
+    previous = daily.iloc[-14:-7]
+    trend = None
+    if len(daily) > 7 and recent.sum() + previous.sum() >= MIN_TREND_COMMENTS:
+        trend = round(float((recent.sum() + 1) / len(recent) / ((previous.sum() + 1) / len(previous))), 2)
+
+    gaps = times.diff().dropna().dt.total_seconds() / 3600
+    return {
+        "comments_per_day": round(float(daily.mean()), 2),
+        "peak_day": daily.idxmax().strftime("%Y-%m-%d"),
+        "peak_day_comments": int(daily.max()),
+        "trend": trend,
+        "median_gap_hours": round(float(gaps.median()), 2) if not gaps.empty else None,
+    }
+
+
+def _outliers(df, limit: int = 5) -> List[Dict[str, Any]]:
+    import numpy as np
+
+    values = df["interactions"].to_numpy(dtype=float)
+    median = np.median(values)
+    mad = np.median(np.abs(values - median))
+    if mad == 0:
+        # Mostly identical counts: anything above the bulk stands out
+        mask = values > median
+    else:
+        mask = 0.6745 * (values - median) / mad > OUTLIER_Z
+    picked = df[mask].sort_values("interactions", ascending=False).head(limit)
+    return [
+        {"comment_id": row.comment_id, "text": row.text[:140], "interactions": int(row.interactions)}
+        for row in picked.itertuples()
+    ]
+
+
+def engagement_metrics(comments: List[Comment]) -> Optional[Dict[str, Any]]:
+    """
+    Corpus-level engagement figures plus ready-made dashboard fields.
+    Returns None for an empty corpus.
+    """
+    if not comments:
+        return None
+
+    df = _frame(comments)
+    count = len(df)
+    totals = {k: int(df[k].sum()) for k in ("likes", "replies", "shares", "impressions", "reactions", "interactions")}
+    per_comment = totals["interactions"] / count
+
+    reaction_totals: Dict[str, int] = {}
+    for c in comments:
+        for reaction, n in c.reactions.items():
+            reaction_totals[reaction] = reaction_totals.get(reaction, 0) + n
+    reaction_sum = sum(reaction_totals.values())
+    reaction_mix = {
+        reaction: round(n / reaction_sum, 3) if reaction_sum else 0.0
+        for reaction, n in sorted(reaction_totals.items(), key=lambda item: -item[1])
+    }
+
+    rates = {
+        "interactions_per_comment": round(per_comment, 3),
+        "share_rate": round(totals["shares"] / count, 3),
+        "reply_rate": round(totals["replies"] / count, 3),
+        "engaged_comment_share": round(float((df["interactions"] > 0).mean()), 3),
+        "engagement_rate": round(totals["interactions"] / totals["impressions"], 4) if totals["impressions"] else None,
+    }
+    velocity = _velocity(df)
+    outliers = _outliers(df)
+
+    score = round(10 * (1 - math.exp(-per_comment / SCORE_SCALE)), 1)
+    trend = velocity.get("trend")
+    if rates["share_rate"] >= 0.05 or (trend or 0) >= 1.5:
+        virality = "High"
+    elif per_comment >= 1 or (trend or 0) >= 1.0:
+        virality = "Medium"
+    else:
+        virality = "Low"
+
+    explanation = f"{per_comment:.1f} interactions per comment across {count} comments"
+    if velocity["comments_per_day"] is not None:
+        explanation += f", {velocity['comments_per_day']} comments/day"
+    if trend is not None:
+        explanation += f" (last week x{trend})"
+
+    return {
+        "comments": count,
+        "totals": totals,
+        "rates": rates,
+        "reaction_mix": reaction_mix,
+        "velocity": velocity,
+        "outliers": outliers,
+        "dashboard": {
+            "score": f"{score}/10",
+            "virality": virality,
+            "explanation": explanation,
+            "source": "computed",
+        },
+    }
+
+
+def strategist_summary(metrics: Dict[str, Any]) -> Dict[str, Any]:
+    """The compact subset of the metrics worth spending strategist tokens on."""
+    return {
+        "comments": metrics["comments"],
+        "rates": metrics["rates"],
+        "reaction_mix": dict(list(metrics["reaction_mix"].items())[:5]),
+        "velocity": metrics["velocity"],
+        "top_comments": [o["text"] for o in metrics["outliers"][:3]],
+    }
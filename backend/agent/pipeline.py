@@ -0,0 +1,224 @@
+"""
+Small declarative pipeline engine for the agent flows.
+Each stage is a node with declared inputs; a node starts as soon as its inputs
+are ready, so independent nodes (the personas) run in parallel. Node outputs are
+memoized by a hash of the node's inputs and version, so editing one prompt only
+re-runs the nodes that read it and everything downstream of them.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple, Type, Union
+
+from image_store import content_id
+
+
+def digest(value: Any, h=None):
+    """Stable content hash of a node input (strings, containers, bytes and PIL images)."""
+    h = h or hashlib.sha256()
+    if value is None or isinstance(value, (bool, int, float)):
+        h.update(repr(value).encode("utf-8"))
+    elif isinstance(value, str):
+        h.update(b"s" + value.encode("utf-8"))
+    elif isinstance(value, bytes):
+        h.update(b"b" + value)
+    elif isinstance(value, dict):
+        h.update(b"{")
+        for key in sorted(value, key=str):
+            digest(str(key), h)
+            digest(value[key], h)
+        h.update(b"}")
+    elif isinstance(value, (list, tuple)):
+        h.update(b"[")
+        for item in value:
+            digest(item, h)
+        h.update(b"]")
+    elif hasattr(value, "tobytes"):
+        h.update(b"img" + content_id(value).encode("utf-8"))
+    else:
+        h.update(repr(value).encode("utf-8"))
+    return h
+
+
+class Node:
+    """One pipeline stage: fn(context, **inputs) -> output."""
+
+    def __init__(self, name: str, fn: Callable[..., Any], inputs: Union[Sequence[str], Mapping[str, str]] = (),
+                 version: str = "1", memoize: bool = True):
+        """
+        Args:
+            name: output name other nodes refer to
+            fn: called with the run context and the declared inputs as keyword arguments
+            inputs: names of pipeline parameters or upstream nodes, or a mapping
+                of fn argument name -> parameter/node name
+            version: bump when inline prompts or logic inside fn change
+            memoize: False for cheap or side-effecting nodes (loaders, indexers)
+        """
+        self.name = name
+        self.fn = fn
+        self.inputs = dict(inputs) if isinstance(inputs, Mapping) else {name: name for name in inputs}
+        self.version = version
+        self.memoize = memoize
+
+    def key(self, namespace: str, values: Dict[str, Any]) -> str:
+        h = hashlib.sha256(f"{namespace}/{self.name}\0{self.version}".encode("utf-8"))
+        for arg in sorted(self.inputs):
+            h.update(arg.encode("utf-8"))
+            digest(values[arg], h)
+        return h.hexdigest()
+
+
+class NodeMemo:
+    """In-process LRU of node outputs with a TTL."""
+
+    def __init__(self, max_entries: int = 512, ttl: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        """Returns (found, value)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.time() - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            self._entries.pop(key, None)
+            self.misses += 1
+            return False, None
+
+    def put(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class Pipeline:
+    """A DAG of nodes run over a set of parameters."""
+
+    def __init__(self, name: str, nodes: List[Node], memo: Optional[NodeMemo] = None,
+                 abort_on: Tuple[Type[BaseException], ...] = ()):
+        """
+        Args:
+            abort_on: exception types that stop the whole run and propagate from
+                run() instead of being reported as a failed node
+        """
+        self.name = name
+        self.nodes = {node.name: node for node in nodes}
+        self.memo = memo
+        self.abort_on = abort_on
+        self._check()
+
+    def _check(self):
+        """Rejects cycles up front; unknown inputs are treated as run parameters."""
+        visiting, done = set(), set()
+
+        def visit(name):
+            if name in done or name not in self.nodes:
+                return
+            if name in visiting:
+                raise ValueError(f"Pipeline '{self.name}' has a cycle through '{name}'")
+            visiting.add(name)
+            for dep in self.nodes[name].inputs.values():
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.nodes:
+            visit(name)
+
+    def run(self, params: Dict[str, Any], context: Any = None, force: bool = False):
+        """
+        Runs every node, each as soon as its inputs are available.
+
+        Args:
+            params: values for inputs that are not produced by a node
+            context: passed to every node (request budget and the like); never hashed
+            force: ignore memoized outputs (fresh outputs are still memoized)
+
+        Returns:
+            (outputs, report): node outputs by name (None for failed or skipped
+            nodes) and per-node status/duration/error.
+
+        Raises:
+            ValueError: when params lack an input no node produces
+            any abort_on exception a node raised (once the nodes in flight finish)
+        """
+        missing = {i for node in self.nodes.values() for i in node.inputs.values()
+                   if i not in self.nodes and i not in params}
+        if missing:
+            raise ValueError(f"Pipeline '{self.name}' is missing parameters: {sorted(missing)}")
+
+        values = dict(params)
+        report: Dict[str, Dict[str, Any]] = {}
+        remaining = dict(self.nodes)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=max(1, len(self.nodes)), thread_name_prefix=f"pipeline-{self.name}") as pool:
+            while remaining or running:
+                for name in list(remaining):
+                    node = remaining[name]
+                    deps = [i for i in node.inputs.values() if i in self.nodes]
+                    if any(dep in remaining or dep in running.values() for dep in deps):
+                        continue
+                    del remaining[name]
+                    failed = [dep for dep in deps if report[dep]["status"] in ("error", "skipped")]
+                    if failed:
+                        values[name] = None
+                        report[name] = {"status": "skipped", "error": f"upstream '{failed[0]}' failed"}
+                        continue
+                    inputs = {arg: values[source] for arg, source in node.inputs.items()}
+                    running[pool.submit(self._run_node, node, inputs, context, force)] = name
+
+                if not running:
+                    continue
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    values[name], report[name] = future.result()
+
+        outputs = {name: values.get(name) for name in self.nodes}
+        return outputs, report
+
+    def _run_node(self, node: Node, inputs: Dict[str, Any], context: Any, force: bool):
+        started = time.perf_counter()
+        key = node.key(self.name, inputs) if node.memoize and self.memo is not None else None
+
+        if key and not force:
+            found, output = self.memo.get(key)
+            if found:
+                return output, {"status": "memoized", "duration_s": round(time.perf_counter() - started, 4)}
+
+        try:
+            output = node.fn(context, **inputs)
+        except self.abort_on:
+            raise
+        except Exception as e:
+            print(f"❌ {self.name}/{node.name} failed: {e}")
+            return None, {"status": "error", "error": str(e), "duration_s": round(time.perf_counter() - started, 4)}
+
+        # Empty outputs are how nodes report a soft failure; don't pin them
+        if key and output:
+            self.memo.put(key, output)
+        return output, {"status": "ran", "duration_s": round(time.perf_counter() - started, 4)}
+
+
+# Process-wide memo shared by every pipeline
+node_memo = NodeMemo(
+    max_entries=int(os.environ.get("PIPELINE_MEMO_ENTRIES", 512)),
+    ttl=float(os.environ.get("PIPELINE_MEMO_TTL", 3600)),
+)
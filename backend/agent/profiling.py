@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+On-demand profiling for slow requests and scripts.
+
+Each profiled run writes two files to the profile directory, tagged with the
+request id:
+  <id>.pstats  deterministic cProfile data for the calling thread
+               (inspect with `python -m pstats` or snakeviz)
+  <id>.folded  sampled stacks of every busy thread in collapsed format
+               (flamegraph.pl, speedscope, inferno), which also covers
+               pipeline and model-call worker threads
+
+CLI, profiling a whole script run the same way:
+  python profiling.py [--out DIR] [--tag NAME] [--interval SECONDS] script.py [args...]
+"""
+
+import argparse
+import cProfile
+import os
+import re
+import runpy
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Optional
+
+DEFAULT_PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "profiles")
+
+# Client-supplied request ids end up in file names
+_REQUEST_ID = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+# Leaf frames of threads that are parked, not working; they would drown the flamegraph
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("socketserver.py", "serve_forever"),
+}
+
+
+def profile_dir() -> str:
+    return os.environ.get("PROFILE_DIR", DEFAULT_PROFILE_DIR)
+
+
+class StackSampler:
+    """Samples the stacks of all threads at a fixed interval and counts collapsed stacks."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.counts[";".join(reversed(stack))] += 1
+
+    def write_folded(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class Profile:
+    """cProfile on the current thread plus a whole-process stack sampler."""
+
+    def __init__(self, tag: Optional[str] = None, directory: Optional[str] = None, interval: float = 0.005):
+        self.tag = tag or uuid.uuid4().hex[:12]
+        self.directory = directory or profile_dir()
+        self.profiler = cProfile.Profile()
+        self.sampler = StackSampler(interval)
+        self.started = None
+        self.duration = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.sampler.start()
+        self.profiler.enable()
+        return self
+
+    def stop(self):
+        """Stops profiling and writes both files. Returns (pstats_path, folded_path)."""
+        self.profiler.disable()
+        self.sampler.stop()
+        self.duration = time.perf_counter() - self.started
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, self.tag)
+        self.profiler.dump_stats(f"{base}.pstats")
+        self.sampler.write_folded(f"{base}.folded")
+        print(f"📈 Profile {self.tag}: {self.duration:.2f}s -> {base}.pstats / .folded")
+        return f"{base}.pstats", f"{base}.folded"
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+def should_profile(header_value: Optional[str]) -> bool:
+    """
+    PROFILE_REQUESTS=1 profiles every request. Otherwise a request opts in with
+    the X-Profile header, which must equal PROFILE_TOKEN; without a configured
+    token the header is ignored.
+    """
+    if os.environ.get("PROFILE_REQUESTS") == "1":
+        return True
+    token = os.environ.get("PROFILE_TOKEN")
+    return bool(token and header_value) and header_value == token
+
+
+def profile_request_id(header_value: Optional[str]) -> str:
+    """The client's X-Request-Id if it is a safe file name component, else a generated id."""
+    if header_value and _REQUEST_ID.fullmatch(header_value):
+        return header_value
+    return uuid.uuid4().hex[:12]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile a Python script run (pstats + folded stacks)")
+    parser.add_argument("--out", default=None, help=f"profile directory (default: PROFILE_DIR or {DEFAULT_PROFILE_DIR})")
+    parser.add_argument("--tag", default=None, help="file name for the profile (default: script name + timestamp)")
+    parser.add_argument("--interval", type=float, default=0.005, help="stack sampling interval in seconds")
+    parser.add_argument("script")
+    parser.add_argument("args", nargs=argparse.REMAINDER)
+    args = parser.parse_args(argv)
+
+    script = os.path.abspath(args.script)
+    tag = args.tag or f"{os.path.splitext(os.path.basename(script))[0]}-{time.strftime('%Y%m%d-%H%M%S')}"
+
+    # Run the script as if invoked directly: its own argv and directory on sys.path
+    sys.argv = [script] + args.args
+    sys.path.insert(0, os.path.dirname(script))
+    with Profile(tag=tag, directory=args.out, interval=args.interval):
+        try:
+            runpy.run_path(script, run_name="__main__")
+        except SystemExit:
+            pass
+
+
+if __name__ == "__main__":
+    main()
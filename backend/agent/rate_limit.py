@@ -0,0 +1,132 @@
+"""
+Shared rate limiting for model calls.
+Every thread in the process draws from the same bucket, so concurrent
+workers together stay under the API quota. The Gemini bucket is kept in a
+SQLite file, so separate processes (the server, a batch_analyze run, the
+LinkedIn age classifier) draw from it too.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+
+class RateLimiter:
+    """Token bucket: `rate` calls per `per` seconds with bursts up to `burst`."""
+
+    def __init__(self, rate: float, per: float = 60.0, burst: int = None):
+        self.rate = rate
+        self.per = per
+        self.capacity = burst or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate / self.per)
+        self._updated = now
+
+    def acquire(self, timeout: float = None) -> bool:
+        """
+        Block until a call may proceed.
+
+        Returns:
+            False if timeout elapsed before a token became available
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) * self.per / self.rate
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+class SharedRateLimiter(RateLimiter):
+    """
+    The same token bucket stored in a SQLite file, so every process opening
+    the file shares one quota. Each take is a single write transaction.
+    """
+
+    def __init__(self, db_path: str, rate: float, per: float = 60.0, burst: int = None, name: str = "default"):
+        super().__init__(rate, per, burst)
+        self.db_path = db_path
+        self.name = name
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS buckets (
+                    name TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+
+    def _take(self) -> float:
+        """Takes a token if one is available; returns 0, or the seconds until one is."""
+        conn = self._connect()
+        try:
+            # Lock the file before reading so two processes can't spend the same token
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            row = conn.execute("SELECT tokens, updated_at FROM buckets WHERE name = ?", (self.name,)).fetchone()
+            tokens = float(self.capacity) if row is None else row[0] + max(0.0, now - row[1]) * self.rate / self.per
+            tokens = min(self.capacity, tokens)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) * self.per / self.rate
+            conn.execute("INSERT OR REPLACE INTO buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                         (self.name, tokens, now))
+            conn.execute("COMMIT")
+            return wait
+        finally:
+            conn.close()
+
+    def acquire(self, timeout: float = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                wait = self._take()
+            if not wait:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "rate_limit.sqlite3")
+
+
+def _model_rate_limiter() -> RateLimiter:
+    """GEMINI_RPM_DB="" keeps the bucket in this process only."""
+    rate = float(os.environ.get("GEMINI_RPM", 60))
+    db_path = os.environ.get("GEMINI_RPM_DB", DEFAULT_DB_PATH)
+    if not db_path:
+        return RateLimiter(rate=rate)
+    return SharedRateLimiter(db_path, rate=rate, name="gemini")
+
+
+# Limiter for Gemini calls (requests per minute), shared by every process using the same GEMINI_RPM_DB
+model_rate_limiter = _model_rate_limiter()
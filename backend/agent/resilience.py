@@ -0,0 +1,300 @@
+"""
+Resilient wrapper around model calls: per-stage deadlines, hedged requests
+and a circuit breaker per upstream model that fails fast (serving the last
+good answer when one is cached) while that model's error rate is high.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+
+from image_store import content_id
+
+DEFAULT_DEADLINES = {
+    "simulator": 30.0,
+    "youth": 45.0,
+    "adult": 45.0,
+    "strategist": 60.0,
+    "classifier_fast": 10.0,
+    "classifier_strong": 30.0,
+    "default": 60.0,
+}
+
+
+class DeadlineExceeded(TimeoutError):
+    """The call (including any hedge) did not finish before the stage deadline."""
+
+
+class CircuitOpenError(Exception):
+    """The circuit breaker is open and no cached result was available."""
+
+
+def is_client_error(error: Exception) -> bool:
+    """
+    The upstream answered but rejected the request itself (bad argument, unknown
+    model or cached content, permission): a 4xx other than 408/429, which say
+    nothing about the upstream's health. Google API errors carry the HTTP status in `code`.
+    """
+    code = getattr(error, "code", None)
+    return isinstance(code, int) and 400 <= code < 500 and code not in (408, 429)
+
+
+class CircuitBreaker:
+    """
+    Opens when the error rate over the last `window` calls exceeds `error_threshold`,
+    stays open for `cooldown` seconds, then lets a single probe through (half-open).
+    """
+
+    def __init__(self, window: int = 20, min_calls: int = 10, error_threshold: float = 0.5, cooldown: float = 30.0,
+                 name: str = "upstream"):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.error_threshold = error_threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self._results = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record(self, success: bool):
+        with self._lock:
+            if self.state == "half_open":
+                self._probe_in_flight = False
+                if success:
+                    self.state = "closed"
+                    self._results.clear()
+                else:
+                    self._trip()
+                return
+            self._results.append(success)
+            failures = self._results.count(False)
+            if len(self._results) >= self.min_calls and failures / len(self._results) > self.error_threshold:
+                self._trip()
+
+    def _trip(self):
+        self.state = "open"
+        self._opened_at = time.monotonic()
+        print(f"⚠️  Circuit breaker for {self.name} opened; failing fast for {self.cooldown:.0f}s")
+
+
+class ResilientCaller:
+    """Runs model calls with deadlines, p95 hedging, circuit breaking and a fallback cache."""
+
+    def __init__(
+        self,
+        deadlines: Optional[Dict[str, float]] = None,
+        hedge_quantile: float = 0.95,
+        hedge_min_samples: int = 20,
+        breaker: Optional[CircuitBreaker] = None,
+        breaker_factory: Optional[Callable[[str], CircuitBreaker]] = None,
+        fallback_cache_size: int = 256,
+        max_workers: int = 32,
+    ):
+        """
+        Args:
+            deadlines: stage -> seconds; 'default' applies to unknown stages
+            hedge_quantile: latency quantile after which a duplicate request is fired
+            hedge_min_samples: successful calls per stage needed before hedging starts
+            breaker: circuit breaker for calls that name no upstream
+            breaker_factory: builds the breaker for an upstream model (given its name) on first use
+            fallback_cache_size: last good responses kept for degraded serving
+            max_workers: threads available for in-flight calls and hedges
+        """
+        self.deadlines = dict(DEFAULT_DEADLINES)
+        self.deadlines.update(deadlines or {})
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self._breaker_factory = breaker_factory or (lambda name: CircuitBreaker(name=name))
+        self.breaker = breaker or self._breaker_factory("upstream")
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self.fallback_cache_size = fallback_cache_size
+        self._fallbacks = OrderedDict()
+        self._latencies: Dict[str, deque] = {}
+        self._stats = {"calls": 0, "hedges": 0, "hedge_wins": 0, "deadline_exceeded": 0,
+                       "errors": 0, "client_errors": 0, "short_circuited": 0, "fallbacks_served": 0}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="model-call")
+
+    def deadline_for(self, stage: str) -> float:
+        return self.deadlines.get(stage, self.deadlines["default"])
+
+    def breaker_for(self, upstream: Optional[str]) -> CircuitBreaker:
+        """One breaker per upstream model, so a failing fast tier doesn't fail the strong one."""
+        if not upstream:
+            return self.breaker
+        with self._lock:
+            if upstream not in self._breakers:
+                self._breakers[upstream] = self._breaker_factory(upstream)
+            return self._breakers[upstream]
+
+    def hedge_delay(self, stage: str) -> Optional[float]:
+        """Observed latency quantile for the stage, or None until enough samples exist."""
+        with self._lock:
+            samples = sorted(self._latencies.get(stage, ()))
+        if len(samples) < self.hedge_min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * self.hedge_quantile))]
+
+    def _observe(self, stage: str, latency: float):
+        with self._lock:
+            self._latencies.setdefault(stage, deque(maxlen=200)).append(latency)
+
+    def _bump(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _remember(self, fallback_key: Optional[str], result: Any):
+        if fallback_key is None:
+            return
+        with self._lock:
+            self._fallbacks[fallback_key] = result
+            self._fallbacks.move_to_end(fallback_key)
+            while len(self._fallbacks) > self.fallback_cache_size:
+                self._fallbacks.popitem(last=False)
+
+    def _fallback(self, fallback_key: Optional[str], error: Exception):
+        with self._lock:
+            cached = self._fallbacks.get(fallback_key) if fallback_key else None
+        if cached is None:
+            raise error
+        self._bump("fallbacks_served")
+        print(f"⚠️  Serving cached result ({error.__class__.__name__})")
+        return cached
+
+    def call(self, stage: str, fn: Callable[[], Any], fallback_key: Optional[str] = None,
+             upstream: Optional[str] = None) -> Any:
+        """
+        Run fn under the stage deadline, hedging once past the observed p95.
+
+        Args:
+            stage: pipeline stage name (selects deadline and latency history)
+            fn: zero-argument callable performing the upstream request
+            fallback_key: key for caching/serving the last good result when degraded
+            upstream: model name selecting the circuit breaker
+
+        Raises:
+            DeadlineExceeded, CircuitOpenError or the upstream exception,
+            unless a cached fallback can be served instead. Client errors
+            (see is_client_error) are always raised and don't trip the breaker.
+        """
+        self._bump("calls")
+        breaker = self.breaker_for(upstream)
+        if not breaker.allow():
+            self._bump("short_circuited")
+            return self._fallback(fallback_key, CircuitOpenError(f"Upstream circuit open ({upstream or stage})"))
+
+        started = time.monotonic()
+        deadline = started + self.deadline_for(stage)
+        hedge_after = self.hedge_delay(stage)
+
+        first = self._pool.submit(fn)
+        pending = {first}
+        hedged = False
+        last_error = None
+
+        while pending:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            timeout = deadline - now
+            if not hedged and hedge_after is not None:
+                timeout = min(timeout, max(0.0, started + hedge_after - now))
+
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                self._observe(stage, time.monotonic() - started)
+                breaker.record(True)
+                if future is not first:
+                    self._bump("hedge_wins")
+                self._remember(fallback_key, result)
+                return result
+
+            # Still waiting past the observed p95: fire one duplicate and take whichever answers first
+            if not hedged and hedge_after is not None and pending and time.monotonic() - started >= hedge_after:
+                pending.add(self._pool.submit(fn))
+                hedged = True
+                self._bump("hedges")
+
+        for future in pending:
+            future.cancel()
+        if last_error is not None and not pending:
+            if is_client_error(last_error):
+                # The upstream is up and answered; a cached answer to another request won't help
+                breaker.record(True)
+                self._bump("client_errors")
+                raise last_error
+            breaker.record(False)
+            self._bump("errors")
+            return self._fallback(fallback_key, last_error)
+
+        breaker.record(False)
+        self._bump("deadline_exceeded")
+        return self._fallback(fallback_key, DeadlineExceeded(
+            f"{stage} call exceeded {self.deadline_for(stage):.1f}s deadline"))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            breakers = dict(self._breakers)
+        stats["breaker_state"] = self.breaker.state
+        stats["breakers"] = {upstream: breaker.state for upstream, breaker in breakers.items()}
+        stats["hedge_after"] = {stage: self.hedge_delay(stage) for stage in list(self._latencies)}
+        return stats
+
+
+def contents_key(model_name: str, system_instruction: Any, contents: Any) -> str:
+    """Fallback-cache key for a model call; image parts are keyed by their content id."""
+    digest = hashlib.sha256(f"{model_name}\0{system_instruction}".encode("utf-8"))
+    parts = contents if isinstance(contents, (list, tuple)) else [contents]
+    for part in parts:
+        if isinstance(part, str):
+            digest.update(part.encode("utf-8"))
+        elif hasattr(part, "tobytes"):
+            digest.update(content_id(part).encode("utf-8"))
+        else:
+            digest.update(repr(part).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _env_deadlines() -> Dict[str, float]:
+    deadlines = {}
+    for stage in list(DEFAULT_DEADLINES) + ["variants", "apply_changes", "trends"]:
+        value = os.environ.get(f"MODEL_DEADLINE_{stage.upper()}")
+        if value:
+            deadlines[stage] = float(value)
+    return deadlines
+
+
+# Process-wide caller shared by every model call
+resilient_caller = ResilientCaller(
+    deadlines=_env_deadlines(),
+    hedge_min_samples=int(os.environ.get("MODEL_HEDGE_MIN_SAMPLES", 20)),
+    breaker_factory=lambda name: CircuitBreaker(
+        error_threshold=float(os.environ.get("MODEL_BREAKER_ERROR_RATE", 0.5)),
+        cooldown=float(os.environ.get("MODEL_BREAKER_COOLDOWN", 30)),
+        name=name,
+    ),
+)
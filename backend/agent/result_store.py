@@ -0,0 +1,175 @@
+"""
+SQLite-backed store of finished analyses.
+Results are keyed by a fingerprint of the analysis inputs so dashboard reloads
+can be answered without re-running the agent pipeline.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "results.sqlite3")
+
+
+def fingerprint(**inputs) -> str:
+    """Stable hash of the analysis inputs (None values are dropped)."""
+    payload = {k: v for k, v in inputs.items() if v is not None}
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path: str) -> Optional[str]:
+    """sha256 of a file's contents, or None if it does not exist."""
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultStore:
+    """
+    Append-only history of analyses with retention and size limits.
+
+    Every run is stored as a new row, so earlier results for the same
+    fingerprint stay available for comparison until they age out.
+    """
+
+    def __init__(
+        self,
+        db_path: str = DEFAULT_DB_PATH,
+        retention_days: float = 30.0,
+        max_bytes: int = 50 * 1024 * 1024,
+        max_history: int = 20,
+    ):
+        """
+        Args:
+            db_path: SQLite file location (created on first use)
+            retention_days: rows older than this are pruned
+            max_bytes: total stored result size; oldest rows are pruned beyond it
+            max_history: rows kept per fingerprint
+        """
+        self.db_path = db_path
+        self.retention_days = retention_days
+        self.max_bytes = max_bytes
+        self.max_history = max_history
+        self._write_lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS analyses (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    fingerprint TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    mode TEXT,
+                    params TEXT,
+                    result TEXT NOT NULL,
+                    size INTEGER NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_analyses_fp ON analyses (fingerprint, created_at)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    @staticmethod
+    def _row_to_entry(row) -> Dict[str, Any]:
+        return {
+            "id": row[0],
+            "fingerprint": row[1],
+            "created_at": row[2],
+            "mode": row[3],
+            "params": json.loads(row[4]) if row[4] else {},
+            "result": json.loads(row[5]),
+        }
+
+    def get(self, fp: str, max_age: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Latest stored entry for a fingerprint, optionally no older than max_age seconds."""
+        cutoff = time.time() - max_age if max_age else 0
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, fingerprint, created_at, mode, params, result FROM analyses "
+                "WHERE fingerprint = ? AND created_at >= ? ORDER BY created_at DESC, id DESC LIMIT 1",
+                (fp, cutoff),
+            ).fetchone()
+        return self._row_to_entry(row) if row else None
+
+    def history(self, fp: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """All stored entries for a fingerprint, newest first."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, fingerprint, created_at, mode, params, result FROM analyses "
+                "WHERE fingerprint = ? ORDER BY created_at DESC, id DESC LIMIT ?",
+                (fp, limit),
+            ).fetchall()
+        return [self._row_to_entry(row) for row in rows]
+
+    def put(self, fp: str, result: Dict[str, Any], mode: str = None, params: Dict[str, Any] = None) -> int:
+        """Store a new result and apply the retention limits. Returns the row id."""
+        encoded = json.dumps(result, ensure_ascii=False)
+        with self._write_lock, self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO analyses (fingerprint, created_at, mode, params, result, size) VALUES (?, ?, ?, ?, ?, ?)",
+                (fp, time.time(), mode, json.dumps(params or {}, ensure_ascii=False), encoded, len(encoded)),
+            )
+            row_id = cursor.lastrowid
+            self._prune(conn, fp)
+        return row_id
+
+    def _prune(self, conn, fp: str):
+        conn.execute(
+            "DELETE FROM analyses WHERE created_at < ?",
+            (time.time() - self.retention_days * 86400,),
+        )
+        conn.execute(
+            "DELETE FROM analyses WHERE fingerprint = ? AND id NOT IN ("
+            "SELECT id FROM analyses WHERE fingerprint = ? ORDER BY created_at DESC, id DESC LIMIT ?)",
+            (fp, fp, self.max_history),
+        )
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM analyses").fetchone()[0]
+        if total > self.max_bytes:
+            excess = total - self.max_bytes
+            freed = 0
+            doomed = []
+            for row_id, size in conn.execute("SELECT id, size FROM analyses ORDER BY created_at ASC, id ASC"):
+                if freed >= excess:
+                    break
+                doomed.append((row_id,))
+                freed += size
+            conn.executemany("DELETE FROM analyses WHERE id = ?", doomed)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_result_store() -> ResultStore:
+    """Process-wide store configured from the environment."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ResultStore(
+                db_path=os.environ.get("RESULT_STORE_PATH", DEFAULT_DB_PATH),
+                retention_days=float(os.environ.get("RESULT_STORE_RETENTION_DAYS", 30)),
+                max_bytes=int(os.environ.get("RESULT_STORE_MAX_MB", 50)) * 1024 * 1024,
+                max_history=int(os.environ.get("RESULT_STORE_MAX_HISTORY", 20)),
+            )
+        return _store
@@ -0,0 +1,158 @@
+"""
+Process-wide scheduler for model calls.
+Callers queue by priority class; a single dispatcher hands out the global rate
+limit's tokens with weighted fair queuing, so interactive requests keep flowing
+while batch jobs soak up the remaining capacity instead of starving them.
+The queue is per process, but the bucket behind it is the SQLite-backed
+GEMINI_RPM bucket from rate_limit, so a batch_analyze run or
+age_classifier_agent.py next to the server spends the same upstream quota.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from rate_limit import RateLimiter, model_rate_limiter
+from resilience import DeadlineExceeded
+
+DEFAULT_WEIGHTS = {"interactive": 8.0, "batch": 1.0}
+
+
+class _Ticket:
+    __slots__ = ("event", "granted", "enqueued")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.granted = False
+        self.enqueued = time.monotonic()
+
+
+class ModelScheduler:
+    """
+    Weighted fair queuing in front of one token bucket.
+    With both classes backlogged, each class gets a share of the calls
+    proportional to its weight; an idle class banks no credit.
+    """
+
+    def __init__(self, limiter: RateLimiter, weights: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            limiter: the global rate limit every granted call consumes
+            weights: priority class -> share weight
+        """
+        self.limiter = limiter
+        self.weights = dict(weights or DEFAULT_WEIGHTS)
+        self._queues = {cls: deque() for cls in self.weights}
+        self._vtime = {cls: 0.0 for cls in self.weights}
+        self._clock = 0.0
+        self._cond = threading.Condition()
+        self._dispatcher = None
+        self._stats = {cls: {"granted": 0, "timeouts": 0, "waits": deque(maxlen=500)} for cls in self.weights}
+
+    def acquire(self, priority: str = "interactive", timeout: Optional[float] = None) -> bool:
+        """
+        Block until this call may go out.
+
+        Returns:
+            False if timeout elapsed while still queued
+
+        Raises:
+            ValueError: for an unknown priority class
+        """
+        if priority not in self._queues:
+            raise ValueError(f"Unknown priority class '{priority}'; expected one of {sorted(self._queues)}")
+        ticket = _Ticket()
+        with self._cond:
+            queue = self._queues[priority]
+            if not queue:
+                # A class that was idle restarts at the current virtual time
+                self._vtime[priority] = max(self._vtime[priority], self._clock)
+            queue.append(ticket)
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, name="model-scheduler", daemon=True)
+                self._dispatcher.start()
+            self._cond.notify()
+
+        if not ticket.event.wait(timeout):
+            with self._cond:
+                if not ticket.granted:
+                    queue.remove(ticket)
+                    self._stats[priority]["timeouts"] += 1
+                    return False
+        with self._cond:
+            self._stats[priority]["waits"].append(time.monotonic() - ticket.enqueued)
+        return True
+
+    def per_attempt(self, fn: Callable[[], Any], priority: str, stage: str,
+                    timeout: Optional[float]) -> Tuple[Callable[[], Any], threading.Event]:
+        """
+        Wraps fn for ResilientCaller.call so a hedge queues for its own slot.
+        The first attempt uses the slot the caller already acquired. Set the
+        returned event once the call has returned, so a hedge still queued
+        isn't sent after the answer is in.
+        """
+        slots = [True]
+        answered = threading.Event()
+
+        def call():
+            try:
+                slots.pop()
+            except IndexError:
+                # A hedge is another upstream request, so it needs its own slot
+                if not self.acquire(priority, timeout=timeout):
+                    raise DeadlineExceeded(f"{stage} hedge got no scheduler slot")
+                if answered.is_set():
+                    raise DeadlineExceeded(f"{stage} answered before the hedge was sent")
+            return fn()
+
+        return call, answered
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                while not any(self._queues.values()):
+                    self._cond.wait()
+            self.limiter.acquire()
+            with self._cond:
+                backlogged = [cls for cls, queue in self._queues.items() if queue]
+                if not backlogged:
+                    # Everyone waiting gave up; the token is spent
+                    continue
+                cls = min(backlogged, key=lambda c: self._vtime[c] + 1.0 / self.weights[c])
+                self._vtime[cls] += 1.0 / self.weights[cls]
+                self._clock = self._vtime[cls]
+                ticket = self._queues[cls].popleft()
+                ticket.granted = True
+                self._stats[cls]["granted"] += 1
+                ticket.event.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-class queue depth, grants, timeouts and queue wait percentiles."""
+        with self._cond:
+            stats = {}
+            for cls, entry in self._stats.items():
+                waits = sorted(entry["waits"])
+                stats[cls] = {
+                    "queued": len(self._queues[cls]),
+                    "granted": entry["granted"],
+                    "timeouts": entry["timeouts"],
+                    "wait_p50_s": round(waits[len(waits) // 2], 4) if waits else None,
+                    "wait_p95_s": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 4) if waits else None,
+                }
+        return stats
+
+
+def _env_weights() -> Dict[str, float]:
+    """SCHEDULER_WEIGHTS="interactive=8,batch=1"."""
+    weights = dict(DEFAULT_WEIGHTS)
+    for pair in os.environ.get("SCHEDULER_WEIGHTS", "").split(","):
+        if "=" in pair:
+            cls, weight = pair.split("=", 1)
+            weights[cls.strip()] = float(weight)
+    return weights
+
+
+# Process-wide scheduler in front of the shared Gemini rate limit
+model_scheduler = ModelScheduler(model_rate_limiter, _env_weights())
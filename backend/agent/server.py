@@ -1,48 +1,443 @@
-from flask import Flask, request, jsonify
+from dotenv import load_dotenv
+load_dotenv()  # before the project imports: several modules read their settings at import time
+
+from flask import Flask, request, jsonify, send_file, g
 from flask_cors import CORS
-from agent_core import run_analysis, run_pre_analysis, apply_changes
+from agent_core import run_analysis, run_pre_analysis, apply_changes, run_variants, analyze_creative_file, load_local_corpus, local_corpus_name
+from agent_core import local_corpus_path, prompt_version, warmup, classify_comments, post_fingerprint, is_live_url
+from agent_core import index_verdicts, apply_pending_verdicts
+from comments import load_corpus
+from trends import get_trend_store, WINDOW_MS, TREND_BUDGET_TOKENS
+from comment_index import comment_index, parse_query, FACET_FIELDS
+from result_store import get_result_store, fingerprint
+from bulk import BulkRunner, load_manifest, resolve_input_path, DEFAULT_INPUT_ROOT
+from image_store import get_image_store
+from token_budget import governor, BudgetExceeded, RequestBudgetExhausted
+from resilience import resilient_caller
+from context_cache import context_cache
+from pipeline import node_memo
+from scheduler import model_scheduler
+from browser_pool import browser_pool
+from creative_index import get_creative_index
+from werkzeug.utils import secure_filename
+from profiling import Profile, should_profile, profile_request_id
+from http_cache import compress_response, analysis_etag, etag_matches, encoded_etag, response_encoding
+import base64
 import os
+import shutil
+import threading
+import time
 
 app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+CORS(app, expose_headers=["ETag"])  # Enable CORS for all routes
+
+@app.before_request
+def start_profile():
+    """Opt-in profiling: X-Profile header (or PROFILE_REQUESTS=1); see profiling.py."""
+    if should_profile(request.headers.get('X-Profile')):
+        request_id = profile_request_id(request.headers.get('X-Request-Id'))
+        tag = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.endpoint or 'unknown'}-{request_id}"
+        g.profile = Profile(tag=tag).start()
+
+@app.after_request
+def tag_profile(response):
+    if g.get('profile'):
+        response.headers['X-Profile-Id'] = g.profile.tag
+    return response
+
+@app.after_request
+def compress(response):
+    """gzip/brotli per Accept-Encoding; see http_cache.py."""
+    return compress_response(response, request.headers.get('Accept-Encoding'))
+
+@app.errorhandler(BudgetExceeded)
+def budget_exceeded(e):
+    """A tenant out of allowance may retry later (429); a request too big for its own budget won't fit on retry."""
+    status = 413 if isinstance(e, RequestBudgetExhausted) else 429
+    return jsonify({"success": False, "error": str(e)}), status
+
+@app.teardown_request
+def stop_profile(exc):
+    profile = g.pop('profile', None)
+    if profile:
+        profile.stop()
+
+# Comments on a live post keep coming; stored analyses of a URL are served for this many seconds
+POST_URL_MAX_AGE = float(os.environ.get('POST_URL_MAX_AGE', 3600))
+
+# Manifest image paths must live under this directory; a dedicated one, never the working directory
+BULK_IMAGE_ROOT = os.environ.get('BULK_IMAGE_ROOT', DEFAULT_INPUT_ROOT)
+os.makedirs(BULK_IMAGE_ROOT, exist_ok=True)
+
+bulk_runner = BulkRunner(
+    analyze_item=lambda item: analyze_creative_file(
+        item["image_path"],
+        item["caption"],
+        platform=item.get("platform", "linkedin"),
+        target_group=item.get("target", "all"),
+        budget=governor.start_request(item.get("tenant"), priority="batch")
+    ),
+    max_workers=int(os.environ.get('BULK_WORKERS', 4))
+)
+
+warmup_state = {"ready": False, "timings": None}
+
+def run_warmup():
+    warmup_state["timings"] = warmup(connect=os.environ.get('WARMUP_CONNECT', '0') == '1')
+    warmup_state["ready"] = True
+    print(f"✅ Warm-up finished: {warmup_state['timings']}")
+
+# `python server.py` runs with the debug reloader: the first process only watches files and
+# restarts a child (WERKZEUG_RUN_MAIN=true) that serves, so only the child warms up
+in_reloader_parent = __name__ == '__main__' and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'
+
+# Pre-warm in the background so the port opens immediately; /ready reports when it is done
+if os.environ.get('WARMUP', '1') == '1' and not in_reloader_parent:
+    threading.Thread(target=run_warmup, name="warmup", daemon=True).start()
+else:
+    warmup_state["ready"] = True
 
 @app.route('/', methods=['GET'])
 def health_check():
     return jsonify({"status": "running", "message": "Backend Agent Server is up. Use POST /analyze."})
 
+@app.route('/ready', methods=['GET'])
+def readiness():
+    """Readiness probe: 503 until the startup warm-up has finished."""
+    status = 200 if warmup_state["ready"] else 503
+    return jsonify({"ready": warmup_state["ready"], "warmup": warmup_state["timings"]}), status
+
+def start_budget(limit=None, priority=None):
+    """
+    Token budget for the current request, charged to the tenant named in X-Tenant-Id.
+    limit overrides the per-request default; priority forces a scheduling class.
+    Returns (budget, error_response); error_response is set when the tenant is out of allowance.
+    """
+    tenant = request.headers.get('X-Tenant-Id', 'default')
+    if governor.tenant_remaining(tenant) <= 0:
+        return None, (jsonify({"success": False, "error": f"Token allowance exhausted for tenant '{tenant}'"}), 429)
+    # Scripts can mark their calls as background work so the dashboard stays responsive
+    if priority is None:
+        priority = 'batch' if request.headers.get('X-Priority') == 'batch' else 'interactive'
+    return governor.start_request(tenant, priority=priority, limit=limit), None
+
+@app.route('/usage', methods=['GET'])
+def usage():
+    """Estimated vs actual token usage, per-tenant consumption, model call health, shared-context and stage memo reuse, scheduler queues, browser pool, near-duplicate creative reuse."""
+    return jsonify({"success": True, "data": dict(governor.stats(), model_calls=resilient_caller.stats(),
+                                                  context_cache=context_cache.stats(), pipeline_memo=node_memo.stats(),
+                                                  scheduler=model_scheduler.stats(), browser_pool=browser_pool.stats(),
+                                                  creative_index=get_creative_index().stats())})
+
+def similar_pre_analysis(store, image, caption, platform, target_group):
+    """
+    Stored result of a near-identical creative (see creative_index.py).
+    Returns (stored_entry, match) or (None, None).
+    """
+    index = get_creative_index()
+    try:
+        match = index.find(image, caption, platform, target_group, prompt_version())
+        while match:
+            stored = store.get(match["fingerprint"])
+            if stored:
+                index.record_reuse()
+                return stored, match
+            # Pruned from the result store; forget it and look again
+            index.remove(match["fingerprint"])
+            match = index.find(image, caption, platform, target_group, prompt_version())
+    except Exception as e:
+        print(f"⚠️  Creative similarity lookup failed: {e}")
+    return None, None
+
+def resolve_creative(data):
+    """
+    Returns (image_id, decoded image) for a request that references an uploaded
+    image by 'image_id' or (legacy) carries a base64 'image'.
+    Raises ValueError/KeyError for missing or invalid images.
+    """
+    store = get_image_store()
+    image_id = data.get('image_id')
+    if not image_id:
+        image_b64 = data.get('image')
+        if not image_b64:
+            raise ValueError("Missing image")
+        try:
+            image_bytes = base64.b64decode(image_b64.split("base64,")[-1])
+        except Exception as e:
+            raise ValueError(f"Invalid image data: {e}")
+        image_id, _, _ = store.put_bytes(image_bytes)
+    return image_id, store.load(image_id)
+
+@app.route('/images', methods=['POST'])
+def upload_image():
+    """
+    Binary image upload: either the raw request body (Content-Type: image/*)
+    or a multipart 'image' file. Returns the content-addressed image id.
+    """
+    upload = request.files.get('image')
+    stream = upload.stream if upload else request.stream
+    try:
+        image_id, size, reused = get_image_store().put_stream(stream)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return jsonify({"success": True, "data": {"image_id": image_id, "bytes": size, "reused": reused}}), 200 if reused else 201
+
+@app.route('/images/<image_id>', methods=['GET'])
+def get_image(image_id):
+    store = get_image_store()
+    if not store.exists(image_id):
+        return jsonify({"success": False, "error": "Unknown image"}), 404
+    response = send_file(store.path(image_id), mimetype=store.mimetype(image_id))
+    # Content-addressed, so the bytes behind an id never change
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
 @app.route('/apply-suggestions', methods=['POST'])
 def apply_suggestions_route():
     data = request.json or {}
     print("Received request to apply suggestions...")
     
-    image = data.get('image')
+    image = data.get('image_id') or data.get('image')
     content = data.get('content')
     suggestions = data.get('suggestions')
     
     if not content or not suggestions:
         return jsonify({"success": False, "error": "Missing content or suggestions"}), 400
+
+    budget, error_response = start_budget()
+    if error_response:
+        return error_response
         
-    result_json = apply_changes(image, content, suggestions)
+    result_json = apply_changes(image, content, suggestions, budget=budget)
     
     if result_json:
         return jsonify({"success": True, "data": result_json})
     else:
         return jsonify({"success": False, "error": "Failed to apply changes"}), 500
 
+@app.route('/variants', methods=['POST'])
+def variants_route():
+    """Generate K caption variants for a creative and return them ranked by predicted performance."""
+    data = request.json or {}
+
+    text_content = data.get('text')
+    platform = data.get('platform', 'linkedin')
+    target_group = data.get('target', 'all')
+
+    if not text_content:
+        return jsonify({"success": False, "error": "Missing image or text for variants"}), 400
+    try:
+        _, image = resolve_creative(data)
+    except (ValueError, KeyError) as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    try:
+        k = max(1, min(int(data.get('k', 5)), 10))
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "error": "k must be an integer"}), 400
+
+    budget, error_response = start_budget()
+    if error_response:
+        return error_response
+
+    print(f"Received request to score {k} caption variants...")
+    results = run_variants(
+        budget=budget,
+        image_b64=None,
+        image=image,
+        text_content=text_content,
+        platform=platform,
+        target_group=target_group,
+        k=k,
+        suggestions=data.get('suggestions')
+    )
+
+    if results.get("error"):
+        return jsonify({"success": False, "error": results["error"]}), 500
+
+    return jsonify({"success": True, "data": {"variants": results["variants"]}})
+
+@app.route('/analyze/bulk', methods=['POST'])
+def bulk_analyze():
+    """
+    Queue a batch of pre-launch analyses.
+    Accepts either multipart uploads ('images' files with matching 'captions' fields)
+    or a JSON body with 'items' (image_path, caption, platform, target) or a 'manifest' path.
+    """
+    batch_id = None
+    items = []
+
+    try:
+        if request.files:
+            images = request.files.getlist('images')
+            captions = request.form.getlist('captions')
+            platform = request.form.get('platform', 'linkedin')
+            target_group = request.form.get('target', 'all')
+            if not images:
+                return jsonify({"success": False, "error": "No items to analyze"}), 400
+            if len(images) != len(captions):
+                return jsonify({"success": False, "error": "Each image needs a matching caption"}), 400
+
+            # Only a valid request gets a batch directory for its uploads
+            batch_id = bulk_runner.new_batch_dir()
+            inputs_dir = os.path.join(bulk_runner.batch_dir, batch_id, "inputs")
+            try:
+                for index, (upload, caption) in enumerate(zip(images, captions)):
+                    path = os.path.join(inputs_dir, f"{index:04d}_{secure_filename(upload.filename or 'image')}")
+                    upload.save(path)
+                    items.append({"id": upload.filename, "image_path": path, "caption": caption,
+                                  "platform": platform, "target": target_group})
+            except OSError:
+                shutil.rmtree(os.path.join(bulk_runner.batch_dir, batch_id), ignore_errors=True)
+                raise
+        else:
+            data = request.json or {}
+            raw_items = data.get('items')
+            if raw_items is None and data.get('manifest'):
+                raw_items = load_manifest(resolve_input_path(data['manifest'], BULK_IMAGE_ROOT))
+            if raw_items is not None and not isinstance(raw_items, list):
+                return jsonify({"success": False, "error": "items must be a list"}), 400
+            for item in raw_items or []:
+                if not isinstance(item, dict) or not item.get('image_path') or not item.get('caption'):
+                    return jsonify({"success": False, "error": "Every item needs image_path and caption"}), 400
+                items.append(dict(item, image_path=resolve_input_path(item['image_path'], BULK_IMAGE_ROOT)))
+    except (ValueError, OSError) as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    if not items:
+        return jsonify({"success": False, "error": "No items to analyze"}), 400
+
+    tenant = request.headers.get('X-Tenant-Id', 'default')
+    items = [dict(item, tenant=tenant) for item in items]
+
+    job = bulk_runner.submit(items, batch_id=batch_id)
+    print(f"Queued bulk batch {job.batch_id} with {len(items)} creatives")
+    return jsonify({"success": True, "data": job.summary()}), 202
+
+@app.route('/analyze/bulk/<batch_id>', methods=['GET'])
+def bulk_status(batch_id):
+    job = bulk_runner.get(batch_id)
+    if not job:
+        return jsonify({"success": False, "error": "Unknown batch"}), 404
+    return jsonify({"success": True, "data": job.summary()})
+
+@app.route('/analyze/bulk/<batch_id>/report', methods=['GET'])
+def bulk_report(batch_id):
+    """Download the batch report so far (?format=jsonl|csv)."""
+    job = bulk_runner.get(batch_id)
+    if not job:
+        return jsonify({"success": False, "error": "Unknown batch"}), 404
+    if request.args.get('format', 'jsonl') == 'csv':
+        return send_file(job.csv_path, mimetype='text/csv', as_attachment=True,
+                         download_name=f"{batch_id}.csv")
+    if not os.path.exists(job.jsonl_path):
+        return ("", 200, {"Content-Type": "application/x-ndjson"})
+    return send_file(job.jsonl_path, mimetype='application/x-ndjson', as_attachment=True,
+                     download_name=f"{batch_id}.jsonl")
+
+@app.route('/comments', methods=['GET'])
+def comments_query():
+    """
+    Drill into indexed comments.
+    Query params: q (terms, 'a|b' for OR, '-term' to exclude), verdict, reaction,
+    emoji, corpus (comma separated, OR within a field), page, page_size, facets.
+    """
+    # Build the demo corpus on first use so drill-downs work before any /analyze call
+    platform = request.args.get('platform', 'linkedin')
+    if not comment_index.has_corpus(local_corpus_name(platform)):
+        load_local_corpus(platform)
+    # Classifier verdicts for anything (re)indexed since the last query
+    apply_pending_verdicts()
+
+    terms, exclude = parse_query(request.args.get('q', ''))
+    filters = {}
+    for field in ("verdict", "reaction", "emoji", "corpus"):
+        raw = request.args.get(field)
+        if raw:
+            filters[field] = [v.strip() for v in raw.split(',') if v.strip()]
+
+    facets = request.args.get('facets')
+    facets = [f.strip() for f in facets.split(',')] if facets else FACET_FIELDS
+
+    try:
+        page = int(request.args.get('page', 1))
+        page_size = int(request.args.get('page_size', 20))
+    except ValueError:
+        return jsonify({"success": False, "error": "page and page_size must be integers"}), 400
+
+    result = comment_index.search(
+        terms=terms,
+        exclude=exclude,
+        filters=filters,
+        page=page,
+        page_size=page_size,
+        facets=facets
+    )
+    result["corpora"] = comment_index.corpora()
+    return jsonify({"success": True, "data": result})
+
+@app.route('/trends', methods=['GET'])
+def trends():
+    """
+    Day-by-day (or hourly) age mix, sentiment and reactions for a corpus.
+    Query params: platform, window (day|hour), since (epoch ms), refresh (1 to classify
+    new comments first; by default only the stored series is read).
+    A refresh classifies only comments never seen before; older windows are served from the store.
+    """
+    platform = request.args.get('platform', 'linkedin')
+    window = request.args.get('window', 'day')
+    if window not in WINDOW_MS:
+        return jsonify({"success": False, "error": f"window must be one of {sorted(WINDOW_MS)}"}), 400
+    try:
+        since = int(request.args['since']) if request.args.get('since') else None
+    except ValueError:
+        return jsonify({"success": False, "error": "since must be epoch milliseconds"}), 400
+
+    corpus_name = local_corpus_name(platform)
+    store = get_trend_store()
+    refreshed = None
+    if request.args.get('refresh') in ('1', 'true'):
+        # Its own, larger budget: classifying a whole corpus must not be cut short at the analysis limit.
+        # Bulk classification is background work and must not crowd out /analyze.
+        budget, error_response = start_budget(limit=TREND_BUDGET_TOKENS, priority='batch')
+        if error_response:
+            return error_response
+        try:
+            corpus = load_corpus(local_corpus_path(platform), platform)
+            refreshed = store.refresh(corpus_name, corpus.comments,
+                                      classify=lambda comments: classify_comments(comments, budget), window=window)
+            # Drill-downs by verdict see the new labels right away
+            index_verdicts(corpus_name)
+        except Exception as e:
+            print(f"Trend refresh failed: {e}")
+            return jsonify({"success": False, "error": str(e)}), 500
+
+    return jsonify({"success": True, "data": {
+        "corpus": corpus_name,
+        "window": window,
+        "series": store.series(corpus_name, window, since),
+        "refresh": refreshed
+    }})
+
 @app.route('/analyze', methods=['GET', 'POST'])
 def analyze():
     # Handle both GET (browser/query param) and POST (API/JSON)
     if request.method == 'GET':
+        data = {}
         url = request.args.get('url')
         mode = 'post'
+        force_refresh = request.args.get('force') in ('1', 'true')
     else:
         data = request.json or {}
         mode = data.get('mode', 'post') # Default to post for backward compatibility
         url = data.get('url')
+        force_refresh = bool(data.get('force_refresh'))
         
     print(f"Received request: Mode={mode}")
 
     try:
+        store = get_result_store()
+
         if mode == 'post':
             # Default to "demo" (local file) if no URL provided
             if not url:
@@ -52,50 +447,123 @@ def analyze():
             platform = "linkedin"
             if url and "instagram" in url.lower():
                 platform = "instagram"
-            
-            # Post-Launch Analysis (Existing)
-            results = run_analysis("linkedin_comments.json", platform=platform, url=url)
-            
+
+            params = {"url": url, "platform": platform}
+            fp = post_fingerprint(platform, url=url)
+            max_age = POST_URL_MAX_AGE if is_live_url(url) else None
+            run = lambda: run_analysis(platform=platform, url=url, budget=budget, force=force_refresh)
             summary_text = "Analysis of comments for the campaign."
 
         elif mode == 'pre':
             # Pre-Launch Analysis (New)
-            image_b64 = data.get('image')
             text_content = data.get('text')
             platform = data.get('platform', 'linkedin')
             target_group = data.get('target', 'all')
             
-            if not image_b64 or not text_content:
+            if not (data.get('image_id') or data.get('image')) or not text_content:
                 return jsonify({"success": False, "error": "Missing image or text for pre-analysis"}), 400
+            try:
+                image_id, image = resolve_creative(data)
+            except (ValueError, KeyError) as e:
+                return jsonify({"success": False, "error": str(e)}), 400
 
-            results = run_pre_analysis(
-                image_b64=image_b64, 
+            params = {"platform": platform, "target": target_group, "text": text_content, "image_id": image_id}
+            fp = fingerprint(
+                mode=mode,
+                image_hash=image_id,
+                caption=text_content,
+                platform=platform,
+                target_group=target_group,
+                prompt_version=prompt_version()
+            )
+            max_age = None
+            run = lambda: run_pre_analysis(
+                image_b64=None, 
                 text_content=text_content, 
                 platform=platform, 
-                target_group=target_group
+                target_group=target_group,
+                image=image,
+                budget=budget,
+                force=force_refresh
             )
             summary_text = f"Predictive analysis for {platform} targeting {target_group}."
 
         else:
             return jsonify({"success": False, "error": "Invalid mode"}), 400
 
+        stored = None if force_refresh else store.get(fp, max_age=max_age)
+        reused = None
+        if not stored and mode == 'pre' and not force_refresh:
+            stored, reused = similar_pre_analysis(store, image, text_content, platform, target_group)
+        if stored:
+            etag = analysis_etag(stored["fingerprint"], stored["id"])
+            response = jsonify({"success": True, "data": stored["result"], "cached": True,
+                                "fingerprint": fp, "analyzed_at": stored["created_at"], "reused": reused})
+            if etag_matches(request.headers.get('If-None-Match'), etag):
+                print(f"Stored analysis {fp[:12]} not modified")
+                # Same validator the 200 carried: compress() would have tagged it with the body's encoding
+                encoding = response_encoding(response.mimetype, len(response.get_data()),
+                                             request.headers.get('Accept-Encoding'))
+                response = app.response_class(status=304)
+                response.vary.add('Accept-Encoding')
+                response.headers['ETag'] = encoded_etag(etag, encoding)
+            else:
+                label = " (near-duplicate creative)" if reused else ""
+                print(f"Serving stored analysis {stored['fingerprint'][:12]}{label}")
+                response.headers['ETag'] = etag
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+
+        budget, error_response = start_budget()
+        if error_response:
+            return error_response
+
+        results = run()
+
         # Common Response Handling
         if results.get("error"):
             return jsonify({"success": False, "error": results["error"]}), 500
+
+        response_data = {
+            "summary": summary_text,
+            "strategy": results["strategy"] 
+            # Note: strategy acts as the main JSON object for the dashboard
+        }
+        run_id = store.put(fp, response_data, mode=mode, params=params)
+        if mode == 'pre':
+            try:
+                get_creative_index().add(fp, image, text_content, platform, target_group, prompt_version())
+            except Exception as e:
+                print(f"⚠️  Could not index creative: {e}")
             
-        return jsonify({
+        response = jsonify({
             "success": True,
-            "data": {
-                "summary": summary_text,
-                "strategy": results["strategy"] 
-                # Note: strategy acts as the main JSON object for the dashboard
-            }
+            "data": response_data,
+            "cached": False,
+            "fingerprint": fp,
+            "usage": budget.report(),
+            "pipeline": results.get("pipeline")
         })
+        response.headers['ETag'] = analysis_etag(fp, run_id)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
         
+    except BudgetExceeded:
+        raise
     except Exception as e:
         print(f"Server Error: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route('/analyses/<fp>/history', methods=['GET'])
+def analysis_history(fp):
+    """Stored runs for an analysis fingerprint, newest first, for comparing results over time."""
+    try:
+        limit = int(request.args.get('limit', 20))
+    except ValueError:
+        return jsonify({"success": False, "error": "limit must be an integer"}), 400
+    entries = get_result_store().history(fp, limit=limit)
+    return jsonify({"success": True, "data": entries})
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=True)
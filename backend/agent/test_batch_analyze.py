@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Tests for the offline post-launch batch CLI
+Uses a stand-in analyze function (no API key needed)
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import agent_core
+import result_store
+from batch_analyze import analyze_post, completed_keys, load_items, run_batch
+from result_store import ResultStore
+
+
+def write_manifest(directory, entries):
+    path = os.path.join(directory, "manifest.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+    return path
+
+
+def test_manifest_resolution():
+    """Relative exports resolve against the manifest; platform is detected from the URL"""
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(os.path.join(tmp, "exports"))
+        with open(os.path.join(tmp, "exports", "week32.json"), "w") as f:
+            f.write("[]")
+        manifest = write_manifest(tmp, [
+            {"id": "a", "url": "https://www.instagram.com/p/abc/"},
+            {"id": "b", "url": "https://www.linkedin.com/posts/xyz"},
+            {"data_file": "exports/week32.json", "platform": "instagram"},
+        ])
+        items = load_items(manifest)
+        assert [i["platform"] for i in items] == ["instagram", "linkedin", "instagram"]
+        assert items[2]["data_file"] == os.path.join(tmp, "exports", "week32.json")
+        assert items[2]["key"].startswith("instagram:")
+
+        for bad in ({"id": "x"}, {"id": "x", "data_file": "exports/missing.json"}):
+            try:
+                load_items(write_manifest(tmp, [bad]))
+                raise AssertionError(f"accepted {bad}")
+            except ValueError:
+                pass
+        try:
+            load_items(write_manifest(tmp, [{"id": "a", "url": "https://a"}, {"id": "a", "url": "https://b"}]))
+            raise AssertionError("accepted duplicate ids")
+        except ValueError as e:
+            assert "duplicate" in str(e)
+
+
+def test_resume_skips_done_and_retries_errors():
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest = write_manifest(tmp, [{"id": f"post{i}", "url": f"https://www.linkedin.com/posts/{i}"}
+                                        for i in range(6)])
+        items = load_items(manifest)
+        output = os.path.join(tmp, "out", "results.jsonl")
+        calls = []
+        attempts = {}
+        lock = threading.Lock()
+
+        def flaky(item):
+            with lock:
+                calls.append(item["key"])
+                attempts[item["key"]] = attempts.get(item["key"], 0) + 1
+            if item["key"] == "post3" and attempts["post3"] == 1:
+                return {"error": "quota"}
+            return {"strategy": f"strategy for {item['key']}", "error": None}
+
+        counts = run_batch(items, output, flaky, workers=3, resume=True)
+        assert counts == {"done": 5, "error": 1, "skipped": 0}
+        assert completed_keys(output) == {f"post{i}" for i in range(6)} - {"post3"}
+
+        # Simulate a run killed mid-write
+        with open(output, "a", encoding="utf-8") as f:
+            f.write('{"key": "post4", "sta')
+
+        calls.clear()
+        counts = run_batch(items, output, flaky, workers=3, resume=True)
+        assert calls == ["post3"]
+        assert counts == {"done": 1, "error": 0, "skipped": 5}
+        assert completed_keys(output) == {f"post{i}" for i in range(6)}
+        with open(output, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip().endswith("}")]
+        assert rows[-1]["key"] == "post3" and rows[-1]["status"] == "done"
+
+
+def test_fresh_run_starts_over():
+    """Without resume every item runs again and the old output is replaced"""
+    with tempfile.TemporaryDirectory() as tmp:
+        items = load_items(write_manifest(tmp, [{"id": f"p{i}", "url": f"https://x.example/{i}"} for i in range(3)]))
+        output = os.path.join(tmp, "results.jsonl")
+        ok = lambda item: {"strategy": "s", "error": None}
+        run_batch(items, output, ok, workers=2)
+        assert run_batch(items, output, ok, workers=2) == {"done": 3, "error": 0, "skipped": 0}
+        with open(output, encoding="utf-8") as f:
+            assert len(f.readlines()) == 3
+
+
+def test_stored_url_results_expire():
+    """A stored URL analysis older than max_age is rerun; a local export's is reused"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ResultStore(db_path=os.path.join(tmp, "results.sqlite3"))
+        with open(os.path.join(tmp, "export.json"), "w") as f:
+            f.write("[]")
+        url_item, file_item = load_items(write_manifest(tmp, [
+            {"id": "live", "url": "https://www.linkedin.com/posts/1"},
+            {"id": "local", "data_file": "export.json"},
+        ]))
+        runs = []
+
+        def fake_run_analysis(data_file, platform, url, budget, force):
+            runs.append(url or data_file)
+            return {"strategy": "fresh", "error": None}
+
+        saved = (agent_core.run_analysis, result_store.get_result_store)
+        agent_core.run_analysis, result_store.get_result_store = fake_run_analysis, lambda: store
+        try:
+            for item in (url_item, file_item):
+                fp = agent_core.post_fingerprint(item["platform"], url=item["url"], data_file=item["data_file"])
+                store.put(fp, {"strategy": "stored"}, mode="post")
+            # Backdate both entries by two days
+            with sqlite3.connect(store.db_path) as conn:
+                conn.execute("UPDATE analyses SET created_at = ?", (time.time() - 2 * 86400,))
+
+            assert analyze_post(url_item, max_age=None)["strategy"] == "stored"
+            assert analyze_post(file_item, max_age=86400)["cached"] is True
+            assert runs == []
+            result = analyze_post(url_item, max_age=86400)
+            assert result["cached"] is False and result["strategy"] == "fresh"
+            assert runs == [url_item["url"]]
+        finally:
+            agent_core.run_analysis, result_store.get_result_store = saved
+
+
+def test_exceptions_are_recorded():
+    with tempfile.TemporaryDirectory() as tmp:
+        items = load_items(write_manifest(tmp, [{"id": "boom", "url": "https://x.example/p"}]))
+        output = os.path.join(tmp, "results.jsonl")
+
+        def explode(item):
+            raise RuntimeError("scrape failed")
+
+        assert run_batch(items, output, explode, workers=1)["error"] == 1
+        with open(output, encoding="utf-8") as f:
+            row = json.loads(f.readline())
+        assert row["status"] == "error" and row["error"] == "scrape failed"
+
+
+def main():
+    print("=" * 60)
+    print("BATCH ANALYZE - TESTS")
+    print("=" * 60)
+
+    tests = [
+        ("Manifest resolution", test_manifest_resolution),
+        ("Resume", test_resume_skips_done_and_retries_errors),
+        ("Fresh run", test_fresh_run_starts_over),
+        ("Stored URL results expire", test_stored_url_results_expire),
+        ("Item exceptions", test_exceptions_are_recorded),
+    ]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"{name}: ✓ PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"{name}: ✗ FAILED ({e!r})")
+
+    print("=" * 60)
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
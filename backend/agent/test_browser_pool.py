@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Tests for the headless-browser scrape fallback
+Runs against a local fixture site; the rendering tests need Playwright's
+Chromium (`python -m playwright install chromium`) and are skipped without it
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from browser_pool import BrowserPool, is_public_url
+
+POST_PAGE = b"""<!doctype html>
+<html><head>
+<meta name="description" content="Launch post for the spring campaign">
+<meta property="og:site_name" content="Fixture Social">
+<link rel="stylesheet" href="/style.css">
+<style>@font-face { font-family: F; src: url(/font.woff2); } body { font-family: F; }</style>
+</head><body>
+<img src="/pixel.png"><video src="/clip.mp4" autoplay></video>
+<p>Post body</p>
+<script>document.title = "Rendered Campaign Post";</script>
+</body></html>"""
+
+
+class FixtureSite:
+    """Local site: a script-titled post page with assets, a slow page and a 404."""
+
+    def __init__(self):
+        self.hits = {}
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                site.hits[self.path] = site.hits.get(self.path, 0) + 1
+                if self.path == "/slow":
+                    time.sleep(3)
+                if self.path in ("/post", "/slow"):
+                    self._send(200, "text/html", POST_PAGE)
+                elif self.path == "/style.css":
+                    self._send(200, "text/css", b"p { color: black; }")
+                elif self.path in ("/pixel.png", "/font.woff2", "/clip.mp4"):
+                    self._send(200, "application/octet-stream", b"\0" * 64)
+                else:
+                    self._send(404, "text/html", b"<title>Not found</title>")
+
+            def _send(self, status, content_type, body):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server.server_address[1]}{path}"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def started_pool(**kwargs):
+    """A running pool, or None when Chromium isn't available here."""
+    pool = BrowserPool(allow_private_hosts=True, **kwargs)
+    return pool if pool.start() else None
+
+
+def test_disabled_pool_is_noop():
+    pool = BrowserPool(enabled=False)
+    assert pool.fetch_metadata("http://127.0.0.1:9/") is None
+    assert pool.stats()["running"] is False
+
+
+def test_non_public_urls_rejected():
+    """Other schemes and internal addresses are refused before the browser is launched"""
+    for url in ("file:///etc/passwd", "ftp://93.184.216.34/", "javascript:alert(1)", "http://localhost:8080/",
+                "http://127.0.0.1/", "http://10.0.0.5/", "http://192.168.1.1/", "http://169.254.169.254/latest/",
+                "http://[::1]/", "http://[::ffff:127.0.0.1]/", "http://0.0.0.0/", "https://no-such-host.invalid/"):
+        assert not is_public_url(url), url
+    assert is_public_url("https://93.184.216.34/posts/1")
+
+    pool = BrowserPool(size=1)
+    assert pool.fetch_metadata("http://169.254.169.254/latest/meta-data/") is None
+    stats = pool.stats()
+    assert stats["rejected_urls"] == 1 and stats["running"] is False
+
+
+def test_renders_metadata_and_blocks_assets():
+    """The script-set title comes through; images, fonts and media are never requested"""
+    pool = started_pool(size=2)
+    if pool is None:
+        pytest.skip("Chromium not installed")
+    site = FixtureSite()
+    try:
+        metadata = pool.fetch_metadata(site.url("/post"))
+        assert metadata["title"] == "Rendered Campaign Post"
+        assert metadata["description"] == "Launch post for the spring campaign"
+        assert metadata["site_name"] == "Fixture Social"
+        assert site.hits.get("/style.css") == 1
+        for asset in ("/pixel.png", "/font.woff2", "/clip.mp4"):
+            assert asset not in site.hits, asset
+        assert pool.stats()["blocked_requests"] >= 2
+        assert pool.fetch_metadata(site.url("/missing")) is None
+    finally:
+        pool.close()
+        site.close()
+
+
+def test_page_deadline():
+    """A page slower than its deadline returns None on time and frees its context"""
+    pool = started_pool(size=1)
+    if pool is None:
+        pytest.skip("Chromium not installed")
+    site = FixtureSite()
+    try:
+        started = time.perf_counter()
+        assert pool.fetch_metadata(site.url("/slow"), timeout=1.0) is None
+        assert time.perf_counter() - started < 2.5
+        assert pool.stats()["timeouts"] == 1
+        # The single context is back in the pool for the next page
+        assert pool.fetch_metadata(site.url("/post"))["title"] == "Rendered Campaign Post"
+    finally:
+        pool.close()
+        site.close()
+
+
+def test_contexts_recycled_after_max_uses():
+    pool = started_pool(size=1, max_uses=2)
+    if pool is None:
+        pytest.skip("Chromium not installed")
+    site = FixtureSite()
+    try:
+        for _ in range(5):
+            assert pool.fetch_metadata(site.url("/post"))["title"] == "Rendered Campaign Post"
+        time.sleep(0.5)  # the last release runs in the background
+        stats = pool.stats()
+        assert stats["pages"] == 5
+        assert stats["recycled"] == 2
+        assert stats["idle"] == 1
+    finally:
+        pool.close()
+        site.close()
+
+
+def main():
+    print("=" * 60)
+    print("BROWSER POOL - TESTS")
+    print("=" * 60)
+
+    tests = [("Disabled pool", test_disabled_pool_is_noop), ("Non-public URLs", test_non_public_urls_rejected)]
+    probe = started_pool(size=1)
+    if probe is not None:
+        probe.close()
+        tests += [
+            ("Metadata and asset blocking", test_renders_metadata_and_blocks_assets),
+            ("Page deadline", test_page_deadline),
+            ("Context recycling", test_contexts_recycled_after_max_uses),
+        ]
+    else:
+        print("Chromium not installed: rendering tests skipped")
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"{name}: ✓ PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"{name}: ✗ FAILED ({e!r})")
+
+    print("=" * 60)
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
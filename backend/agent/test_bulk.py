@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Tests for bulk pre-launch analysis: the runner, manifests and input paths
+Uses a stand-in analyze function (no API key needed); the endpoint test needs
+the server's Flask dependencies and is skipped without them
+"""
+
+import csv
+import json
+import os
+import tempfile
+import time
+
+import pytest
+
+from bulk import CSV_FIELDS, BulkRunner, load_manifest, resolve_input_path
+
+
+def fake_analyze(item):
+    if item["caption"] == "explode":
+        raise RuntimeError("model unavailable")
+    if item["caption"] == "refused":
+        return {"error": "Invalid image data"}
+    return {"score": len(item["caption"]) / 10, "strategy": f"strategy for {item['caption']}"}
+
+
+def wait_done(job, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not job.summary()["done"]:
+        if time.monotonic() > deadline:
+            raise AssertionError(f"batch {job.batch_id} did not finish")
+        time.sleep(0.01)
+    return job.summary()
+
+
+def test_runner_reports_every_item():
+    """Failing items are reported as errors next to the successful ones, in both report files"""
+    with tempfile.TemporaryDirectory() as tmp:
+        runner = BulkRunner(fake_analyze, max_workers=2, batch_dir=tmp)
+        items = [{"id": "a", "image_path": "a.png", "caption": "spring sale"},
+                 {"image_path": "b.png", "caption": "explode"},
+                 {"id": "c", "image_path": "c.png", "caption": "refused", "target": "youth"}]
+        job = runner.submit(items)
+        assert runner.get(job.batch_id) is job and runner.get("missing") is None
+
+        summary = wait_done(job)
+        assert summary["total"] == 3 and summary["counts"] == {"done": 1, "error": 2}
+
+        with open(job.jsonl_path, encoding="utf-8") as f:
+            rows = {row["index"]: row for row in map(json.loads, f)}
+        assert rows[0]["status"] == "done" and rows[0]["score"] == 1.1
+        assert rows[0]["strategy"] == "strategy for spring sale"
+        assert rows[1]["status"] == "error" and rows[1]["error"] == "model unavailable"
+        assert rows[1]["item_id"] == "1"
+        assert rows[2]["error"] == "Invalid image data" and rows[2]["target"] == "youth"
+
+        with open(job.csv_path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            assert reader.fieldnames == CSV_FIELDS
+            statuses = sorted(row["status"] for row in reader)
+        assert statuses == ["done", "error", "error"]
+
+
+def test_load_manifest_shapes():
+    with tempfile.TemporaryDirectory() as tmp:
+        def manifest(name, content):
+            path = os.path.join(tmp, name)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(content)
+            return path
+
+        items = [{"image_path": "a.png", "caption": "one"}, {"image_path": "b.png", "caption": "two"}]
+        assert load_manifest(manifest("list.json", json.dumps(items))) == items
+        jsonl = "\n".join(json.dumps(item) for item in items) + "\n\n"
+        assert load_manifest(manifest("items.jsonl", jsonl)) == items
+
+        for name, content in (("scalars.json", '["a.png", "b.png"]'), ("mixed.jsonl", '{"caption": "x"}\n3\n'),
+                              ("broken.jsonl", '{"caption": ')):
+            try:
+                load_manifest(manifest(name, content))
+                raise AssertionError(f"accepted {name}")
+            except ValueError:
+                pass
+
+
+def test_resolve_input_path_stays_in_root():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, "inputs")
+        os.makedirs(os.path.join(root, "week1"))
+        inside = os.path.join(root, "week1", "ad.png")
+        outside = os.path.join(tmp, "secret.txt")
+        for path in (inside, outside):
+            with open(path, "wb") as f:
+                f.write(b"x")
+        os.symlink(outside, os.path.join(root, "link.png"))
+
+        assert resolve_input_path("week1/ad.png", root) == os.path.realpath(inside)
+        assert resolve_input_path(inside, root) == os.path.realpath(inside)
+        for path in ("../secret.txt", outside, "week1/../../secret.txt", "link.png", "week1/missing.png"):
+            try:
+                resolve_input_path(path, root)
+                raise AssertionError(f"resolved {path}")
+            except ValueError:
+                pass
+
+
+def test_bulk_endpoints():
+    """Queue through the API, reject malformed items, then download both reports"""
+    try:
+        import server
+    except ImportError as e:
+        pytest.skip(f"server dependencies not installed ({e.name})")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "ad.png"), "wb") as f:
+            f.write(b"x")
+        saved = server.bulk_runner, server.BULK_IMAGE_ROOT
+        server.bulk_runner = BulkRunner(fake_analyze, max_workers=2, batch_dir=os.path.join(tmp, "batches"))
+        server.BULK_IMAGE_ROOT = tmp
+        try:
+            client = server.app.test_client()
+            for body in ({"items": ["ad.png"]}, {"items": {"image_path": "ad.png"}},
+                         {"items": [{"image_path": "../ad.png", "caption": "x"}]}):
+                assert client.post("/analyze/bulk", json=body).status_code == 400
+
+            response = client.post("/analyze/bulk", json={"items": [
+                {"image_path": "ad.png", "caption": "spring sale"},
+                {"image_path": "ad.png", "caption": "explode"},
+            ]})
+            assert response.status_code == 202
+            batch_id = response.get_json()["data"]["batch_id"]
+            wait_done(server.bulk_runner.get(batch_id))
+
+            status = client.get(f"/analyze/bulk/{batch_id}").get_json()["data"]
+            assert status["counts"] == {"done": 1, "error": 1}
+            lines = client.get(f"/analyze/bulk/{batch_id}/report").get_data(as_text=True).splitlines()
+            assert sorted(json.loads(line)["status"] for line in lines) == ["done", "error"]
+            report = client.get(f"/analyze/bulk/{batch_id}/report?format=csv")
+            assert report.mimetype == "text/csv" and len(report.get_data(as_text=True).splitlines()) == 3
+            assert client.get("/analyze/bulk/unknown/report").status_code == 404
+        finally:
+            server.bulk_runner, server.BULK_IMAGE_ROOT = saved
+
+
+def main():
+    """Run all tests"""
+    print("=" * 60)
+    print("BULK ANALYSIS - TESTS")
+    print("=" * 60)
+
+    tests = [
+        ("Runner and reports", test_runner_reports_every_item),
+        ("Manifest shapes", test_load_manifest_shapes),
+        ("Input path containment", test_resolve_input_path_stays_in_root),
+    ]
+    try:
+        import server  # noqa: F401
+        tests.append(("Bulk endpoints", test_bulk_endpoints))
+    except ImportError:
+        print("Server dependencies not installed: endpoint test skipped")
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"{name}: ✓ PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"{name}: ✗ FAILED ({e!r})")
+
+    print("=" * 60)
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Tests for the in-memory comment index
+Pure in-memory data plus a temporary trend store (no API key needed)
+"""
+
+import json
+import os
+import tempfile
+
+import agent_core
+import trends
+from comment_index import CommentIndex, parse_query
+from trends import TrendStore
+
+CORPUS = [
+    {"comment_id": "c1", "author": "Ana", "text": "This is fire 🔥 great launch"},
+    {"comment_id": "c2", "author": "Ben", "text": "Great product, solid team"},
+    {"comment_id": "c3", "author": "Cy", "text": "Not for me", "age_group": "50+"},
+]
+
+
+def test_search_and_incremental_add():
+    index = CommentIndex()
+    assert index.add_comments("demo.json", CORPUS) == 3
+    assert index.add_comments("demo.json", CORPUS) == 0
+
+    terms, exclude = parse_query("great -solid")
+    result = index.search(terms=terms, exclude=exclude)
+    assert [r["comment_id"] for r in result["results"]] == ["c1"]
+    assert index.search(filters={"emoji": ["🔥"]})["total"] == 1
+    facets = index.search()["facets"]["verdict"]
+    assert facets == {"unclassified": 2, "50+": 1}
+
+    edited = [dict(CORPUS[0], text="Changed my mind"), CORPUS[1], CORPUS[2]]
+    assert index.add_comments("demo.json", edited) == 1
+    assert index.search(terms=[["fire"]])["total"] == 0
+
+
+def test_replace_drops_vanished_comments():
+    """Comments deleted from the export disappear from search and facets on reindex"""
+    index = CommentIndex()
+    index.add_comments("demo.json", CORPUS)
+    index.add_comments("other.json", [{"comment_id": "c1", "text": "great elsewhere"}])
+
+    assert index.add_comments("demo.json", CORPUS[1:], replace=True) == 1
+    assert index.search(filters={"corpus": ["demo.json"]})["total"] == 2
+    assert index.search(filters={"emoji": ["🔥"]})["total"] == 0
+    # Other corpora, and the same comment id in them, are untouched
+    assert index.search(terms=[["great"]], filters={"corpus": ["other.json"]})["total"] == 1
+    assert len(index) == 3
+
+    # Without replace a partial batch only adds
+    assert index.add_comments("demo.json", CORPUS[:1]) == 1
+    assert index.search(filters={"corpus": ["demo.json"]})["total"] == 3
+
+
+def test_verdicts_survive_reindex():
+    index = CommentIndex()
+    index.add_comments("demo.json", CORPUS)
+    assert index.set_verdict("demo.json", "c1", "18-30")
+    assert not index.set_verdict("demo.json", "missing", "18-30")
+    assert index.search(filters={"verdict": ["18-30"]})["total"] == 1
+
+    # Reloading the unchanged export keeps the classifier's verdict
+    assert index.add_comments("demo.json", CORPUS, replace=True) == 0
+    assert index.search(filters={"verdict": ["18-30"]})["total"] == 1
+    assert "unclassified" in index.search()["facets"]["verdict"]
+
+
+def test_trend_labels_reach_the_index():
+    """Labels stored by the trend classifier become drill-down verdicts"""
+    store = TrendStore(os.path.join(tempfile.mkdtemp(), "trends.sqlite3"))
+    store.save("demo.json", "day", {"c1": ("18-30", "positive"), "c2": ("30-50", "neutral")}, {})
+    index = CommentIndex()
+    index.add_comments("demo.json", CORPUS)
+
+    saved = (trends.get_trend_store, agent_core.comment_index)
+    trends.get_trend_store, agent_core.comment_index = lambda: store, index
+    try:
+        assert agent_core.index_verdicts("demo.json") == 2
+    finally:
+        trends.get_trend_store, agent_core.comment_index = saved
+    facets = index.search()["facets"]["verdict"]
+    assert facets == {"18-30": 1, "30-50": 1, "50+": 1}
+
+
+def test_loading_leaves_verdicts_for_later():
+    """Loading a corpus for an analysis doesn't open the trend store; the next query applies the labels"""
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "export.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(CORPUS, f)
+    store = TrendStore(os.path.join(directory, "trends.sqlite3"))
+    store.save("export.json", "day", {"c1": ("18-30", "positive")}, {})
+    opened = []
+    index = CommentIndex()
+
+    def trend_store():
+        opened.append(1)
+        return store
+
+    saved = (trends.get_trend_store, agent_core.comment_index, set(agent_core._verdicts_pending))
+    trends.get_trend_store, agent_core.comment_index = trend_store, index
+    # Corpora other tests loaded would be applied (and counted) too
+    agent_core._verdicts_pending.clear()
+    try:
+        assert agent_core.load_local_corpus("linkedin", path)[0] == "export.json"
+        assert opened == [] and index.search(filters={"verdict": ["18-30"]})["total"] == 0
+
+        agent_core.apply_pending_verdicts()
+        assert opened == [1] and index.search(filters={"verdict": ["18-30"]})["total"] == 1
+        # Nothing reindexed since: no second read
+        agent_core.load_local_corpus("linkedin", path)
+        agent_core.apply_pending_verdicts()
+        assert opened == [1]
+    finally:
+        trends.get_trend_store, agent_core.comment_index = saved[:2]
+        agent_core._indexed_corpora.pop("export.json", None)
+        agent_core._verdicts_pending.clear()
+        agent_core._verdicts_pending.update(saved[2])
+
+
+def main():
+    print("=" * 60)
+    print("COMMENT INDEX - TESTS")
+    print("=" * 60)
+
+    tests = [
+        ("Search and incremental add", test_search_and_incremental_add),
+        ("Reindex drops vanished comments", test_replace_drops_vanished_comments),
+        ("Verdicts survive reindex", test_verdicts_survive_reindex),
+        ("Trend labels reach the index", test_trend_labels_reach_the_index),
+        ("Verdicts applied lazily", test_loading_leaves_verdicts_for_later),
+    ]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"{name}: ✓ PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"{name}: ✗ FAILED ({e!r})")
+
+    print("=" * 60)
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Tests for comment normalization and the parsed-corpus cache
+Uses temporary export files (no API key needed)
+"""
+
+import json
+import os
+import tempfile
+
+from comments import CorpusCache, load_corpus, parse_comments
+from tools.load_json import load_linkedin_comments
+
+RECORDS = [{"comment_id": "c1", "author": "Ana", "text": "Love it"},
+           {"comment_id": "c2", "author": "Ben", "text": "Nice"}]
+
+
+def write(path, records, mtime_ns=None):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(records, f)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_cache_hits_until_file_changes():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "linkedin_comments.json")
+        write(path, RECORDS, mtime_ns=1_000_000_000_000_000_000)
+        cache = CorpusCache()
+
+        first = cache.load(path)
+        assert cache.load(path) is first
+        assert (cache.hits, cache.misses) == (1, 1)
+
+        # Same size, new modification time
+        edited = [dict(RECORDS[0], text="Hate it"), RECORDS[1]]
+        write(path, edited, mtime_ns=1_000_000_001_000_000_000)
+        second = cache.load(path)
+        assert second is not first and second.comments[0].text == "Hate it"
+
+        # Same modification time, different size
+        write(path, RECORDS + [{"comment_id": "c3", "text": "New"}], mtime_ns=1_000_000_001_000_000_000)
+        third = cache.load(path)
+        assert third is not second and len(third.comments) == 3
+        assert cache.misses == 3
+
+        # A different platform is a separate entry
+        assert cache.load(path, "instagram") is not third
+        assert cache.load(path) is third
+
+
+def test_cache_eviction_and_errors():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = CorpusCache(max_entries=2)
+        paths = []
+        for name in ("a.json", "b.json", "c.json"):
+            paths.append(os.path.join(tmp, name))
+            write(paths[-1], RECORDS)
+            cache.load(paths[-1])
+        misses = cache.misses
+        cache.load(paths[0])  # evicted first, so parsed again
+        assert cache.misses == misses + 1
+
+        for bad, error in (("missing.json", OSError), ("broken.json", ValueError)):
+            path = os.path.join(tmp, bad)
+            if bad == "broken.json":
+                with open(path, "w") as f:
+                    f.write("{not json")
+            try:
+                cache.load(path)
+                raise AssertionError(f"loaded {bad}")
+            except error:
+                pass
+
+
+def test_parse_shapes():
+    assert [c.comment_id for c in parse_comments({"comments": RECORDS})] == ["c1", "c2"]
+    simulated = parse_comments([{"user": "u", "comment": "so cool", "age_group": "18-30"}])
+    assert simulated[0].text == "so cool" and simulated[0].age_group == "18-30"
+
+
+def test_legacy_loader():
+    """load_linkedin_comments hands out copies and still reads shapes the parser doesn't know"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "linkedin.json")
+        write(path, RECORDS)
+        loaded = load_linkedin_comments(path)
+        loaded[0]["text"] = "edited by a caller"
+        loaded.append({"comment_id": "c3"})
+        assert load_corpus(path).data == RECORDS
+        assert load_linkedin_comments(path) == RECORDS
+
+        other = os.path.join(tmp, "settings.json")
+        write(other, {"campaign": "spring", "limit": 5})
+        assert load_linkedin_comments(other) == {"campaign": "spring", "limit": 5}
+
+        with open(other, "w") as f:
+            f.write("{not json")
+        try:
+            load_linkedin_comments(other)
+            raise AssertionError("loaded invalid JSON")
+        except ValueError:
+            pass
+
+
+def main():
+    print("=" * 60)
+    print("COMMENTS - TESTS")
+    print("=" * 60)
+
+    tests = [
+        ("Cache invalidation", test_cache_hits_until_file_changes),
+        ("Eviction and errors", test_cache_eviction_and_errors),
+        ("Export shapes", test_parse_shapes),
+        ("Legacy loader", test_legacy_loader),
+    ]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"{name}: ✓ PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"{name}: ✗ FAILED ({e!r})")
+
+    print("=" * 60)
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
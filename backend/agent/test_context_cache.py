@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared model context cache
+Uses a counting stand-in for the upload (no API key needed)
+"""
+
+import threading
+import time
+
+from context_cache import ContextCache
+
+CORPUS = "comment text " * 400
+
+
+class Uploads:
+    """Stands in for CachedContent.create: counts uploads, optionally failing or slow"""
+
+    def __init__(self, fail=False, delay=0.0):
+        self.fail = fail
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, model_name, text, ttl):
+        with self._lock:
+            self.calls += 1
+            number = self.calls
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("400 cached content too small")
+        return f"cachedContents/{model_name}-{number}"
+
+
+def test_reuse_uploads_once():
+    """Concurrent and later requests for the same payload share one upload"""
+    cache = ContextCache(ttl=600, min_tokens=100)
+    create = Uploads(delay=0.1)
+    charged = []
+    handles = []
+    threads = [threading.Thread(target=lambda: handles.append(cache.get("flash", CORPUS, create, charged.append)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert create.calls == 1 and len(charged) == 1
+    assert handles == ["cachedContents/flash-1"] * 4
+    assert cache.get("flash", CORPUS, create) == "cachedContents/flash-1"
+    # Another model or payload is a separate upload
+    assert cache.get("pro", CORPUS, create) == "cachedContents/pro-2"
+    stats = cache.stats()
+    assert stats["created"] == 2 and stats["reused"] == 4 and stats["live"] == 2
+    assert cache._key_locks == {}
+
+
+def test_ttl_expiry_and_invalidate():
+    """An expired (or rejected) handle is replaced by a new upload"""
+    cache = ContextCache(ttl=0.2, min_tokens=100)
+    create = Uploads()
+    assert cache.get("flash", CORPUS, create) == "cachedContents/flash-1"
+    time.sleep(0.25)
+    assert cache.get("flash", CORPUS, create) == "cachedContents/flash-2"
+    cache.invalidate("flash", CORPUS)
+    assert cache.get("flash", CORPUS, create) == "cachedContents/flash-3"
+
+
+def test_failed_creation_falls_back_inline():
+    """A failed upload sends the text inline, keeps no lock behind and is retried next time"""
+    cache = ContextCache(ttl=600, min_tokens=100)
+    failing = Uploads(fail=True)
+    assert cache.get("flash", CORPUS, failing) is None
+    assert cache._key_locks == {}
+    stats = cache.stats()
+    assert stats["errors"] == 1 and stats["inline"] == 1 and stats["live"] == 0
+
+    working = Uploads()
+    assert cache.get("flash", CORPUS, working) == "cachedContents/flash-1"
+    assert cache._key_locks == {}
+
+
+def test_small_or_disabled_is_inline():
+    create = Uploads()
+    assert ContextCache(min_tokens=100).get("flash", "short", create) is None
+    assert ContextCache(min_tokens=100, enabled=False).get("flash", CORPUS, create) is None
+    assert create.calls == 0
+
+
+def main():
+    """Run all tests"""
+    print("=" * 60)
+    print("CONTEXT CACHE - TESTS")
+    print("=" * 60)
+
+    tests = [
+        ("Reuse", test_reuse_uploads_once),
+        ("TTL expiry", test_ttl_expiry_and_invalidate),
+        ("Failed creation", test_failed_creation_falls_back_inline),
+        ("Inline payloads", test_small_or_disabled_is_inline),
+    ]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"{name}: ✓ PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"{name}: ✗ FAILED ({e!r})")
+
+    print("=" * 60)
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
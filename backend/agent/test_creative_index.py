@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Tests for the near-duplicate creative index
+Uses generated images and a temporary SQLite file (no API key needed)
+"""
+
+import io
+import os
+import tempfile
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from creative_index import CreativeIndex, caption_similarity, hamming, normalize_caption, perceptual_hash
+
+CAPTION = "Meet the new Aurora running shoe: lighter, faster and built for your longest runs. Pre-order today! #running"
+
+
+def creative(seed, size=(600, 400)):
+    """A poster-like image: gradient background, a few shapes and a text block"""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 1, size[0])[None, :, None]
+    y = np.linspace(0, 1, size[1])[:, None, None]
+    colors = rng.uniform(0, 255, (2, 3))
+    pixels = (colors[0] * x + colors[1] * (1 - y)) / 2
+    image = Image.fromarray(pixels.astype(np.uint8), "RGB")
+    draw = ImageDraw.Draw(image)
+    for _ in range(6):
+        x0, y0 = rng.integers(0, size[0] - 150), rng.integers(0, size[1] - 150)
+        w, h = rng.integers(40, 150, 2)
+        draw.ellipse([x0, y0, x0 + w, y0 + h], fill=tuple(int(c) for c in rng.uniform(0, 255, 3)))
+    draw.rectangle([40, size[1] - 90, size[0] - 40, size[1] - 40], fill=(250, 250, 250))
+    return image
+
+
+def reexport(image, quality=60):
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=quality)
+    return Image.open(io.BytesIO(buffer.getvalue()))
+
+
+def test_hash_tolerates_small_edits():
+    """Re-encoding, rescaling and a slight crop stay close; another creative doesn't"""
+    original = creative(1)
+    base = perceptual_hash(original)
+    w, h = original.size
+    edits = {
+        "jpeg": reexport(original, quality=40),
+        "resize": original.resize((w // 2, h // 2)),
+        "crop": original.crop((int(w * 0.02), int(h * 0.02), w - int(w * 0.02), h - int(h * 0.02))),
+    }
+    for name, edited in edits.items():
+        assert hamming(base, perceptual_hash(edited)) <= 6, name
+    assert hamming(base, perceptual_hash(creative(2))) > 16
+
+
+def test_caption_similarity():
+    one_word = CAPTION.replace("faster", "quicker")
+    assert caption_similarity(normalize_caption(CAPTION), normalize_caption(CAPTION.upper() + "  ")) == 1.0
+    assert caption_similarity(normalize_caption(CAPTION), normalize_caption(one_word)) >= 0.9
+    assert caption_similarity(normalize_caption(CAPTION), normalize_caption("Winter sale on all jackets")) < 0.3
+    assert "#running" in normalize_caption(CAPTION)
+
+
+def test_find_reuses_near_duplicates():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "creatives.sqlite3")
+        index = CreativeIndex(db_path=path, max_distance=6, min_caption_similarity=0.9)
+        index.add("fp-aurora", creative(1), CAPTION, "linkedin", "all", "v1")
+        index.add("fp-other", creative(2), "Winter sale on all jackets", "linkedin", "all", "v1")
+
+        match = index.find(reexport(creative(1)), CAPTION.replace("faster", "quicker"), "linkedin", "all", "v1")
+        assert match["fingerprint"] == "fp-aurora"
+        assert match["image_distance"] <= 6 and match["caption_similarity"] >= 0.9
+
+        # Different copy, platform, audience or prompt version never match
+        assert index.find(creative(1), "Winter sale on all jackets", "linkedin", "all", "v1") is None
+        assert index.find(creative(1), CAPTION, "instagram", "all", "v1") is None
+        assert index.find(creative(1), CAPTION, "linkedin", "18-30", "v1") is None
+        assert index.find(creative(1), CAPTION, "linkedin", "all", "v2") is None
+
+        # Persisted: a fresh instance sees the entries; removal sticks
+        reopened = CreativeIndex(db_path=path)
+        assert reopened.find(creative(1), CAPTION, "linkedin", "all", "v1")["fingerprint"] == "fp-aurora"
+        reopened.remove("fp-aurora")
+        assert CreativeIndex(db_path=path).find(creative(1), CAPTION, "linkedin", "all", "v1") is None
+
+
+def test_thresholds_are_configurable():
+    with tempfile.TemporaryDirectory() as tmp:
+        strict = CreativeIndex(db_path=os.path.join(tmp, "c.sqlite3"), max_distance=0, min_caption_similarity=1.0)
+        strict.add("fp", creative(1), CAPTION, "linkedin", "all", "v1")
+        assert strict.find(creative(1), CAPTION, "linkedin", "all", "v1")["image_distance"] == 0
+        assert strict.find(creative(1), CAPTION + " Now!", "linkedin", "all", "v1") is None
+        disabled = CreativeIndex(db_path=os.path.join(tmp, "c.sqlite3"), enabled=False)
+        assert disabled.find(creative(1), CAPTION, "linkedin", "all", "v1") is None
+
+
+def main():
+    print("=" * 60)
+    print("CREATIVE INDEX - TESTS")
+    print("=" * 60)
+
+    tests = [
+        ("Hash robustness", test_hash_tolerates_small_edits),
+        ("Caption similarity", test_caption_similarity),
+        ("Near-duplicate lookup", test_find_reuses_near_duplicates),
+        ("Thresholds", test_thresholds_are_configurable),
+    ]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"{name}: ✓ PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"{name}: ✗ FAILED ({e!r})")
+
+    print("=" * 60)
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
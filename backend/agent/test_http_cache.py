@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Tests for response compression negotiation and analysis ETags
+Pure helpers, plus one test through the server that needs its Flask
+dependencies and is skipped without them
+"""
+
+import gzip
+import json
+import os
+import tempfile
+
+import pytest
+
+import http_cache
+from http_cache import analysis_etag, compress, compressible, encoded_etag, etag_matches, negotiate, response_encoding
+
+
+def test_negotiation():
+    """gzip when brotli is refused or missing, identity when nothing is acceptable"""
+    assert negotiate(None) is None
+    assert negotiate("identity") is None
+    assert negotiate("gzip, deflate") == "gzip"
+    assert negotiate("br;q=0, gzip;q=0.5") == "gzip"
+    assert negotiate("gzip;q=0") is None
+    assert negotiate("*") in ("br", "gzip")
+    expected = "br" if http_cache.get_brotli() else "gzip"
+    assert negotiate("gzip, deflate, br") == expected
+
+
+def test_gzip_round_trip():
+    body = json.dumps({"strategy": "x" * 5000}).encode()
+    packed = compress(body, "gzip")
+    assert len(packed) < len(body)
+    assert gzip.decompress(packed) == body
+    if http_cache.get_brotli():
+        assert http_cache.get_brotli().decompress(compress(body, "br")) == body
+
+
+def test_compressible():
+    assert compressible("application/json", 4096)
+    assert compressible("text/html", 4096)
+    assert not compressible("application/json", 10)
+    assert not compressible("image/png", 1 << 20)
+    assert not compressible(None, 4096)
+
+
+def test_etag_matching():
+    """Any listed tag matches, weak or with the encoding suffix; a new run does not"""
+    etag = analysis_etag("ab" * 32, 7)
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches(f'{etag[:-1]}-gzip"', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches(analysis_etag("ab" * 32, 8), etag)
+
+
+def test_encoded_etag():
+    etag = analysis_etag("ab" * 32, 7)
+    assert encoded_etag(etag, "gzip") == f'{etag[:-1]}-gzip"'
+    assert encoded_etag(etag, None) == etag
+    assert response_encoding("application/json", 4096, "gzip") == "gzip"
+    assert response_encoding("application/json", 10, "gzip") is None
+    assert response_encoding("application/json", 4096, None) is None
+
+
+def test_not_modified_keeps_encoded_etag():
+    """A revalidated stored analysis answers 304 with the same ETag its compressed 200 carried"""
+    try:
+        import server
+    except ImportError as e:
+        pytest.skip(f"server dependencies not installed ({e.name})")
+    from result_store import ResultStore
+
+    store = ResultStore(os.path.join(tempfile.mkdtemp(), "results.sqlite3"))
+    store.put(server.post_fingerprint("linkedin", url="demo"), {"strategy": "x" * 5000}, mode="post")
+    saved = server.get_result_store
+    server.get_result_store = lambda: store
+    try:
+        client = server.app.test_client()
+        first = client.get("/analyze", headers={"Accept-Encoding": "gzip"})
+        assert first.status_code == 200 and first.headers["Content-Encoding"] == "gzip"
+        etag = first.headers["ETag"]
+        assert etag.endswith('-gzip"')
+
+        again = client.get("/analyze", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+        assert again.status_code == 304 and again.headers["ETag"] == etag
+        assert "Accept-Encoding" in again.headers.get("Vary", "")
+        # A client that doesn't take gzip revalidates against the identity representation
+        plain = client.get("/analyze", headers={"If-None-Match": etag})
+        assert plain.status_code == 304 and not plain.headers["ETag"].endswith('-gzip"')
+    finally:
+        server.get_result_store = saved
+
+
+def main():
+    print("=" * 60)
+    print("HTTP COMPRESSION / ETAG - TESTS")
+    print("=" * 60)
+
+    tests = [
+        ("Encoding negotiation", test_negotiation),
+        ("gzip round trip", test_gzip_round_trip),
+        ("Compressible content", test_compressible),
+        ("ETag matching", test_etag_matching),
+        ("Encoded ETag", test_encoded_etag),
+    ]
+    try:
+        import server  # noqa: F401
+        tests.append(("304 keeps encoded ETag", test_not_modified_keeps_encoded_etag))
+    except ImportError:
+        print("Server dependencies not installed: 304 test skipped")
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"{name}: ✓ PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"{name}: ✗ FAILED ({e!r})")
+
+    print("=" * 60)
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Tests for the content-addressed image store and its retention sweep
+Uses generated images in a temporary directory (no API key needed)
+"""
+
+import io
+import os
+import tempfile
+import time
+
+from PIL import Image
+
+from image_store import ImageStore
+
+
+def png(color, size=(64, 64)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def age(store, image_id, days):
+    then = time.time() - days * 86400
+    os.utime(store.path(image_id), (then, then))
+
+
+def test_dedup_and_load():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ImageStore(root=tmp)
+        image_id, size, reused = store.put_bytes(png("red"))
+        assert not reused and size > 0
+        assert store.put_bytes(png("red")) == (image_id, size, True)
+        assert store.load(image_id).size == (64, 64)
+        assert store.load(image_id).content_id == image_id
+        try:
+            store.put_bytes(b"not an image")
+            raise AssertionError("accepted invalid image data")
+        except ValueError:
+            pass
+
+
+def test_sweep_removes_expired_images():
+    """Images unused past the retention period go; recently used ones stay"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ImageStore(root=tmp, retention_days=7)
+        old, _, _ = store.put_bytes(png("red"))
+        used, _, _ = store.put_bytes(png("green"))
+        fresh, _, _ = store.put_bytes(png("blue"))
+        store.load(old)
+        age(store, old, 10)
+        age(store, used, 10)
+        store.load(used)  # a cached load still counts as use
+
+        assert store.sweep() == 1
+        assert not store.exists(old) and store.exists(used) and store.exists(fresh)
+        try:
+            store.load(old)
+            raise AssertionError("served a swept image from memory")
+        except KeyError:
+            pass
+
+
+def test_sweep_enforces_total_size():
+    """Above the size cap the least recently used images are removed first"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ImageStore(root=tmp, sweep_interval=0)
+        ids = []
+        for days, color in ((3, "red"), (2, "green"), (1, "blue")):
+            image_id, size, _ = store.put_bytes(png(color))
+            age(store, image_id, days)
+            ids.append(image_id)
+        store.max_total_bytes = 2 * size
+        # A new upload triggers the sweep
+        newest, _, _ = store.put_bytes(png("white"))
+        assert [store.exists(i) for i in ids] == [False, False, True]
+        assert store.exists(newest)
+
+
+def main():
+    print("=" * 60)
+    print("IMAGE STORE - TESTS")
+    print("=" * 60)
+
+    tests = [
+        ("Dedup and load", test_dedup_and_load),
+        ("Retention sweep", test_sweep_removes_expired_images),
+        ("Size cap", test_sweep_enforces_total_size),
+    ]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"{name}: ✓ PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"{name}: ✗ FAILED ({e!r})")
+
+    print("=" * 60)
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Tests for the pandas engagement metrics
+Uses the bundled sample corpus and generated comments (no API key needed)
+"""
+
+from agent_core import local_corpus_path
+from comments import Comment, load_corpus
+from metrics import engagement_metrics, strategist_summary
+
+DAY_MS = 86_400_000
+START = 1_747_008_000_000  # a UTC midnight
+
+
+def comments_per_day(counts, likes=0):
+    """counts[i] comments on day i"""
+    comments = []
+    for day, count in enumerate(counts):
+        for n in range(count):
+            comments.append(Comment(comment_id=f"d{day}-{n}", platform="linkedin", text=f"comment {n}",
+                                    timestamp_ms=START + day * DAY_MS + n * 60_000, likes=likes))
+    return comments
+
+
+def test_sample_corpus():
+    """Figures for the bundled LinkedIn export, checked by hand against the file"""
+    comments = load_corpus(local_corpus_path("linkedin"), "linkedin").comments
+    metrics = engagement_metrics(comments)
+    assert metrics["comments"] == 40
+    assert metrics["totals"]["interactions"] == sum(
+        c.likes + c.replies + c.shares + sum(c.reactions.values()) for c in comments)
+    assert metrics["rates"]["interactions_per_comment"] == round(metrics["totals"]["interactions"] / 40, 3)
+    velocity = metrics["velocity"]
+    assert velocity["peak_day"] == "2025-05-21" and velocity["peak_day_comments"] == 6
+    # Only one late comment in the final two weeks (2025-09-23): too little for a trend
+    assert velocity["trend"] is None
+    assert "last week" not in metrics["dashboard"]["explanation"]
+    assert metrics["dashboard"]["source"] == "computed"
+    assert abs(sum(metrics["reaction_mix"].values()) - 1) < 0.01
+    summary = strategist_summary(metrics)
+    assert summary["comments"] == 40 and len(summary["top_comments"]) <= 3
+
+
+def test_trend():
+    accelerating = engagement_metrics(comments_per_day([1] * 7 + [3] * 7))
+    assert accelerating["velocity"]["trend"] == round((21 + 1) / (7 + 1), 2)
+    assert accelerating["dashboard"]["virality"] == "High"
+    slowing = engagement_metrics(comments_per_day([3] * 7 + [1] * 7))
+    assert slowing["velocity"]["trend"] < 1
+    # A busy week after an empty one stays finite
+    assert engagement_metrics(comments_per_day([2] * 7 + [0] * 7 + [2] * 7))["velocity"]["trend"] == 15.0
+    # A week or less of history has nothing to compare with
+    assert engagement_metrics(comments_per_day([5] * 7))["velocity"]["trend"] is None
+
+
+def test_outliers_and_empty():
+    comments = comments_per_day([10], likes=1)
+    comments[3].likes = 200
+    metrics = engagement_metrics(comments)
+    assert [o["comment_id"] for o in metrics["outliers"]] == [comments[3].comment_id]
+    assert metrics["rates"]["engagement_rate"] is None  # no impressions in the data
+    assert engagement_metrics([]) is None
+
+
+def main():
+    print("=" * 60)
+    print("ENGAGEMENT METRICS - TESTS")
+    print("=" * 60)
+
+    tests = [
+        ("Sample corpus", test_sample_corpus),
+        ("Trend", test_trend),
+        ("Outliers", test_outliers_and_empty),
+    ]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"{name}: ✓ PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"{name}: ✗ FAILED ({e!r})")
+
+    print("=" * 60)
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Tests for the pipeline engine: parallel nodes, memoization and partial re-runs
+Pure Python, no API key needed
+"""
+
+import threading
+import time
+
+from pipeline import Node, NodeMemo, Pipeline, digest
+from resilience import contents_key
+
+
+def make_pipeline(calls, delay=0.0):
+    """loader -> (youth, adult) -> strategy, counting how often each node really runs"""
+    lock = threading.Lock()
+
+    def counted(name, fn):
+        def node(ctx, **inputs):
+            with lock:
+                calls[name] = calls.get(name, 0) + 1
+            time.sleep(delay)
+            return fn(**inputs)
+        return node
+
+    return Pipeline("test", [
+        Node("comments", counted("comments", lambda corpus: corpus.upper()), ["corpus"], memoize=False),
+        Node("youth", counted("youth", lambda comments: f"youth:{comments}"), ["comments"]),
+        Node("adult", counted("adult", lambda comments: f"adult:{comments}"), ["comments"]),
+        Node("strategy", counted("strategy", lambda prompt, youth, adult: f"{prompt}|{youth}|{adult}"),
+             {"prompt": "strategist_prompt", "youth": "youth", "adult": "adult"}),
+    ], memo=NodeMemo())
+
+
+def test_runs_in_dependency_order():
+    calls = {}
+    outputs, report = make_pipeline(calls).run({"corpus": "abc", "strategist_prompt": "v1"})
+    assert outputs["strategy"] == "v1|youth:ABC|adult:ABC"
+    assert all(step["status"] == "ran" for step in report.values())
+
+
+def test_independent_nodes_run_in_parallel():
+    """The personas run side by side: three 0.3s levels instead of four serial nodes"""
+    pipeline = make_pipeline({}, delay=0.3)
+    started = time.monotonic()
+    pipeline.run({"corpus": "abc", "strategist_prompt": "v1"})
+    assert time.monotonic() - started < 1.1
+
+
+def test_prompt_edit_reruns_only_strategy():
+    calls = {}
+    pipeline = make_pipeline(calls)
+    pipeline.run({"corpus": "abc", "strategist_prompt": "v1"})
+    outputs, report = pipeline.run({"corpus": "abc", "strategist_prompt": "v2"})
+
+    assert outputs["strategy"] == "v2|youth:ABC|adult:ABC"
+    assert report["youth"]["status"] == "memoized" and report["adult"]["status"] == "memoized"
+    assert calls == {"comments": 2, "youth": 1, "adult": 1, "strategy": 2}
+
+
+def test_force_bypasses_memo():
+    calls = {}
+    pipeline = make_pipeline(calls)
+    pipeline.run({"corpus": "abc", "strategist_prompt": "v1"})
+    pipeline.run({"corpus": "abc", "strategist_prompt": "v1"}, force=True)
+    assert calls["youth"] == 2 and calls["strategy"] == 2
+
+
+def test_failure_skips_dependents():
+    def broken(ctx, corpus):
+        raise RuntimeError("no data")
+
+    pipeline = Pipeline("broken", [
+        Node("comments", broken, ["corpus"]),
+        Node("youth", lambda ctx, comments: comments, ["comments"]),
+    ])
+    outputs, report = pipeline.run({"corpus": "abc"})
+    assert report["comments"]["status"] == "error"
+    assert report["youth"]["status"] == "skipped"
+    assert outputs["youth"] is None
+
+
+def test_abort_on_propagates():
+    """An abort_on error stops the run and reaches the caller instead of a failed-node report"""
+    class OutOfQuota(Exception):
+        pass
+
+    def spent(ctx, comments):
+        raise OutOfQuota("tenant allowance exhausted")
+
+    ran = []
+    pipeline = Pipeline("abort", [
+        Node("comments", lambda ctx, corpus: corpus, ["corpus"]),
+        Node("youth", spent, ["comments"]),
+        Node("strategy", lambda ctx, youth: ran.append(youth), ["youth"]),
+    ], abort_on=(OutOfQuota,))
+    try:
+        pipeline.run({"corpus": "abc"})
+        raise AssertionError("expected OutOfQuota")
+    except OutOfQuota:
+        pass
+    assert ran == []
+
+
+def test_cycle_rejected():
+    try:
+        Pipeline("cycle", [Node("a", lambda ctx, b: b, ["b"]), Node("b", lambda ctx, a: a, ["a"])])
+        raise AssertionError("expected ValueError")
+    except ValueError:
+        pass
+
+
+def test_images_hashed_once():
+    """Memo and fallback keys reuse an image's content id instead of re-reading its pixels"""
+    import hashlib
+    import io
+    from PIL import Image
+    from agent_core import open_image
+
+    class CountingImage:
+        mode, size = "RGB", (2, 2)
+
+        def __init__(self, pixels):
+            self.pixels = pixels
+            self.reads = 0
+
+        def tobytes(self):
+            self.reads += 1
+            return self.pixels
+
+    image = CountingImage(b"\x01" * 12)
+    keys = {digest({"image": image, "caption": "x"}).hexdigest() for _ in range(5)}
+    contents_key("model", None, ["prompt", image])
+    assert len(keys) == 1 and image.reads == 1
+    assert digest(CountingImage(b"\x02" * 12)).hexdigest() != digest(image).hexdigest()
+
+    # Decoded bytes carry the id the image store gives them, without a pixel hash
+    buffer = io.BytesIO()
+    Image.new("RGB", (4, 4), "red").save(buffer, "PNG")
+    decoded = open_image(buffer.getvalue())
+    assert decoded.content_id == hashlib.sha256(buffer.getvalue()).hexdigest()
+
+
+def main():
+    """Run all tests"""
+    print("=" * 60)
+    print("PIPELINE ENGINE - TESTS")
+    print("=" * 60)
+
+    tests = [
+        ("Dependency order", test_runs_in_dependency_order),
+        ("Parallel nodes", test_independent_nodes_run_in_parallel),
+        ("Partial re-run", test_prompt_edit_reruns_only_strategy),
+        ("Force refresh", test_force_bypasses_memo),
+        ("Failure propagation", test_failure_skips_dependents),
+        ("Abort on budget", test_abort_on_propagates),
+        ("Cycle detection", test_cycle_rejected),
+        ("Images hashed once", test_images_hashed_once),
+    ]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"{name}: ✓ PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"{name}: ✗ FAILED ({e!r})")
+
+    print("=" * 60)
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
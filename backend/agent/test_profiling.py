@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Tests for request profiling opt-in and profile ids
+No server or API key needed
+"""
+
+import os
+
+from profiling import profile_request_id, should_profile
+
+
+def with_env(**values):
+    saved = {k: os.environ.get(k) for k in values}
+    for k, v in values.items():
+        if v is None:
+            os.environ.pop(k, None)
+        else:
+            os.environ[k] = v
+    return saved
+
+
+def test_header_needs_token():
+    """Without PROFILE_TOKEN an X-Profile header enables nothing"""
+    saved = with_env(PROFILE_TOKEN=None, PROFILE_REQUESTS=None)
+    try:
+        assert not should_profile("1")
+        assert not should_profile(None)
+        os.environ["PROFILE_TOKEN"] = "s3cret"
+        assert should_profile("s3cret")
+        assert not should_profile("1")
+        assert not should_profile("")
+        os.environ["PROFILE_REQUESTS"] = "1"
+        assert should_profile(None)
+    finally:
+        with_env(**saved)
+
+
+def test_request_id_is_file_safe():
+    assert profile_request_id("req-42_A") == "req-42_A"
+    for bad in ("../../etc/passwd", "a/b", "x" * 65, "", None, "id with space", "ünicode"):
+        generated = profile_request_id(bad)
+        assert generated != bad and len(generated) == 12 and generated.isalnum()
+
+
+def main():
+    print("=" * 60)
+    print("PROFILING - TESTS")
+    print("=" * 60)
+
+    tests = [
+        ("Opt-in needs token", test_header_needs_token),
+        ("Request id sanitizing", test_request_id_is_file_safe),
+    ]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"{name}: ✓ PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"{name}: ✗ FAILED ({e!r})")
+
+    print("=" * 60)
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Tests for the resilient model-call wrapper
+Runs against a local fake backend that injects latency and errors (no API key needed)
+"""
+
+import threading
+import time
+
+from resilience import CircuitBreaker, CircuitOpenError, DeadlineExceeded, ResilientCaller
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeBackend:
+    """Stands in for a Gemini model: each call follows the next scripted (delay, error) step"""
+
+    def __init__(self, script, default=(0.0, None)):
+        self.script = list(script)
+        self.default = default
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, request_options=None):
+        with self._lock:
+            self.calls += 1
+            call_number = self.calls
+            delay, error = self.script.pop(0) if self.script else self.default
+        time.sleep(delay)
+        if error:
+            raise error
+        return FakeResponse(f"answer {call_number} to {prompt}")
+
+
+def make_caller(**kwargs):
+    kwargs.setdefault("deadlines", {"default": 1.0})
+    kwargs.setdefault("hedge_min_samples", 5)
+    return ResilientCaller(**kwargs)
+
+
+def test_deadline_exceeded():
+    """A stuck call fails at the stage deadline instead of hanging"""
+    backend = FakeBackend([(2.0, None)])
+    caller = make_caller(deadlines={"default": 0.2})
+
+    started = time.monotonic()
+    try:
+        caller.call("custom", lambda: backend.generate_content("hi"))
+        raise AssertionError("expected DeadlineExceeded")
+    except DeadlineExceeded:
+        pass
+    assert time.monotonic() - started < 1.0
+    assert caller.stats()["deadline_exceeded"] == 1
+
+
+def test_hedge_after_p95():
+    """Once latency history exists, a call slower than p95 is hedged and the fast duplicate wins"""
+    backend = FakeBackend([(0.01, None)] * 10 + [(0.8, None), (0.01, None)])
+    caller = make_caller(deadlines={"default": 2.0})
+
+    for _ in range(10):
+        caller.call("youth", lambda: backend.generate_content("warm"))
+
+    started = time.monotonic()
+    response = caller.call("youth", lambda: backend.generate_content("slow"))
+    elapsed = time.monotonic() - started
+
+    assert response.text == "answer 12 to slow"
+    assert elapsed < 0.5
+    stats = caller.stats()
+    assert stats["hedges"] == 1 and stats["hedge_wins"] == 1
+
+
+def test_breaker_opens_and_serves_cached():
+    """After repeated upstream errors the breaker fails fast and serves the last good answer"""
+    backend = FakeBackend([(0.0, None)], default=(0.0, RuntimeError("503 upstream")))
+    caller = make_caller(breaker=CircuitBreaker(window=4, min_calls=4, error_threshold=0.5, cooldown=60))
+
+    good = caller.call("strategist", lambda: backend.generate_content("p"), fallback_key="p")
+    for _ in range(4):
+        try:
+            caller.call("strategist", lambda: backend.generate_content("other"), fallback_key="other")
+        except (RuntimeError, CircuitOpenError):
+            pass
+    assert caller.breaker.state == "open"
+
+    calls_before = backend.calls
+    assert caller.call("strategist", lambda: backend.generate_content("p"), fallback_key="p") is good
+    assert backend.calls == calls_before
+
+    try:
+        caller.call("strategist", lambda: backend.generate_content("new"), fallback_key="new")
+        raise AssertionError("expected CircuitOpenError")
+    except CircuitOpenError:
+        pass
+
+
+def test_breaker_recovers_after_cooldown():
+    """A successful half-open probe closes the breaker again"""
+    backend = FakeBackend([(0.0, RuntimeError("boom"))] * 2)
+    caller = make_caller(breaker=CircuitBreaker(window=2, min_calls=2, error_threshold=0.4, cooldown=0.1))
+
+    for _ in range(2):
+        try:
+            caller.call("adult", lambda: backend.generate_content("x"))
+        except RuntimeError:
+            pass
+    assert caller.breaker.state == "open"
+
+    time.sleep(0.15)
+    caller.call("adult", lambda: backend.generate_content("x"))
+    assert caller.breaker.state == "closed"
+
+
+class InvalidArgument(Exception):
+    """Shaped like google.api_core's 400 error"""
+    code = 400
+
+
+def test_breakers_are_per_model():
+    """A failing fast tier opens its own breaker; calls to the strong model still go out"""
+    fast = FakeBackend([], default=(0.0, RuntimeError("503 upstream")))
+    strong = FakeBackend([])
+    caller = make_caller(breaker_factory=lambda name: CircuitBreaker(window=4, min_calls=4, cooldown=60, name=name))
+
+    for _ in range(4):
+        try:
+            caller.call("classifier_fast", lambda: fast.generate_content("x"), upstream="flash-lite")
+        except RuntimeError:
+            pass
+    assert caller.breaker_for("flash-lite").state == "open"
+    response = caller.call("classifier_strong", lambda: strong.generate_content("x"), upstream="flash")
+    assert response.text == "answer 1 to x"
+    assert caller.stats()["breakers"] == {"flash-lite": "open", "flash": "closed"}
+
+
+def test_client_errors_do_not_trip():
+    """Rejected requests are raised as-is and leave the breaker closed"""
+    backend = FakeBackend([(0.0, None)], default=(0.0, InvalidArgument("bad request")))
+    caller = make_caller(breaker=CircuitBreaker(window=4, min_calls=4, error_threshold=0.5, cooldown=60))
+
+    caller.call("youth", lambda: backend.generate_content("p"), fallback_key="p")
+    for _ in range(6):
+        try:
+            # A cached answer exists, but a rejected request must not be papered over with it
+            caller.call("youth", lambda: backend.generate_content("p"), fallback_key="p")
+            raise AssertionError("client error swallowed")
+        except InvalidArgument:
+            pass
+    assert caller.breaker.state == "closed"
+    stats = caller.stats()
+    assert stats["client_errors"] == 6 and stats["errors"] == 0 and stats["fallbacks_served"] == 0
+
+    # Rate limiting (429) is the upstream's problem and still counts
+    limited = type("TooManyRequests", (Exception,), {"code": 429})
+    backend = FakeBackend([], default=(0.0, limited("slow down")))
+    for _ in range(4):
+        try:
+            caller.call("youth", lambda: backend.generate_content("q"))
+        except (limited, CircuitOpenError):
+            pass
+    assert caller.breaker.state == "open"
+
+
+def test_shared_context_errors_propagate():
+    """analyze_comments resends inline only for a rejected context, not on a deadline"""
+    import agent_core
+
+    class FakeGenAI:
+        class GenerativeModel:
+            @staticmethod
+            def from_cached_content(cached_content):
+                return object()
+
+    inline = []
+
+    def timed_out(model, prompt, budget, stage, context_key=None):
+        raise DeadlineExceeded(f"{stage} call exceeded 1.0s deadline")
+
+    saved = (agent_core.context_cache.get, agent_core.get_genai, agent_core.generate, agent_core.get_model)
+    agent_core.context_cache.get = lambda *args, **kwargs: "cachedContents/abc"
+    agent_core.get_genai = lambda: FakeGenAI
+    agent_core.generate = timed_out
+    agent_core.get_model = lambda **kwargs: inline.append(kwargs)
+    try:
+        try:
+            agent_core.analyze_comments("persona", "request", "comments", "linkedin", budget=None, stage="youth")
+            raise AssertionError("deadline swallowed")
+        except DeadlineExceeded:
+            pass
+        assert inline == []
+    finally:
+        agent_core.context_cache.get, agent_core.get_genai, agent_core.generate, agent_core.get_model = saved
+
+
+def main():
+    """Run all tests"""
+    print("=" * 60)
+    print("RESILIENT MODEL CALLS - TESTS")
+    print("=" * 60)
+
+    tests = [
+        ("Deadline", test_deadline_exceeded),
+        ("Hedging", test_hedge_after_p95),
+        ("Circuit breaker", test_breaker_opens_and_serves_cached),
+        ("Breaker recovery", test_breaker_recovers_after_cooldown),
+        ("Breakers per model", test_breakers_are_per_model),
+        ("Client errors", test_client_errors_do_not_trip),
+        ("Shared context errors", test_shared_context_errors_propagate),
+    ]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"{name}: ✓ PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"{name}: ✗ FAILED ({e!r})")
+
+    print("=" * 60)
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
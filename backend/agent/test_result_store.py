@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Tests for the stored analysis results: lookups, history and retention limits
+Uses a temporary SQLite file (no API key needed)
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+from result_store import ResultStore, fingerprint
+
+
+def make_store(**kwargs):
+    return ResultStore(os.path.join(tempfile.mkdtemp(), "results.sqlite3"), **kwargs)
+
+
+def age(store, row_id, seconds):
+    """Backdates a stored row"""
+    with sqlite3.connect(store.db_path) as conn:
+        conn.execute("UPDATE analyses SET created_at = created_at - ? WHERE id = ?", (seconds, row_id))
+
+
+def row_ids(store):
+    with sqlite3.connect(store.db_path) as conn:
+        return [row[0] for row in conn.execute("SELECT id FROM analyses ORDER BY id")]
+
+
+def test_fingerprint_is_stable():
+    assert fingerprint(mode="pre", caption="hi", image_hash=None) == fingerprint(caption="hi", mode="pre")
+    assert fingerprint(mode="pre", caption="hi") != fingerprint(mode="post", caption="hi")
+
+
+def test_get_latest_and_max_age():
+    """get returns the newest run; with max_age an older one counts as missing"""
+    store = make_store()
+    first = store.put("fp", {"strategy": "v1"}, mode="post", params={"url": "demo"})
+    second = store.put("fp", {"strategy": "v2"}, mode="post")
+    entry = store.get("fp")
+    assert entry["id"] == second and entry["result"] == {"strategy": "v2"}
+    assert store.get("other") is None
+
+    age(store, second, 7200)
+    assert store.get("fp", max_age=3600)["id"] == first
+    age(store, first, 3 * 3600)
+    assert store.get("fp", max_age=3600) is None
+    assert store.get("fp")["id"] == second
+    assert store.history("fp")[-1]["params"] == {"url": "demo"}
+
+
+def test_retention_age_prunes_old_rows():
+    """Rows past retention_days go on the next write, whatever their fingerprint"""
+    store = make_store(retention_days=1)
+    stale = store.put("old", {"strategy": "stale"})
+    kept = store.put("recent", {"strategy": "kept"})
+    age(store, stale, 2 * 86400)
+    age(store, kept, 3600)
+    assert store.get("old") is not None  # reads never prune
+
+    store.put("new", {"strategy": "fresh"})
+    assert store.get("old") is None
+    assert store.get("recent")["id"] == kept
+
+
+def test_max_history_per_fingerprint():
+    store = make_store(max_history=3)
+    ids = [store.put("fp", {"run": run}) for run in range(5)]
+    other = store.put("other", {"run": 0})
+    assert [entry["id"] for entry in store.history("fp")] == ids[:1:-1]
+    assert store.history("fp", limit=2)[1]["result"] == {"run": 3}
+    assert store.get("other")["id"] == other
+
+
+def test_max_bytes_drops_oldest_first():
+    """Past the size cap the oldest rows go until the total fits again"""
+    payload = {"strategy": "x" * 1000}
+    size = len(json.dumps(payload))
+    store = make_store(max_bytes=3 * size + 10)
+    ids = [store.put(f"fp{i}", payload) for i in range(3)]
+    assert row_ids(store) == ids
+
+    newest = store.put("fp3", payload)
+    assert row_ids(store) == ids[1:] + [newest]
+
+    big = store.put("big", {"strategy": "y" * (2 * size - 100)})
+    assert row_ids(store) == [newest, big]
+    with sqlite3.connect(store.db_path) as conn:
+        assert conn.execute("SELECT SUM(size) FROM analyses").fetchone()[0] <= store.max_bytes
+
+
+def test_history_survives_reopen():
+    store = make_store()
+    run_id = store.put("fp", {"strategy": "kept"}, mode="pre")
+    reopened = ResultStore(store.db_path)
+    entry = reopened.get("fp")
+    assert entry["id"] == run_id and entry["mode"] == "pre"
+    assert abs(entry["created_at"] - time.time()) < 60
+
+
+def main():
+    """Run all tests"""
+    print("=" * 60)
+    print("RESULT STORE - TESTS")
+    print("=" * 60)
+
+    tests = [
+        ("Stable fingerprint", test_fingerprint_is_stable),
+        ("Latest and max_age", test_get_latest_and_max_age),
+        ("Retention age", test_retention_age_prunes_old_rows),
+        ("History per fingerprint", test_max_history_per_fingerprint),
+        ("Size cap", test_max_bytes_drops_oldest_first),
+        ("Reopen", test_history_survives_reopen),
+    ]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"{name}: ✓ PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"{name}: ✗ FAILED ({e!r})")
+
+    print("=" * 60)
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Tests for the model call scheduler
+Uses a fast local token bucket (no API key needed)
+"""
+
+import os
+import tempfile
+import threading
+import time
+
+import agent_core
+from rate_limit import RateLimiter, SharedRateLimiter
+from resilience import ResilientCaller
+from scheduler import ModelScheduler
+from token_budget import TokenGovernor
+
+
+def run_waiters(scheduler, classes):
+    """Starts one thread per class entry; returns the grant order once all finish"""
+    order = []
+    lock = threading.Lock()
+
+    def waiter(cls):
+        scheduler.acquire(cls)
+        with lock:
+            order.append(cls)
+
+    threads = []
+    for cls in classes:
+        thread = threading.Thread(target=waiter, args=(cls,))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.002)
+    for thread in threads:
+        thread.join(timeout=10)
+    return order
+
+
+def test_interactive_overtakes_batch_backlog():
+    """Interactive calls arriving behind a batch backlog are served within a few grants"""
+    scheduler = ModelScheduler(RateLimiter(rate=100, per=1, burst=1), {"interactive": 8, "batch": 1})
+    order = run_waiters(scheduler, ["batch"] * 20 + ["interactive"] * 4)
+    last_interactive = max(i for i, cls in enumerate(order) if cls == "interactive")
+    assert last_interactive < 12, order
+
+
+def test_batch_is_not_starved():
+    """With both classes backlogged batch still gets roughly its weighted share"""
+    scheduler = ModelScheduler(RateLimiter(rate=200, per=1, burst=1), {"interactive": 3, "batch": 1})
+    order = run_waiters(scheduler, ["interactive"] * 30 + ["batch"] * 10)
+    assert "batch" in order[:20], order
+
+
+def test_timeout_and_stats():
+    scheduler = ModelScheduler(RateLimiter(rate=1, per=60, burst=1))
+    assert scheduler.acquire("interactive", timeout=1)
+    assert not scheduler.acquire("batch", timeout=0.05)
+    stats = scheduler.stats()
+    assert stats["interactive"]["granted"] == 1
+    assert stats["batch"]["timeouts"] == 1 and stats["batch"]["queued"] == 0
+
+
+def test_unknown_class_rejected():
+    scheduler = ModelScheduler(RateLimiter(rate=10, per=1))
+    try:
+        scheduler.acquire("urgent")
+        raise AssertionError("expected ValueError")
+    except ValueError:
+        pass
+
+
+class SlowThenFastModel:
+    model_name = "fake"
+
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, contents, request_options=None):
+        with self._lock:
+            self.calls += 1
+            first = self.calls == 1
+        time.sleep(0.5 if first else 0.01)
+        return type("Response", (), {"text": "ok", "usage_metadata": None})()
+
+
+def test_hedge_takes_its_own_slot():
+    """A hedged model call is granted a second scheduler slot instead of bypassing the quota"""
+    scheduler = ModelScheduler(RateLimiter(rate=100, per=1, burst=2))
+    caller = ResilientCaller(deadlines={"default": 5}, hedge_min_samples=1)
+    caller._observe("model", 0.05)
+    original = agent_core.model_scheduler, agent_core.resilient_caller
+    agent_core.model_scheduler, agent_core.resilient_caller = scheduler, caller
+    try:
+        model = SlowThenFastModel()
+        agent_core.generate(model, "prompt", TokenGovernor().start_request(), "model")
+        assert model.calls == 2
+        assert caller.stats()["hedges"] == 1
+        assert scheduler.stats()["interactive"]["granted"] == 2
+    finally:
+        agent_core.model_scheduler, agent_core.resilient_caller = original
+
+
+def test_shared_bucket_across_limiters():
+    """Limiters on the same file (one per process in practice) spend one quota"""
+    path = os.path.join(tempfile.mkdtemp(), "rate_limit.sqlite3")
+    server = SharedRateLimiter(path, rate=1, per=60, burst=2, name="gemini")
+    classifier = SharedRateLimiter(path, rate=1, per=60, burst=2, name="gemini")
+    assert server.acquire(timeout=0.05)
+    assert classifier.acquire(timeout=0.05)
+    assert not server.acquire(timeout=0.05)
+    assert not classifier.acquire(timeout=0.05)
+    # Other buckets in the file are independent
+    assert SharedRateLimiter(path, rate=1, per=60, burst=1, name="other").acquire(timeout=0.05)
+
+    refilling = SharedRateLimiter(path, rate=100, per=1, burst=1, name="fast")
+    assert refilling.acquire(timeout=1) and refilling.acquire(timeout=1)
+
+
+def main():
+    """Run all tests"""
+    print("=" * 60)
+    print("MODEL SCHEDULER - TESTS")
+    print("=" * 60)
+
+    tests = [
+        ("Interactive priority", test_interactive_overtakes_batch_backlog),
+        ("Batch share", test_batch_is_not_starved),
+        ("Timeouts and stats", test_timeout_and_stats),
+        ("Unknown class", test_unknown_class_rejected),
+        ("Hedges are scheduled", test_hedge_takes_its_own_slot),
+        ("Shared bucket", test_shared_bucket_across_limiters),
+    ]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"{name}: ✓ PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"{name}: ✗ FAILED ({e!r})")
+
+    print("=" * 60)
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
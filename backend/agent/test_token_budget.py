@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Tests for token estimation, shrinking and per-request budgets
+Pure bookkeeping (no API key needed)
+"""
+
+import json
+import os
+
+import agent_core
+from rate_limit import RateLimiter
+from resilience import ResilientCaller
+from scheduler import ModelScheduler
+from token_budget import BudgetExceeded, RequestBudgetExhausted, TokenGovernor, estimate_tokens, shrink_text
+
+
+def test_shrink_text_edges():
+    """Fitting text is untouched, JSON keeps whole records, a zero cap is refused"""
+    assert shrink_text("", 1) == ""
+    assert shrink_text("short", 10) == "short"
+
+    records = [{"id": i, "comment": f"comment number {i} " * 3} for i in range(200)]
+    shrunk = shrink_text(json.dumps(records, indent=2), 500)
+    kept = json.loads(shrunk)
+    assert 1 <= len(kept) < 200 and all("comment" in r for r in kept)
+    assert estimate_tokens(shrunk) <= 500
+
+    prose = "word " * 2000
+    shrunk = shrink_text(prose, 100)
+    assert "characters omitted" in shrunk and estimate_tokens(shrunk) <= 100
+
+    for cap in (0, -5):
+        try:
+            shrink_text("anything", cap)
+            raise AssertionError(f"accepted max_tokens={cap}")
+        except ValueError:
+            pass
+
+
+def test_fit_caps():
+    governor = TokenGovernor(per_request=1000, per_call=300)
+    budget = governor.start_request()
+    assert budget.fit("small", "stage") == "small"
+    assert estimate_tokens(budget.fit("x " * 2000, "stage")) <= 300
+    assert estimate_tokens(budget.fit("x " * 2000, "stage", max_tokens=50)) <= 50
+
+
+def test_fit_raises_when_exhausted():
+    """No silent marker-only payloads once the request budget is spent"""
+    governor = TokenGovernor(per_request=100, per_call=100)
+    budget = governor.start_request()
+    budget.reserve("stage", "y" * 350)
+    assert budget.remaining == 0
+    for max_tokens in (None, 0, 50):
+        try:
+            budget.fit("some comments", "comments", max_tokens=max_tokens)
+            raise AssertionError("fit succeeded with no budget left")
+        except RequestBudgetExhausted:
+            pass
+    # An explicit zero share is honoured, not treated as "no cap"
+    fresh = governor.start_request()
+    try:
+        fresh.fit("text", "stage", max_tokens=0)
+        raise AssertionError("fit accepted max_tokens=0")
+    except RequestBudgetExhausted:
+        pass
+
+
+def test_can_afford():
+    governor = TokenGovernor(per_request=100, per_call=40)
+    budget = governor.start_request()
+    assert budget.can_afford("a" * 35)
+    assert not budget.can_afford("a" * 200)        # over the per-call cap
+    budget.reserve("stage", "b" * 330)
+    assert not budget.can_afford("a" * 35)         # over what is left
+
+
+class Part:
+    def __init__(self, text):
+        self.text = text
+
+
+class InstructedModel:
+    """Shaped like the SDK model: the system instruction is kept as a Content with text parts"""
+    model_name = "fake"
+
+    def __init__(self, instruction):
+        self._system_instruction = type("Content", (), {"parts": [Part(instruction)]})()
+
+    def generate_content(self, contents, request_options=None):
+        return type("Response", (), {"text": "ok", "usage_metadata": None})()
+
+
+def test_reserve_counts_system_instruction():
+    """The system instruction travels with every call, so generate charges it"""
+    instruction = "You are the strategist. " * 400
+    original = agent_core.model_scheduler, agent_core.resilient_caller
+    agent_core.model_scheduler = ModelScheduler(RateLimiter(rate=1000, per=1))
+    agent_core.resilient_caller = ResilientCaller()
+    try:
+        budget = TokenGovernor().start_request()
+        agent_core.generate(InstructedModel(instruction), "short prompt", budget, "strategist")
+        assert budget.used == estimate_tokens("short prompt") + estimate_tokens(instruction)
+    finally:
+        agent_core.model_scheduler, agent_core.resilient_caller = original
+
+
+def test_persona_budget_error_propagates():
+    """A tenant out of allowance mid-analysis fails the request instead of yielding empty personas"""
+    def out_of_allowance(model, contents, budget=None, stage="model", context_key=None):
+        raise BudgetExceeded("Token allowance exhausted for tenant 'acme'")
+
+    saved = agent_core.generate, agent_core.get_model, os.environ.get("GEMINI_API_KEY")
+    agent_core.generate, agent_core.get_model = out_of_allowance, lambda **kwargs: None
+    os.environ["GEMINI_API_KEY"] = "test"
+    try:
+        agent_core.run_pre_analysis(None, "caption", image=object(), budget=TokenGovernor().start_request())
+        raise AssertionError("budget error swallowed")
+    except BudgetExceeded:
+        pass
+    finally:
+        agent_core.generate, agent_core.get_model = saved[:2]
+        if saved[2] is None:
+            os.environ.pop("GEMINI_API_KEY", None)
+        else:
+            os.environ["GEMINI_API_KEY"] = saved[2]
+
+
+def main():
+    print("=" * 60)
+    print("TOKEN BUDGET - TESTS")
+    print("=" * 60)
+
+    tests = [
+        ("shrink_text edges", test_shrink_text_edges),
+        ("fit caps", test_fit_caps),
+        ("Exhausted budget", test_fit_raises_when_exhausted),
+        ("can_afford", test_can_afford),
+        ("System instruction charged", test_reserve_counts_system_instruction),
+        ("Persona budget errors", test_persona_budget_error_propagates),
+    ]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"{name}: ✓ PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"{name}: ✗ FAILED ({e!r})")
+
+    print("=" * 60)
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
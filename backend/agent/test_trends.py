@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Tests for incremental trend analytics
+Uses a temporary SQLite store and a counting fake classifier (no API key needed)
+"""
+
+import json
+import os
+import re
+import tempfile
+
+import agent_core
+from comments import Comment
+from resilience import DeadlineExceeded
+from token_budget import BudgetExceeded, TokenGovernor, estimate_tokens
+from trends import TrendStore, WINDOW_MS
+
+DAY = WINDOW_MS["day"]
+START = 1_747_008_000_000  # a UTC midnight
+
+
+def make_comment(cid, day, hour=0, reactions=None):
+    return Comment(comment_id=cid, platform="linkedin", text=f"comment {cid}",
+                   timestamp_ms=START + day * DAY + hour * WINDOW_MS["hour"], reactions=reactions or {})
+
+
+class CountingClassifier:
+    def __init__(self):
+        self.seen = []
+
+    def __call__(self, comments):
+        self.seen.extend(c.comment_id for c in comments)
+        return {c.comment_id: ("18-30", "positive" if c.comment_id.startswith("a") else "negative") for c in comments}
+
+
+def make_store():
+    return TrendStore(os.path.join(tempfile.mkdtemp(), "trends.sqlite3"))
+
+
+def test_daily_series():
+    store = make_store()
+    comments = [make_comment("a1", 0, reactions={"LIKE": 2}), make_comment("b1", 0, 5), make_comment("a2", 1)]
+    store.refresh("demo", comments, CountingClassifier())
+
+    series = store.series("demo", "day")
+    assert [w["window_start"] for w in series] == [START, START + DAY]
+    assert series[0]["comments"] == 2
+    assert series[0]["sentiment"] == {"positive": 1, "neutral": 0, "negative": 1}
+    assert series[0]["reactions"] == {"LIKE": 2}
+    assert series[1]["age_mix"]["18-30"] == 1
+
+
+def test_refresh_only_classifies_new_window():
+    store = make_store()
+    classifier = CountingClassifier()
+    history = [make_comment(f"a{i}", day) for i, day in enumerate([0, 0, 1, 2])]
+    store.refresh("demo", history, classifier)
+
+    result = store.refresh("demo", history + [make_comment("b9", 3)], classifier)
+    assert classifier.seen[len(history):] == ["b9"]
+    assert result["windows_updated"] == 1 and result["classified"] == 1
+
+
+def test_unchanged_corpus_is_a_noop():
+    store = make_store()
+    classifier = CountingClassifier()
+    comments = [make_comment("a1", 0), make_comment("a2", 1)]
+    store.refresh("demo", comments, classifier)
+    result = store.refresh("demo", comments, classifier)
+    assert result["windows_updated"] == 0 and len(classifier.seen) == 2
+
+
+class FakeJsonModel:
+    """Stands in for the JSON-mode model: labels every id in the prompt and charges the budget."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, model, prompt, budget, stage):
+        self.calls += 1
+        budget.reserve(stage, prompt)
+        ids = re.findall(r'"id": "([^"]+)"', prompt.split("Output JSON")[0])
+        labels = [{"id": cid, "age_group": "30-50", "sentiment": "positive"} for cid in ids]
+        return type("Response", (), {"text": json.dumps({"labels": labels})})()
+
+
+def test_budget_exhausted_partway_is_retried():
+    """Chunks past the budget are skipped whole, stay pending and get labeled on the next refresh"""
+    fake = FakeJsonModel()
+    original = agent_core.generate, agent_core.get_model
+    agent_core.generate, agent_core.get_model = fake.generate, lambda **kwargs: None
+    try:
+        comments = [make_comment(f"c{i:03d}", i % 3) for i in range(120)]
+        chunk_prompt_tokens = estimate_tokens(json.dumps([{"id": "c000", "text": "comment c000"}] * 40)) + 150
+        governor = TokenGovernor(per_request=int(chunk_prompt_tokens * 1.5), per_call=10_000)
+        store = make_store()
+
+        classify = lambda batch, budget: agent_core.classify_comments(batch, budget)
+        first = store.refresh("demo", comments, lambda batch: classify(batch, governor.start_request()))
+        assert fake.calls == 1
+        assert first["classified"] == 40 and first["pending"] == 80
+        assert len(store.labels("demo")) == 40
+        assert sum(w["pending"] for w in store.series("demo", "day")) == 80
+
+        second = store.refresh("demo", comments, lambda batch: classify(batch, governor.start_request()))
+        # The first chunk completed day 0; the two windows still pending are revisited
+        assert second["classified"] == 40 and second["windows_updated"] == 2
+
+        while store.refresh("demo", comments, lambda batch: classify(batch, governor.start_request()))["pending"]:
+            pass
+        labels = store.labels("demo")
+        assert len(labels) == 120 and set(labels.values()) == {("30-50", "positive")}
+        assert all(w["pending"] == 0 for w in store.series("demo", "day"))
+        assert store.refresh("demo", comments, lambda batch: {})["windows_updated"] == 0
+    finally:
+        agent_core.generate, agent_core.get_model = original
+
+
+class FlakyJsonModel(FakeJsonModel):
+    """Answers the first chunk, then fails one chunk per listed error ("bad json" returns garbage)."""
+
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = list(failures)
+
+    def generate(self, model, prompt, budget, stage):
+        if self.calls and self.failures:
+            self.calls += 1
+            failure = self.failures.pop(0)
+            if failure == "bad json":
+                return type("Response", (), {"text": "{not json"})()
+            raise failure
+        return super().generate(model, prompt, budget, stage)
+
+
+def test_failed_chunks_keep_paid_labels():
+    """A chunk that fails mid-refresh leaves its comments pending without losing earlier labels"""
+    original = agent_core.generate, agent_core.get_model
+    agent_core.get_model = lambda **kwargs: None
+    try:
+        comments = [make_comment(f"c{i:03d}", i % 3) for i in range(160)]
+        classify = lambda batch: agent_core.classify_comments(batch, TokenGovernor().start_request())
+
+        fake = FlakyJsonModel([DeadlineExceeded("trends call exceeded deadline"), "bad json"])
+        agent_core.generate = fake.generate
+        store = make_store()
+        first = store.refresh("demo", comments, classify)
+        # The fourth chunk still went out after two failures
+        assert fake.calls == 4
+        assert first["classified"] == 80 and first["pending"] == 80
+        assert len(store.labels("demo")) == 80
+
+        # A spent tenant quota stops the run but keeps what was labeled
+        fake = FlakyJsonModel([BudgetExceeded("tenant over its token allowance")])
+        agent_core.generate = fake.generate
+        second = store.refresh("demo", comments, classify)
+        assert fake.calls == 2
+        assert second["classified"] == 40 and second["pending"] == 40
+
+        agent_core.generate = FakeJsonModel().generate
+        assert store.refresh("demo", comments, classify)["pending"] == 0
+        assert len(store.labels("demo")) == 160
+    finally:
+        agent_core.generate, agent_core.get_model = original
+
+
+def main():
+    """Run all tests"""
+    print("=" * 60)
+    print("TREND ANALYTICS - TESTS")
+    print("=" * 60)
+
+    tests = [
+        ("Daily series", test_daily_series),
+        ("Incremental refresh", test_refresh_only_classifies_new_window),
+        ("No-op refresh", test_unchanged_corpus_is_a_noop),
+        ("Budget runs out mid-refresh", test_budget_exhausted_partway_is_retried),
+        ("Failed chunks stay pending", test_failed_chunks_keep_paid_labels),
+    ]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"{name}: ✓ PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"{name}: ✗ FAILED ({e!r})")
+
+    print("=" * 60)
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Tests for caption variant generation and ranking
+Runs against a scripted fake model (no API key needed)
+"""
+
+import json
+import os
+import re
+import threading
+
+import agent_core
+from token_budget import TokenGovernor
+
+SCORES = {
+    "Original launch caption": (6.0, 70),
+    "Bold hook": (9.0, 80),
+    "Calm tone": (6.0, 90),
+    "Question ending": (4.5, 95),
+}
+
+
+class FakeModel:
+    """Writes the variants, echoes the caption from the personas and scores it as the strategist"""
+
+    def __init__(self, variants):
+        self.variants = variants
+        self.budgets = {}
+        self._lock = threading.Lock()
+
+    def generate(self, model, contents, budget=None, stage="model", context_key=None):
+        budget.reserve(stage, contents)
+        if stage == "variants":
+            text = json.dumps({"variants": self.variants})
+        elif stage in ("youth", "adult"):
+            caption = re.search(r'caption: "(.*)"', contents[0]).group(1)
+            with self._lock:
+                self.budgets.setdefault(caption, set()).add(id(budget))
+            text = f"{stage} reaction to <{caption}>"
+        else:
+            caption = re.search(r"<(.*?)>", contents).group(1)
+            engagement, tone = SCORES[caption]
+            text = json.dumps({"engagement_metrics": {"score": f"{engagement}/10"},
+                               "tone_analysis": {"score": tone}, "final_verdict": f"verdict for {caption}"})
+        return type("Response", (), {"text": text, "usage_metadata": None})()
+
+
+def with_fake(variants, test):
+    fake = FakeModel(variants)
+    saved = agent_core.generate, agent_core.get_model, os.environ.get("GEMINI_API_KEY")
+    agent_core.generate, agent_core.get_model = fake.generate, lambda **kwargs: None
+    os.environ["GEMINI_API_KEY"] = "test"
+    try:
+        return test(fake)
+    finally:
+        agent_core.generate, agent_core.get_model = saved[:2]
+        if saved[2] is None:
+            os.environ.pop("GEMINI_API_KEY", None)
+        else:
+            os.environ["GEMINI_API_KEY"] = saved[2]
+
+
+def test_caption_variants_are_cleaned():
+    """Blank and non-string variants are dropped and the list is capped at k"""
+    def run(fake):
+        budget = TokenGovernor().start_request()
+        captions = agent_core.generate_caption_variants("Original launch caption", k=2, budget=budget)
+        assert captions == ["Bold hook", "Calm tone"]
+        assert budget.used > 0
+
+    with_fake(["  Bold hook ", "", 7, "Calm tone", "Question ending"], run)
+
+
+def test_score_strategy():
+    assert agent_core.score_strategy('```json\n{"engagement_metrics": {"score": "8.5/10"}, '
+                                     '"tone_analysis": {"score": 72}}\n```')[0] == 8.572
+    assert agent_core.score_strategy('{"engagement_metrics": {"score": "n/a"}}')[0] == 0.0
+    assert agent_core.score_strategy('{"tone_analysis": {"score": "warm"}}')[0] == 0.0
+    assert agent_core.score_strategy("not json") == (0.0, None)
+
+
+def test_variants_ranked_with_own_budgets():
+    """Every caption is analyzed under its own budget and ranked by engagement, then tone"""
+    def run(fake):
+        # Enough for the caption call and any one analysis, not for all four
+        governor = TokenGovernor(per_request=1000)
+        budget = governor.start_request("acme")
+        result = agent_core.run_variants(None, "Original launch caption", k=3, image=object(), budget=budget)
+        assert result["error"] is None
+        ranked = [(item["rank"], item["label"], item["caption"]) for item in result["variants"]]
+        assert ranked == [(1, "variant_1", "Bold hook"), (2, "variant_2", "Calm tone"),
+                          (3, "original", "Original launch caption"), (4, "variant_3", "Question ending")]
+        assert all(item["error"] is None and item["verdict"] for item in result["variants"])
+
+        # Both personas of a caption share its budget; no two captions share one
+        seen = [budgets for budgets in fake.budgets.values()]
+        assert len(seen) == 4 and all(len(budgets) == 1 for budgets in seen)
+        assert len(set().union(*seen)) == 4 and id(budget) not in set().union(*seen)
+        # ...and all of it, more than one request's worth, is charged to the caller's tenant
+        assert governor.per_tenant - governor.tenant_remaining("acme") > 3 * governor.per_request
+
+    with_fake(["Bold hook", "Calm tone", "Question ending"], run)
+
+
+def main():
+    """Run all tests"""
+    print("=" * 60)
+    print("CAPTION VARIANTS - TESTS")
+    print("=" * 60)
+
+    tests = [
+        ("Variant cleanup", test_caption_variants_are_cleaned),
+        ("Strategy scores", test_score_strategy),
+        ("Ranking and budgets", test_variants_ranked_with_own_budgets),
+    ]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"{name}: ✓ PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"{name}: ✗ FAILED ({e!r})")
+
+    print("=" * 60)
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Tests for lazy imports and the start-up warm-up
+Each check runs in a fresh interpreter so modules other tests imported don't count
+(no API key needed)
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Imported on first use only: they dominate import time
+HEAVY_MODULES = ["google.generativeai", "google.api_core", "PIL", "bs4", "requests",
+                 "playwright", "pandas", "numpy"]
+
+
+def run_python(code, **env):
+    """Runs code in a fresh interpreter next to agent_core; returns its last stdout line as JSON"""
+    result = subprocess.run([sys.executable, "-c", code], cwd=HERE, capture_output=True, text=True,
+                            timeout=120, env=dict(os.environ, **env))
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_import_is_lazy():
+    """Importing agent_core (what the server does at start-up) pulls in none of the heavy modules"""
+    loaded = run_python(
+        "import json, sys\n"
+        "import agent_core\n"
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    )
+    assert loaded == [], loaded
+
+
+def test_warmup_reports_every_step():
+    """warmup times each step and survives the ones this machine can't do (no SDK, no browser)"""
+    timings = run_python(
+        "import json\n"
+        "import agent_core\n"
+        "print(json.dumps(agent_core.warmup()))",
+        BROWSER_POOL="0"
+    )
+    assert set(timings) == {"genai", "models", "parsers", "corpora", "prompt_version", "browser_pool"}
+    assert all(seconds >= 0 for seconds in timings.values())
+
+
+def main():
+    """Run all tests"""
+    print("=" * 60)
+    print("WARM-UP / LAZY IMPORTS - TESTS")
+    print("=" * 60)
+
+    tests = [
+        ("Lazy imports", test_import_is_lazy),
+        ("Warm-up steps", test_warmup_reports_every_step),
+    ]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"{name}: ✓ PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"{name}: ✗ FAILED ({e!r})")
+
+    print("=" * 60)
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
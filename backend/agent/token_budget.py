@@ -0,0 +1,227 @@
+"""
+Token budget governor for model calls.
+Estimates input tokens before every call, shrinks oversized inputs to fit the
+per-call and per-request budgets, enforces a per-tenant allowance and records
+estimated versus actual usage.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# Gemini bills a fixed number of tokens per image part
+IMAGE_TOKENS = 258
+# Rough chars-per-token for mixed English/JSON text; errs on the high side
+CHARS_PER_TOKEN = 3.5
+
+
+class BudgetExceeded(Exception):
+    """Raised when a tenant has used up its allowance for the current window."""
+
+
+class RequestBudgetExhausted(BudgetExceeded):
+    """Raised when a request has no budget left for another input."""
+
+
+def estimate_tokens(contents: Any) -> int:
+    """Estimate input tokens for a prompt string or a list of parts (text and images)."""
+    if contents is None:
+        return 0
+    if isinstance(contents, str):
+        return int(len(contents) / CHARS_PER_TOKEN) + 1
+    if isinstance(contents, (list, tuple)):
+        return sum(estimate_tokens(part) for part in contents)
+    # Anything else we send is an image part
+    return IMAGE_TOKENS
+
+
+def _sample_evenly(items: List[Any], keep: int) -> List[Any]:
+    if keep >= len(items):
+        return items
+    step = len(items) / keep
+    return [items[int(i * step)] for i in range(keep)]
+
+
+def shrink_text(text: str, max_tokens: int) -> str:
+    """
+    Shrink text to roughly max_tokens.
+    JSON arrays are re-serialized compactly and then evenly sampled so the
+    model still sees whole records; anything else keeps its head and tail.
+
+    Raises:
+        ValueError: if max_tokens < 1 (nothing of the text could be kept)
+    """
+    if max_tokens < 1:
+        raise ValueError(f"Cannot shrink text to {max_tokens} tokens")
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    try:
+        data = json.loads(text)
+    except (ValueError, TypeError):
+        data = None
+
+    if isinstance(data, list) and data:
+        compact = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+        if estimate_tokens(compact) <= max_tokens:
+            return compact
+        keep = max(1, int(len(data) * max_tokens / estimate_tokens(compact)))
+        while keep > 1:
+            sampled = json.dumps(_sample_evenly(data, keep), separators=(",", ":"), ensure_ascii=False)
+            if estimate_tokens(sampled) <= max_tokens:
+                return sampled
+            keep = int(keep * 0.9)
+        text = json.dumps(data[:1], separators=(",", ":"), ensure_ascii=False)
+        if estimate_tokens(text) <= max_tokens:
+            return text
+
+    max_chars = max(0, int(max_tokens * CHARS_PER_TOKEN) - 40)
+    head = max_chars * 2 // 3
+    tail = max_chars - head
+    omitted = len(text) - head - tail
+    return f"{text[:head]}\n[... {omitted} characters omitted ...]\n{text[len(text) - tail:] if tail else ''}"
+
+
+class RequestBudget:
+    """
+    Token budget for one API request, shared by all of its model calls.
+    Also carries the request's scheduling class ('interactive' or 'batch').
+    """
+
+    def __init__(self, governor: "TokenGovernor", tenant: str, priority: str = "interactive", limit: int = None):
+        self.governor = governor
+        self.tenant = tenant
+        self.priority = priority
+        self.limit = limit or governor.per_request
+        self.used = 0
+        self.calls: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def remaining(self) -> int:
+        with self._lock:
+            return max(0, self.limit - self.used)
+
+    def fit(self, text: str, stage: str, max_tokens: int = None) -> str:
+        """
+        Shrink a text input so it fits the per-call cap and what is left of the request budget.
+
+        Raises:
+            RequestBudgetExhausted: when nothing is left to fit the input into
+        """
+        cap = min(self.governor.per_call if max_tokens is None else max_tokens, self.governor.per_call, self.remaining)
+        if cap < 1:
+            raise RequestBudgetExhausted(f"Token budget exhausted before {stage} (limit {self.limit})")
+        fitted = shrink_text(text or "", cap)
+        if len(fitted) < len(text or ""):
+            print(f"⚠️  Budget: shrank {stage} input from ~{estimate_tokens(text)} to ~{estimate_tokens(fitted)} tokens")
+        return fitted
+
+    def can_afford(self, contents: Any) -> bool:
+        """True if contents fit whole in one call and in what is left of the request budget."""
+        estimated = estimate_tokens(contents)
+        return estimated <= self.governor.per_call and estimated <= self.remaining
+
+    def reserve(self, stage: str, contents: Any, system_instruction: Optional[str] = None) -> int:
+        """
+        Charge the estimated input of a call against the request and tenant budgets.
+        The model's system instruction is sent (and billed) with every call, so it counts too.
+        """
+        estimated = estimate_tokens(contents) + estimate_tokens(system_instruction)
+        self.governor.charge_tenant(self.tenant, estimated)
+        with self._lock:
+            self.used += estimated
+        return estimated
+
+    def record(self, stage: str, estimated: int, response: Any = None):
+        """Record estimated vs actual usage once a call returns."""
+        usage = getattr(response, "usage_metadata", None)
+        actual_in = getattr(usage, "prompt_token_count", None)
+        actual_out = getattr(usage, "candidates_token_count", None)
+        cached_in = getattr(usage, "cached_content_token_count", None) or 0
+        if actual_in is not None:
+            # Cached context was charged when it was uploaded, not on every call that reads it
+            actual_in -= cached_in
+        entry = {"stage": stage, "estimated_input": estimated, "actual_input": actual_in,
+                 "cached_input": cached_in, "actual_output": actual_out}
+        with self._lock:
+            if actual_in is not None:
+                # Replace the estimate with the real figure so later stages see the true remainder
+                self.used += actual_in - estimated
+            self.calls.append(entry)
+        self.governor.record(entry)
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"tenant": self.tenant, "limit": self.limit, "used": self.used, "calls": list(self.calls)}
+
+
+class TokenGovernor:
+    """Process-wide budget configuration, tenant accounting and usage statistics."""
+
+    def __init__(self, per_request: int = 60_000, per_call: int = 10_000,
+                 per_tenant: int = 2_000_000, tenant_window: float = 3600.0):
+        """
+        Args:
+            per_request: input tokens one API request may spend across all its model calls
+            per_call: largest input a single text part is shrunk to
+            per_tenant: input tokens a tenant may spend per window
+            tenant_window: tenant accounting window in seconds
+        """
+        self.per_request = per_request
+        self.per_call = per_call
+        self.per_tenant = per_tenant
+        self.tenant_window = tenant_window
+        self._tenants: Dict[str, tuple] = {}
+        self._stats = {"calls": 0, "estimated_input": 0, "calls_with_actual": 0,
+                       "estimated_with_actual": 0, "actual_input": 0}
+        self._lock = threading.Lock()
+
+    def start_request(self, tenant: str = "default", priority: str = "interactive", limit: int = None) -> RequestBudget:
+        """limit overrides per_request for jobs that legitimately need more (e.g. trend classification)."""
+        return RequestBudget(self, tenant or "default", priority, limit)
+
+    def tenant_remaining(self, tenant: str) -> int:
+        """Tokens the tenant may still spend in the current window."""
+        with self._lock:
+            window_start, used = self._tenants.get(tenant, (time.time(), 0))
+            if time.time() - window_start >= self.tenant_window:
+                used = 0
+            return max(0, self.per_tenant - used)
+
+    def charge_tenant(self, tenant: str, tokens: int):
+        now = time.time()
+        with self._lock:
+            window_start, used = self._tenants.get(tenant, (now, 0))
+            if now - window_start >= self.tenant_window:
+                window_start, used = now, 0
+            if used + tokens > self.per_tenant:
+                raise BudgetExceeded(f"Token allowance exhausted for tenant '{tenant}'")
+            self._tenants[tenant] = (window_start, used + tokens)
+
+    def record(self, entry: Dict[str, Any]):
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["estimated_input"] += entry["estimated_input"]
+            if entry["actual_input"] is not None:
+                self._stats["calls_with_actual"] += 1
+                self._stats["estimated_with_actual"] += entry["estimated_input"]
+                self._stats["actual_input"] += entry["actual_input"]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["tenants"] = {t: used for t, (_, used) in self._tenants.items()}
+        if stats["calls_with_actual"]:
+            stats["estimate_ratio"] = round(stats["estimated_with_actual"] / max(stats["actual_input"], 1), 3)
+        return stats
+
+
+governor = TokenGovernor(
+    per_request=int(os.environ.get("TOKEN_BUDGET_PER_REQUEST", 60_000)),
+    per_call=int(os.environ.get("TOKEN_BUDGET_PER_CALL", 10_000)),
+    per_tenant=int(os.environ.get("TOKEN_BUDGET_PER_TENANT", 2_000_000)),
+    tenant_window=float(os.environ.get("TOKEN_BUDGET_TENANT_WINDOW", 3600)),
+)
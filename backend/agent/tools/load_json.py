@@ -1,9 +1,18 @@
 from typing import List, Dict
+import copy
 import json
+from comments import load_corpus
 
 def load_linkedin_comments(path: str) -> List[Dict]:
     """
     Loads LinkedIn comments JSON file.
+    Recognized exports are read through the shared parsed-corpus cache; any other
+    JSON is returned as parsed. Either way the result is the caller's own copy.
     """
-    with open(path, "r") as f:
-        return json.load(f)
+    try:
+        data = load_corpus(path).data
+    except ValueError:
+        # Not a comments export the corpus parser knows; invalid JSON still raises here
+        with open(path, "r") as f:
+            return json.load(f)
+    return copy.deepcopy(data)
@@ -0,0 +1,217 @@
+"""
+Time-windowed trend analytics over comment timestamps.
+Comments are bucketed by createdAtTimestamp into hourly or daily windows.
+Per-comment classifications and per-window aggregates are persisted in SQLite,
+so a refresh only classifies comments it has never seen and only recomputes
+the windows they fall into; history is never re-analyzed.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from comments import Comment
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "trends.sqlite3")
+
+WINDOW_MS = {"hour": 3_600_000, "day": 86_400_000}
+
+# Token budget of one refresh; a first refresh over a large corpus needs far more than one analysis
+TREND_BUDGET_TOKENS = int(os.environ.get("TREND_BUDGET_TOKENS", 400_000))
+
+AGE_GROUPS = ("18-30", "30-50", "50+", "unknown")
+SENTIMENTS = ("positive", "neutral", "negative")
+SENTIMENT_SCORE = {"positive": 1, "neutral": 0, "negative": -1}
+
+# comments -> {comment_id: (age_group, sentiment)}
+Classifier = Callable[[List[Comment]], Dict[str, Tuple[str, str]]]
+
+
+def window_start(timestamp_ms: int, window: str) -> int:
+    size = WINDOW_MS[window]
+    return timestamp_ms - timestamp_ms % size
+
+
+def aggregate(comments: List[Comment], labels: Dict[str, Tuple[str, str]]) -> Dict[str, Any]:
+    """
+    Rolling aggregate for one window: age mix, sentiment mix and engagement totals.
+    Comments without a label yet count as pending and stay out of the mixes.
+    """
+    age_mix = {group: 0 for group in AGE_GROUPS}
+    sentiment = {label: 0 for label in SENTIMENTS}
+    reactions: Dict[str, int] = {}
+    totals = {"likes": 0, "replies": 0, "shares": 0, "impressions": 0}
+    score = 0
+    pending = 0
+    for comment in comments:
+        label = labels.get(comment.comment_id)
+        if label is None:
+            pending += 1
+        else:
+            age_group, mood = label
+            age_mix[age_group if age_group in age_mix else "unknown"] += 1
+            mood = mood if mood in sentiment else "neutral"
+            sentiment[mood] += 1
+            score += SENTIMENT_SCORE[mood]
+        for reaction, count in comment.reactions.items():
+            reactions[reaction] = reactions.get(reaction, 0) + count
+        totals["likes"] += comment.likes
+        totals["replies"] += comment.replies
+        totals["shares"] += comment.shares
+        totals["impressions"] += comment.impressions
+    labeled = len(comments) - pending
+    return {
+        "comments": len(comments),
+        "pending": pending,
+        "age_mix": age_mix,
+        "sentiment": sentiment,
+        "sentiment_score": round(score / labeled, 3) if labeled else 0.0,
+        "reactions": reactions,
+        **totals,
+    }
+
+
+class TrendStore:
+    """Persisted per-comment labels and per-window aggregates, one series per (corpus, window)."""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self._write_lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS labels (
+                    corpus TEXT NOT NULL,
+                    comment_id TEXT NOT NULL,
+                    age_group TEXT NOT NULL,
+                    sentiment TEXT NOT NULL,
+                    PRIMARY KEY (corpus, comment_id)
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS windows (
+                    corpus TEXT NOT NULL,
+                    window TEXT NOT NULL,
+                    window_start INTEGER NOT NULL,
+                    comment_count INTEGER NOT NULL,
+                    aggregates TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (corpus, window, window_start)
+                )
+                """
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def labels(self, corpus: str) -> Dict[str, Tuple[str, str]]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT comment_id, age_group, sentiment FROM labels WHERE corpus = ?", (corpus,)
+            ).fetchall()
+        return {row[0]: (row[1], row[2]) for row in rows}
+
+    def window_counts(self, corpus: str, window: str) -> Dict[int, int]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT window_start, comment_count FROM windows WHERE corpus = ? AND window = ?", (corpus, window)
+            ).fetchall()
+        return dict(rows)
+
+    def series(self, corpus: str, window: str, since_ms: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Stored aggregates oldest first, optionally from since_ms on."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT window_start, aggregates FROM windows WHERE corpus = ? AND window = ? AND window_start >= ? "
+                "ORDER BY window_start ASC",
+                (corpus, window, since_ms or 0),
+            ).fetchall()
+        return [dict(json.loads(row[1]), window_start=row[0]) for row in rows]
+
+    def save(self, corpus: str, window: str, new_labels: Dict[str, Tuple[str, str]],
+             aggregates: Dict[int, Dict[str, Any]]):
+        now = time.time()
+        with self._write_lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO labels (corpus, comment_id, age_group, sentiment) VALUES (?, ?, ?, ?)",
+                [(corpus, cid, age, mood) for cid, (age, mood) in new_labels.items()],
+            )
+            # A window with pending comments is stored with its labeled count, so the next refresh revisits it
+            conn.executemany(
+                "INSERT OR REPLACE INTO windows (corpus, window, window_start, comment_count, aggregates, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(corpus, window, start, agg["comments"] - agg.get("pending", 0), json.dumps(agg, ensure_ascii=False), now)
+                 for start, agg in aggregates.items()],
+            )
+
+    def refresh(self, corpus: str, comments: List[Comment], classify: Classifier,
+                window: str = "day") -> Dict[str, Any]:
+        """
+        Bring the series for a corpus up to date.
+        Only comments without a stored label are classified, and only windows whose
+        comment count changed (or that still have unlabeled comments) are
+        re-aggregated. Only labels the classifier actually returned are stored;
+        the rest stay pending and are classified on a later refresh.
+
+        Raises:
+            ValueError: for an unknown window size
+        """
+        if window not in WINDOW_MS:
+            raise ValueError(f"Unknown window '{window}'; expected one of {sorted(WINDOW_MS)}")
+
+        buckets: Dict[int, List[Comment]] = {}
+        undated = 0
+        for comment in comments:
+            if comment.timestamp_ms is None:
+                undated += 1
+                continue
+            buckets.setdefault(window_start(comment.timestamp_ms, window), []).append(comment)
+
+        stored_counts = self.window_counts(corpus, window)
+        changed = {start: items for start, items in buckets.items() if stored_counts.get(start) != len(items)}
+
+        labels = self.labels(corpus)
+        unseen = [c for items in changed.values() for c in items if c.comment_id not in labels]
+        new_labels = {}
+        if unseen:
+            returned = classify(unseen)
+            for comment in unseen:
+                if comment.comment_id not in returned:
+                    continue
+                age_group, mood = returned[comment.comment_id]
+                # Comments that already carry an age group (e.g. simulated ones) only need sentiment
+                new_labels[comment.comment_id] = (comment.age_group or age_group, mood)
+            labels.update(new_labels)
+
+        aggregates = {start: aggregate(items, labels) for start, items in changed.items()}
+        self.save(corpus, window, new_labels, aggregates)
+        return {
+            "windows_total": len(buckets),
+            "windows_updated": len(aggregates),
+            "classified": len(new_labels),
+            "pending": sum(agg["pending"] for agg in aggregates.values()),
+            "undated": undated,
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_trend_store() -> TrendStore:
+    """Process-wide store configured from the environment."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = TrendStore(db_path=os.environ.get("TREND_STORE_PATH", DEFAULT_DB_PATH))
+        return _store
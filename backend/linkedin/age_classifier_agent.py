@@ -6,12 +6,25 @@ Uses Google Gemini API to analyze comments and classify likely age group (18-30)
 
 import json
 import os
+import random
 import sys
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
 import google.generativeai as genai
 from datetime import datetime
 
+# The backend's resilient call wrapper, scheduler and comment loaders,
+# installed from ../agent (pip install -e ../agent)
+from resilience import resilient_caller, contents_key
+from scheduler import model_scheduler
+from comments import load_corpus
+
+DEFAULT_FAST_MODEL = "gemini-2.5-flash-lite"
+DEFAULT_STRONG_MODEL = "gemini-2.5-flash"
+DEFAULT_ESCALATION_THRESHOLD = 0.7
+DEFAULT_AGREEMENT_SAMPLE = 0.05
+
 
 @dataclass
 class CommentAnalysis:
@@ -23,21 +36,221 @@ class CommentAnalysis:
     confidence_score: float
     reasoning: str
     keywords_identified: List[str]
+    model_tier: str = "strong"
+
+
+def parse_model_json(response_text: str) -> Dict[str, Any]:
+    """
+    Parse a model JSON answer, tolerating markdown code fences
+    
+    Raises:
+        ValueError: if the text is not a JSON object
+    """
+    response_text = response_text.strip()
+    
+    # Remove markdown code blocks if present
+    if response_text.startswith("```json"):
+        response_text = response_text[7:]
+    if response_text.startswith("```"):
+        response_text = response_text[3:]
+    if response_text.endswith("```"):
+        response_text = response_text[:-3]
+    
+    analysis = json.loads(response_text.strip())
+    if not isinstance(analysis, dict):
+        raise ValueError("Expected a JSON object")
+    return analysis
+
+
+class ModelRouter:
+    """
+    Two-tier routing: ask a fast, cheap model first and escalate to the
+    stronger model only when the answer is unparseable or not confident enough.
+    Records per-tier latency, escalation rate and fast/strong agreement.
+    Agreement on escalated comments only covers the hard cases, so a random
+    sample of the confidently answered ones is also checked against the strong
+    model; that sample is what tells whether the fast answers can be trusted.
+    """
+    
+    def __init__(self, fast_model_name: Optional[str], strong_model_name: str,
+                 escalation_threshold: float = DEFAULT_ESCALATION_THRESHOLD, priority: str = "batch",
+                 agreement_sample: float = DEFAULT_AGREEMENT_SAMPLE, rng: Optional[random.Random] = None):
+        """
+        Args:
+            fast_model_name: first-tier model; None (or same as strong) disables routing
+            strong_model_name: escalation model
+            escalation_threshold: escalate when confidence_score is below this
+            agreement_sample: share of confident fast answers also sent to the strong model
+                to measure agreement (the fast answer is still the one returned)
+            rng: random source for the sample (tests pass a seeded one)
+            priority: scheduler class for the calls; the queue is per-process, but the
+                GEMINI_RPM bucket behind it is shared with the server
+        """
+        self.priority = priority
+        self.strong_model_name = strong_model_name
+        self.strong_model = genai.GenerativeModel(strong_model_name)
+        if fast_model_name and fast_model_name != strong_model_name:
+            self.fast_model_name = fast_model_name
+            self.fast_model = genai.GenerativeModel(fast_model_name)
+        else:
+            self.fast_model_name = None
+            self.fast_model = None
+        self.escalation_threshold = escalation_threshold
+        self.agreement_sample = agreement_sample
+        self._rng = rng or random.Random()
+        self.stats = {
+            "requests": 0,
+            "escalations": 0,
+            "escalation_reasons": {"low_confidence": 0, "parse_error": 0, "call_error": 0},
+            "agreement": {"compared": 0, "agreed": 0},
+            "sampled_agreement": {"compared": 0, "agreed": 0, "errors": 0},
+            "tiers": {
+                "fast": {"calls": 0, "total_latency_s": 0.0},
+                "strong": {"calls": 0, "total_latency_s": 0.0},
+            },
+        }
+    
+    def _call(self, tier: str, prompt: str) -> Dict[str, Any]:
+        model = self.fast_model if tier == "fast" else self.strong_model
+        model_name = self.fast_model_name if tier == "fast" else self.strong_model_name
+        stage = f"classifier_{tier}"
+        timeout = resilient_caller.deadline_for(stage)
+        model_scheduler.acquire(self.priority)
+        call, answered = model_scheduler.per_attempt(
+            lambda: model.generate_content(prompt, request_options={"timeout": timeout}),
+            self.priority, stage, timeout
+        )
+        # Tier latency is the model's, not the time spent queued for quota
+        started = time.monotonic()
+        try:
+            response = resilient_caller.call(stage, call, fallback_key=contents_key(model_name, None, prompt),
+                                             upstream=model_name)
+        finally:
+            answered.set()
+            tier_stats = self.stats["tiers"][tier]
+            tier_stats["calls"] += 1
+            tier_stats["total_latency_s"] += time.monotonic() - started
+        return parse_model_json(response.text)
+    
+    def classify(self, prompt: str) -> Dict[str, Any]:
+        """
+        Run the prompt through the tiers
+        
+        Returns:
+            Parsed analysis dict with an added 'model_tier' key
+            
+        Raises:
+            Exception: if the strong tier fails as well
+        """
+        self.stats["requests"] += 1
+        fast_analysis = None
+        
+        if self.fast_model is not None:
+            reason = None
+            try:
+                fast_analysis = self._call("fast", prompt)
+                if float(fast_analysis.get("confidence_score", 0.0)) >= self.escalation_threshold:
+                    fast_analysis["model_tier"] = "fast"
+                    if self._rng.random() < self.agreement_sample:
+                        self._sample_agreement(prompt, fast_analysis)
+                    return fast_analysis
+                reason = "low_confidence"
+            except (ValueError, TypeError):
+                reason = "parse_error"
+                fast_analysis = None
+            except Exception as e:
+                print(f"Fast model error, escalating: {e}")
+                reason = "call_error"
+                fast_analysis = None
+            self.stats["escalations"] += 1
+            self.stats["escalation_reasons"][reason] += 1
+        
+        analysis = self._call("strong", prompt)
+        analysis["model_tier"] = "strong"
+        
+        if fast_analysis is not None:
+            self._record_agreement("agreement", fast_analysis, analysis)
+        
+        return analysis
+    
+    def _record_agreement(self, kind: str, fast_analysis: Dict[str, Any], strong_analysis: Dict[str, Any]):
+        agreement = self.stats[kind]
+        agreement["compared"] += 1
+        if bool(fast_analysis.get("is_young_adult")) == bool(strong_analysis.get("is_young_adult")):
+            agreement["agreed"] += 1
+    
+    def _sample_agreement(self, prompt: str, fast_analysis: Dict[str, Any]):
+        """Checks a confident fast answer against the strong model; failures only count as errors"""
+        try:
+            strong_analysis = self._call("strong", prompt)
+        except Exception as e:
+            print(f"Agreement sample failed: {e}")
+            self.stats["sampled_agreement"]["errors"] += 1
+            return
+        self._record_agreement("sampled_agreement", fast_analysis, strong_analysis)
+    
+    def summary(self) -> Dict[str, Any]:
+        """Routing statistics with derived rates and mean latencies"""
+        requests = self.stats["requests"]
+        compared = self.stats["agreement"]["compared"]
+        sampled = self.stats["sampled_agreement"]
+        return {
+            "fast_model": self.fast_model_name,
+            "strong_model": self.strong_model_name,
+            "escalation_threshold": self.escalation_threshold,
+            "requests": requests,
+            "escalations": self.stats["escalations"],
+            "escalation_rate": self.stats["escalations"] / requests if requests else 0.0,
+            "escalation_reasons": dict(self.stats["escalation_reasons"]),
+            # Escalated comments only: the ones the fast model was unsure about
+            "agreement_rate": self.stats["agreement"]["agreed"] / compared if compared else None,
+            # Random sample of the confident fast answers
+            "agreement_sample": self.agreement_sample,
+            "sampled_comparisons": sampled["compared"],
+            "sampled_agreement_rate": sampled["agreed"] / sampled["compared"] if sampled["compared"] else None,
+            "tiers": {
+                tier: {
+                    "calls": data["calls"],
+                    "mean_latency_s": data["total_latency_s"] / data["calls"] if data["calls"] else None,
+                }
+                for tier, data in self.stats["tiers"].items()
+            },
+        }
 
 
 class LinkedInAgeClassifierAgent:
     """Agent to classify LinkedIn comments by age group using Gemini AI"""
     
-    def __init__(self, api_key: str, model_name: str = "gemini-2.5-flash"):
+    def __init__(self, api_key: str, model_name: Optional[str] = None,
+                 fast_model_name: Optional[str] = None, escalation_threshold: Optional[float] = None,
+                 priority: str = "batch", agreement_sample: Optional[float] = None):
         """
         Initialize the agent with Gemini API
         
         Args:
             api_key: Google Gemini API key
-            model_name: Gemini model to use (default: gemini-2.5-flash)
+            model_name: strong (escalation) model; defaults to $CLASSIFIER_STRONG_MODEL or gemini-2.5-flash
+            fast_model_name: first-tier model; defaults to $CLASSIFIER_FAST_MODEL or gemini-2.5-flash-lite.
+                Set CLASSIFIER_FAST_MODEL="" to send everything to the strong model.
+            escalation_threshold: confidence below which the strong model is asked;
+                defaults to $CLASSIFIER_ESCALATION_THRESHOLD or 0.7
+            priority: model scheduler class for this process's calls, which draw on the
+                same GEMINI_RPM bucket as the server (see ModelRouter)
+            agreement_sample: share of confident fast answers re-checked by the strong model;
+                defaults to $CLASSIFIER_AGREEMENT_SAMPLE or 0.05
         """
         genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(model_name)
+        if model_name is None:
+            model_name = os.getenv("CLASSIFIER_STRONG_MODEL", DEFAULT_STRONG_MODEL)
+        if fast_model_name is None:
+            fast_model_name = os.getenv("CLASSIFIER_FAST_MODEL", DEFAULT_FAST_MODEL)
+        if escalation_threshold is None:
+            escalation_threshold = float(os.getenv("CLASSIFIER_ESCALATION_THRESHOLD", DEFAULT_ESCALATION_THRESHOLD))
+        if agreement_sample is None:
+            agreement_sample = float(os.getenv("CLASSIFIER_AGREEMENT_SAMPLE", DEFAULT_AGREEMENT_SAMPLE))
+        self.router = ModelRouter(fast_model_name or None, model_name, escalation_threshold, priority,
+                                  agreement_sample)
+        self.model = self.router.strong_model
         self.young_adult_keywords = [
             # Slang and informal language
             "yooo", "lit", "fire", "fam", "bro", "dude", "sick", "af", "bussin",
@@ -112,20 +325,8 @@ Provide your analysis in the following JSON format ONLY (no other text):
 """
         
         try:
-            response = self.model.generate_content(prompt)
-            response_text = response.text.strip()
-            
-            # Remove markdown code blocks if present
-            if response_text.startswith("```json"):
-                response_text = response_text[7:]
-            if response_text.startswith("```"):
-                response_text = response_text[3:]
-            if response_text.endswith("```"):
-                response_text = response_text[:-3]
-            
-            # Parse JSON response
-            analysis = json.loads(response_text.strip())
-            return analysis
+            # Fast tier first, strong tier on low confidence or unparseable output
+            return self.router.classify(prompt)
             
         except Exception as e:
             print(f"Error analyzing comment with Gemini: {e}")
@@ -133,7 +334,8 @@ Provide your analysis in the following JSON format ONLY (no other text):
                 "is_young_adult": False,
                 "confidence_score": 0.0,
                 "reasoning": f"Error: {str(e)}",
-                "age_indicators": []
+                "age_indicators": [],
+                "model_tier": "error"
             }
     
     def analyze_comment(self, comment: Dict[str, Any]) -> CommentAnalysis:
@@ -172,7 +374,8 @@ Provide your analysis in the following JSON format ONLY (no other text):
             is_young_adult=is_young_adult,
             confidence_score=confidence,
             reasoning=reasoning,
-            keywords_identified=all_keywords
+            keywords_identified=all_keywords,
+            model_tier=gemini_analysis.get("model_tier", "strong")
         )
     
     def analyze_all_comments(self, comments: List[Dict[str, Any]]) -> List[CommentAnalysis]:
@@ -213,6 +416,12 @@ Provide your analysis in the following JSON format ONLY (no other text):
         print(f"{'='*60}")
         print(f"  Total Comments: {len(analyses)}")
         print(f"  Age 18-30: {len(young_adult_comments)} ({len(young_adult_comments)/len(analyses)*100:.1f}%)")
+        routing = self.router.summary()
+        if routing["fast_model"]:
+            print(f"  Escalated to {routing['strong_model']}: {routing['escalations']} ({routing['escalation_rate']*100:.1f}%)")
+            if routing["sampled_agreement_rate"] is not None:
+                print(f"  Fast/strong agreement on sampled confident answers: "
+                      f"{routing['sampled_agreement_rate']*100:.1f}% of {routing['sampled_comparisons']}")
         print(f"{'='*60}\n")
         
         if young_adult_comments:
@@ -233,6 +442,7 @@ Provide your analysis in the following JSON format ONLY (no other text):
                 "total_comments": len(analyses),
                 "young_adult_comments_count": len(young_adult_comments),
                 "percentage": len(young_adult_comments)/len(analyses)*100,
+                "routing_stats": routing,
                 "young_adult_comments": [
                     {
                         "comment_id": a.comment_id,
@@ -250,7 +460,8 @@ Provide your analysis in the following JSON format ONLY (no other text):
                         "is_young_adult": a.is_young_adult,
                         "confidence_score": a.confidence_score,
                         "keywords_identified": a.keywords_identified,
-                        "reasoning": a.reasoning
+                        "reasoning": a.reasoning,
+                        "model_tier": a.model_tier
                     }
                     for a in analyses
                 ]
@@ -266,6 +477,9 @@ def load_comments_from_json(file_path: str) -> List[Dict[str, Any]]:
     """
     Load comments from JSON file
     
+    Supports the posts format, the comments format and platform exports
+    (normalized through the shared comment model; parsed files are cached)
+    
     Args:
         file_path: Path to JSON file
         
@@ -273,33 +487,17 @@ def load_comments_from_json(file_path: str) -> List[Dict[str, Any]]:
         List of comment dictionaries
     """
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        all_comments = []
-        
-        # Handle new "posts" format
-        if isinstance(data, dict) and "posts" in data:
-            for post_idx, post in enumerate(data["posts"], 1):
-                post_url = post.get("postUrl", f"post_{post_idx}")
-                comments = post.get("comments", [])
-                
-                for comment_idx, comment_text in enumerate(comments, 1):
-                    all_comments.append({
-                        "comment_id": f"p{post_idx}_c{comment_idx}",
-                        "author": "Unknown",
-                        "text": comment_text,
-                        "post_url": post_url
-                    })
-            return all_comments
-            
-        # Handle old "comments" format
-        elif isinstance(data, dict) and "comments" in data:
-            return data["comments"]
-        elif isinstance(data, list):
-            return data
-        else:
-            raise ValueError("Invalid JSON format. Expected 'posts' or 'comments' key")
+        corpus = load_corpus(file_path)
+        return [
+            {
+                "comment_id": c.comment_id,
+                "author": c.author,
+                "text": c.text,
+                "post_url": c.post_url,
+                "timestamp": c.created_at
+            }
+            for c in corpus.comments
+        ]
             
     except Exception as e:
         print(f"Error loading JSON file: {e}")
@@ -5,7 +5,13 @@ Tests basic functionality without requiring API key
 """
 
 import json
-from age_classifier_agent import LinkedInAgeClassifierAgent
+import random
+
+import age_classifier_agent
+from age_classifier_agent import LinkedInAgeClassifierAgent, ModelRouter
+from rate_limit import RateLimiter
+from resilience import ResilientCaller
+from scheduler import ModelScheduler
 
 
 def test_keyword_extraction():
@@ -125,6 +131,98 @@ def test_data_structure():
         return False
 
 
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """Stands in for a Gemini model: answers every prompt from a script keyed by prompt"""
+    
+    answers = {}
+    calls = []
+    
+    def __init__(self, model_name):
+        self.model_name = model_name
+    
+    def generate_content(self, prompt, request_options=None):
+        FakeModel.calls.append((self.model_name, prompt))
+        answer = FakeModel.answers[(self.model_name, prompt)]
+        if isinstance(answer, Exception):
+            raise answer
+        return FakeResponse(answer if isinstance(answer, str) else json.dumps(answer))
+
+
+def make_router(**kwargs):
+    FakeModel.calls = []
+    return ModelRouter("fast", "strong", escalation_threshold=0.7, **kwargs)
+
+
+def test_model_routing():
+    """Test two-tier escalation and agreement sampling with scripted models"""
+    print("\nTesting model routing...")
+    
+    saved = (age_classifier_agent.genai.GenerativeModel, age_classifier_agent.model_scheduler,
+             age_classifier_agent.resilient_caller)
+    age_classifier_agent.genai.GenerativeModel = FakeModel
+    age_classifier_agent.model_scheduler = ModelScheduler(RateLimiter(rate=1000, per=1))
+    age_classifier_agent.resilient_caller = ResilientCaller()
+    try:
+        checks = check_routing()
+    finally:
+        (age_classifier_agent.genai.GenerativeModel, age_classifier_agent.model_scheduler,
+         age_classifier_agent.resilient_caller) = saved
+    
+    failed = [name for name, ok in checks if not ok]
+    for name, ok in checks:
+        print(f"  {'✓' if ok else '✗'} {name}")
+    return not failed
+
+
+def check_routing():
+    """Runs the routing scenarios against FakeModel; returns (name, ok) pairs"""
+    young = {"is_young_adult": True, "confidence_score": 0.9}
+    unsure = {"is_young_adult": True, "confidence_score": 0.4}
+    older = {"is_young_adult": False, "confidence_score": 0.95}
+    FakeModel.answers = {
+        ("fast", "confident"): young, ("strong", "confident"): young,
+        ("fast", "unsure"): unsure, ("strong", "unsure"): older,
+        ("fast", "garbled"): "not json", ("strong", "garbled"): older,
+        ("fast", "down"): RuntimeError("503"), ("strong", "down"): young,
+        ("fast", "disputed"): young, ("strong", "disputed"): older,
+    }
+    checks = []
+    
+    router = make_router(agreement_sample=0.0)
+    checks.append(("confident answer stays on fast", router.classify("confident")["model_tier"] == "fast"
+                   and FakeModel.calls == [("fast", "confident")]))
+    for prompt, reason in (("unsure", "low_confidence"), ("garbled", "parse_error"), ("down", "call_error")):
+        before = router.stats["escalation_reasons"][reason]
+        tier = router.classify(prompt)["model_tier"]
+        checks.append((f"{reason} escalates", tier == "strong"
+                       and router.stats["escalation_reasons"][reason] == before + 1))
+    summary = router.summary()
+    checks.append(("escalation rate", summary["requests"] == 4 and summary["escalations"] == 3))
+    # Only the low-confidence answer could be compared; the fast and strong verdicts differed
+    checks.append(("escalated agreement", summary["agreement_rate"] == 0.0))
+    checks.append(("no sample when disabled", summary["sampled_comparisons"] == 0))
+    
+    router = make_router(agreement_sample=1.0)
+    answer = router.classify("disputed")
+    router.classify("confident")
+    summary = router.summary()
+    checks.append(("sampled answer still fast", answer["model_tier"] == "fast" and answer["is_young_adult"]))
+    checks.append(("sampled agreement", summary["sampled_comparisons"] == 2
+                   and summary["sampled_agreement_rate"] == 0.5 and summary["escalations"] == 0))
+    
+    router = make_router(agreement_sample=0.25, rng=random.Random(7))
+    for _ in range(400):
+        router.classify("confident")
+    sampled = router.summary()["sampled_comparisons"]
+    checks.append(("sample rate", 60 <= sampled <= 140))
+    return checks
+
+
 def main():
     """Run all tests"""
     print("=" * 60)
@@ -137,6 +235,7 @@ def main():
     results.append(("Keyword Extraction", test_keyword_extraction()))
     results.append(("JSON Loading", test_json_loading()))
     results.append(("Data Structure", test_data_structure()))
+    results.append(("Model Routing", test_model_routing()))
     
     # Summary
     print("\n" + "=" * 60)